@@ -1,23 +1,55 @@
 """Main interface to environmental factors"""
 
+import asyncio
 import logging
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import datetime
+from typing import Awaitable, Iterable, Iterator
 
 import confuse  # type: ignore
 
 from envirodata.services.base import Service
+from envirodata.utils.metrics import Counter, Histogram
+from envirodata.utils.profiling import in_context, stage
 
 logger = logging.getLogger()
 
+SERVICE_SECONDS = Histogram(
+    "envirodata_service_seconds",
+    "Duration of retrieving all variables of a service",
+    ("service",),
+)
+SERVICE_ERRORS = Counter(
+    "envirodata_service_errors_total", "Failed service retrievals", ("service",)
+)
+
 
 class Environment:
     """Environmental factors interface"""
 
-    def __init__(self, config: dict | OrderedDict | confuse.Configuration) -> None:
+    def __init__(
+        self,
+        config: dict | OrderedDict | confuse.Configuration,
+        max_workers: int = 16,
+    ) -> None:
+        """Environmental factors interface.
+
+        :param config: Configuration, with a list of services
+        :type config: dict | OrderedDict | confuse.Configuration
+        :param max_workers: Threads retrieving values of services with
+        blocking (file-based) getters for async callers (get_async), defaults
+        to 16
+        :type max_workers: int, optional
+        """
         self.services: dict[str, Service] = {}
         self.register_services(config["services"])
 
+        # blocking (file-based) service retrievals of async callers, created
+        # on first use
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+
     def register_services(
         self, config: dict | OrderedDict | confuse.Configuration
     ) -> None:
@@ -56,11 +88,26 @@ class Environment:
     def metadata(self) -> dict:
         return {name: service.metadata() for name, service in self.services.items()}
 
+    def result_columns(self) -> list[str]:
+        """Names of all values retrieved, as flat columns
+        ("service.variable.statistic").
+
+        :return: Column names
+        :rtype: list[str]
+        """
+        return [
+            f"{servicename}.{variable.name}.{name}"
+            for servicename, service in self.services.items()
+            for variable in service.variables
+            for name in variable.result_names
+        ]
+
     def get(
         self,
         date: datetime.datetime,
         longitude: float,
         latitude: float,
+        include_metadata: bool = True,
     ) -> dict:
         """Retrieve values for (a subset of) all known variables at
         a given point in time and space.
@@ -71,23 +118,213 @@ class Environment:
         :type longitude: float
         :param latitude: Geographical latitude
         :type latitude: float
+        :param include_metadata: Add metadata of each service, defaults to True
+        :type include_metadata: bool, optional
         :return: Values of all requested variables
         :rtype: dict
         """
         result = {}
         for servicename, service in self.services.items():
-            try:
-                result[servicename] = service.get(
+            values = self._get_service(
+                servicename, service, date, longitude, latitude, include_metadata
+            )
+            if values is not None:
+                result[servicename] = values
+
+        return result
+
+    @staticmethod
+    def _get_service(
+        servicename: str,
+        service: Service,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        include_metadata: bool,
+    ) -> dict | None:
+        """Values of one service, None if retrieval failed."""
+        try:
+            with SERVICE_SECONDS.time(service=servicename), stage(
+                "services", servicename
+            ):
+                values = service.get(
                     date,
                     longitude,
                     latitude,
+                    include_metadata=include_metadata,
                 )
-                logger.debug("Loaded data for %s", servicename)
-            except Exception as exc:
-                logger.critical(
-                    "Could not retrieve data for service %s: %s",
-                    servicename,
-                    str(exc),
+            logger.debug("Loaded data for %s", servicename)
+            return values
+        except Exception as exc:
+            SERVICE_ERRORS.inc(service=servicename)
+            logger.critical(
+                "Could not retrieve data for service %s: %s",
+                servicename,
+                str(exc),
+            )
+            return None
+
+    async def get_async(
+        self,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        include_metadata: bool = True,
+    ) -> dict:
+        """Retrieve values for (a subset of) all known variables at
+        a given point in time and space, without blocking the event loop.
+        Services are retrieved concurrently: asynchronous ones (HTTP APIs) are
+        awaited, blocking (file-based) ones run in a dedicated thread pool.
+
+        :param date: Date to retrieve
+        :type date: datetime.datetime
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param include_metadata: Add metadata of each service, defaults to True
+        :type include_metadata: bool, optional
+        :return: Values of all requested variables
+        :rtype: dict
+        """
+        loop = asyncio.get_running_loop()
+        names = list(self.services)
+        retrievals: list[Awaitable[dict | None]] = []
+        for name in names:
+            service = self.services[name]
+            if service.asynchronous:
+                retrievals.append(
+                    self._get_service_async(
+                        name, service, date, longitude, latitude, include_metadata
+                    )
+                )
+            else:
+                retrievals.append(
+                    loop.run_in_executor(
+                        self._get_executor(),
+                        # pass on the request timing
+                        in_context(
+                            self._get_service,
+                            name,
+                            service,
+                            date,
+                            longitude,
+                            latitude,
+                            include_metadata,
+                        ),
+                    )
                 )
 
-        return result
+        values = await asyncio.gather(*retrievals)
+        return {
+            name: value for name, value in zip(names, values) if value is not None
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="environment"
+            )
+        return self._executor
+
+    @staticmethod
+    async def _get_service_async(
+        servicename: str,
+        service: Service,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        include_metadata: bool,
+    ) -> dict | None:
+        """Values of one asynchronous service, None if retrieval failed."""
+        try:
+            with SERVICE_SECONDS.time(service=servicename), stage(
+                "services", servicename, sample=False
+            ):
+                values = await service.get_async(
+                    date,
+                    longitude,
+                    latitude,
+                    include_metadata=include_metadata,
+                )
+            logger.debug("Loaded data for %s", servicename)
+            return values
+        except Exception as exc:
+            SERVICE_ERRORS.inc(service=servicename)
+            logger.critical(
+                "Could not retrieve data for service %s: %s",
+                servicename,
+                str(exc),
+            )
+            return None
+
+    async def aclose(self) -> None:
+        """Close the connections of asynchronous services (async callers)."""
+        for service in self.services.values():
+            await service.aclose()
+
+    def shutdown(self) -> None:
+        """Stop the thread pool of async callers."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _get_location(
+        self,
+        dates: list[datetime.datetime],
+        longitude: float,
+        latitude: float,
+        include_metadata: bool,
+    ) -> list[tuple[datetime.datetime, dict]]:
+        """Values at one location for several dates (one worker task, so that
+        per-location caches of the services are reused)."""
+        return [
+            (date, self.get(date, longitude, latitude, include_metadata))
+            for date in dates
+        ]
+
+    def get_many(
+        self,
+        queries: Iterable[tuple[datetime.datetime, float, float]],
+        include_metadata: bool = False,
+        max_workers: int = 4,
+    ) -> Iterator[tuple[int, dict]]:
+        """Retrieve values for many points in time and space. Queries are
+        grouped by location, each unique query is retrieved once, and results
+        are returned as soon as a location is done (not in query order).
+
+        :param queries: Dates, longitudes and latitudes to retrieve
+        :type queries: Iterable[tuple[datetime.datetime, float, float]]
+        :param include_metadata: Add metadata of each service, defaults to False
+        :type include_metadata: bool, optional
+        :param max_workers: Locations retrieved concurrently, defaults to 4
+        :type max_workers: int, optional
+        :return: Index of the query and its values
+        :rtype: Iterator[tuple[int, dict]]
+        """
+        # query indices by location and date
+        indices: dict[tuple[float, float], dict[datetime.datetime, list[int]]] = {}
+        for index, (date, longitude, latitude) in enumerate(queries):
+            location = indices.setdefault((longitude, latitude), {})
+            location.setdefault(date, []).append(index)
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {
+                pool.submit(
+                    self._get_location,
+                    sorted(dates),
+                    longitude,
+                    latitude,
+                    include_metadata,
+                ): (longitude, latitude)
+                for (longitude, latitude), dates in indices.items()
+            }
+            for future in as_completed(futures):
+                dates = indices[futures[future]]
+                for date, result in future.result():
+                    for index in dates[date]:
+                        yield index, result
+        finally:
+            # stop early if the caller does not need further results
+            pool.shutdown(wait=False, cancel_futures=True)
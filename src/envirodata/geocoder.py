@@ -1,19 +1,54 @@
 """Main Geocoding interface"""
 
 import logging  # for error message reporting
-from typing import Tuple
+import threading
+from typing import Any, Tuple
 
+import httpx
 import requests
 
+from envirodata.utils.metrics import Counter, Histogram
+from envirodata.utils.profiling import stage
+
 logger = logging.getLogger()
 
+GEOCODE_SECONDS = Histogram(
+    "envirodata_geocode_seconds", "Duration of geocoder requests"
+)
+GEOCODE_ERRORS = Counter(
+    "envirodata_geocode_errors_total", "Failed geocoder requests (or no match)"
+)
+
 
 class Geocoder:
     """Geocoder interface"""
 
-    def __init__(self, url: str) -> None:
+    def __init__(self, url: str, max_connections: int = 100) -> None:
+        """Geocoder interface.
+
+        :param url: URL of the (Nominatim) search endpoint
+        :type url: str
+        :param max_connections: Concurrent requests of async callers
+        (geocode_async), defaults to 100
+        :type max_connections: int, optional
+        """
         self.url = url
 
+        # one HTTP session (kept-alive connections) per thread
+        self._sessions = threading.local()
+
+        # async HTTP client of async callers, created on first use (in the
+        # event loop it is used in)
+        self._max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._sessions, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._sessions.session = session
+        return session
+
     def standardize_address(
         self,
         postcode: str,
@@ -54,7 +89,15 @@ class Geocoder:
         :return: Coordinates (longitude, latitude) of the geocoded address, and address found
         :rtype: float, float, str
         """
-        response = requests.get(self.url, params={"q": address}, timeout=10)
+        with GEOCODE_SECONDS.time(), stage("geocode"):
+            try:
+                return self._request(address)
+            except IOError:
+                GEOCODE_ERRORS.inc()
+                raise
+
+    def _request(self, address: str) -> Tuple[float, float, str]:
+        response = self._session().get(self.url, params={"q": address}, timeout=10)
 
         response.raise_for_status()
 
@@ -63,6 +106,10 @@ class Geocoder:
         except requests.exceptions.JSONDecodeError as exc:
             raise IOError("Malformed JSON response") from exc
 
+        return self._best_match(address, data)
+
+    @staticmethod
+    def _best_match(address: str, data: Any) -> Tuple[float, float, str]:
         if len(data) > 0:
             # probably have to sort by place_rank
             best_match = data[0]
@@ -73,3 +120,50 @@ class Geocoder:
             )
         else:
             raise IOError(f"Could not geocode address {address}")
+
+    async def geocode_async(
+        self,
+        address: str,
+    ) -> Tuple[float, float, str]:
+        """Geocode an address without blocking the event loop (async HTTP
+        client, see geocode).
+
+        :param address: Address string (more or less standardized)
+        :type address: str
+        :raises IOError: Request failed, or JSON response is malformed
+        :raises IOError: Address could not be geocoded
+        :return: Coordinates (longitude, latitude) of the geocoded address, and address found
+        :rtype: float, float, str
+        """
+        with GEOCODE_SECONDS.time(), stage("geocode", sample=False):
+            try:
+                return await self._request_async(address)
+            except IOError:
+                GEOCODE_ERRORS.inc()
+                raise
+
+    async def _request_async(self, address: str) -> Tuple[float, float, str]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=10,
+                limits=httpx.Limits(max_connections=self._max_connections),
+            )
+
+        try:
+            response = await self._client.get(self.url, params={"q": address})
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise IOError(str(exc)) from exc
+
+        try:
+            data = response.json()
+        except ValueError as exc:
+            raise IOError("Malformed JSON response") from exc
+
+        return self._best_match(address, data)
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client (connections) of async callers."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,875 @@
+"""Batch jobs: queued, run in a bounded worker pool, results kept on disk.
+
+Jobs and their partial results are checkpointed to a SQLite DB, keyed by
+the hash of the input file, so that jobs resume after a restart and
+re-submitted files reuse work already done.
+
+Several processes can share the DB: each job is owned by the process running
+it, which keeps a heartbeat; jobs of dead processes are taken over by another
+one.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, BinaryIO
+
+from sqlalchemy import (
+    create_engine,
+    delete,
+    inspect,
+    insert,
+    select,
+    text,
+    update,
+    Boolean,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    String,
+    Table,
+    Text,
+)
+
+from envirodata.utils.general import configure_sqlite_for_concurrency
+from envirodata.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DB_FNAME = "jobs.sqlite3"
+
+# interval (s) between heartbeats of the processes owning jobs, which also
+# check for cancel requests and take over jobs of dead processes meanwhile
+HEARTBEAT_INTERVAL = 5.0
+# the owner of a job without a heartbeat since (s) is considered dead
+HEARTBEAT_TIMEOUT = 60.0
+
+# bytes of an uploaded input file copied (and hashed) at once
+COPY_BLOCK_SIZE = 1024 * 1024
+
+JOBS_FINISHED = Counter(
+    "envirodata_jobs_finished_total", "Finished batch jobs", ("kind", "status")
+)
+JOB_SECONDS = Histogram(
+    "envirodata_job_seconds",
+    "Run time of batch jobs",
+    ("kind",),
+    buckets=(1, 5, 10, 30, 60, 300, 600, 1800, 3600, 3 * 3600, 12 * 3600),
+)
+
+
+class JobStatus(str, Enum):
+    ERROR = "ERROR"
+    PENDING = "PENDING"
+    SUCCESS = "SUCCESS"
+    STARTED = "STARTED"
+
+
+class JobQueueFull(Exception):
+    """No more jobs admitted, the queue is full."""
+
+
+def _process_alive(pid: int) -> bool:
+    """Does a process (of this host) exist?"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy scalars
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+class Checkpoints:
+    """Jobs and partial job results in a SQLite DB. Partial results are
+    key-value pairs (JSON) by input file hash. Each job is owned by a process
+    (host name and pid), which updates its heartbeat."""
+
+    def __init__(self, db_url: str) -> None:
+        """Jobs and partial job results in a SQLite DB.
+
+        :param db_url: (SQLAlchemy) URI of the checkpoint DB
+        :type db_url: str
+        """
+        self.engine = create_engine(db_url)
+        configure_sqlite_for_concurrency(self.engine)
+
+        self.metadata = MetaData()
+        self.jobs = Table(
+            "jobs",
+            self.metadata,
+            Column("job_id", String, primary_key=True),
+            Column("kind", String, nullable=False),
+            Column("input_hash", String, nullable=False),
+            Column("status", String, nullable=False),
+            Column("created", Float),
+            Column("options", Text),
+            Column("owner_host", String),
+            Column("owner_pid", Integer),
+            Column("heartbeat", Float),
+            Column("cancel_requested", Boolean, default=False),
+        )
+        self.results = Table(
+            "results",
+            self.metadata,
+            Column("input_hash", String, nullable=False),
+            Column("key", String, nullable=False),
+            Column("value", Text),
+            PrimaryKeyConstraint("input_hash", "key", sqlite_on_conflict="REPLACE"),
+        )
+        self.metadata.create_all(self.engine)
+
+        # DBs of older versions lack job options and owners
+        columns = [c["name"] for c in inspect(self.engine).get_columns("jobs")]
+        added = {
+            "options": "TEXT",
+            "owner_host": "VARCHAR",
+            "owner_pid": "INTEGER",
+            "heartbeat": "FLOAT",
+            "cancel_requested": "BOOLEAN",
+        }
+        with self.engine.begin() as conn:
+            for name, column_type in added.items():
+                if name not in columns:
+                    conn.execute(
+                        text(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+                    )
+
+        # one writer at a time
+        self._lock = threading.Lock()
+
+    def add_job(self, job: "Job", owner: tuple[str, int]) -> None:
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                insert(self.jobs).prefix_with("OR REPLACE"),
+                {
+                    "job_id": job.id,
+                    "kind": type(job).__name__,
+                    "input_hash": job.input_hash,
+                    "status": job.status.value,
+                    "created": job.created,
+                    "options": json.dumps(job.options),
+                    "owner_host": owner[0],
+                    "owner_pid": owner[1],
+                    "heartbeat": time.time(),
+                    "cancel_requested": False,
+                },
+            )
+
+    def heartbeat(self, owner: tuple[str, int], now: float | None = None) -> None:
+        """Mark the jobs of a process as owned by a live process.
+
+        :param owner: Host name and pid of the process
+        :type owner: tuple[str, int]
+        :param now: Time of the heartbeat, 0 to release the jobs (to be taken
+        over), defaults to the current time
+        :type now: float | None, optional
+        """
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                update(self.jobs)
+                .where(
+                    self.jobs.c.owner_host == owner[0],
+                    self.jobs.c.owner_pid == owner[1],
+                )
+                .values(heartbeat=time.time() if now is None else now)
+            )
+
+    def claim(self, stored: dict[str, Any], owner: tuple[str, int]) -> bool:
+        """Become the owner of a stored job, unless its owner changed or kept
+        its heartbeat since it was read.
+
+        :param stored: Stored job (see stored_jobs)
+        :type stored: dict[str, Any]
+        :param owner: Host name and pid of the new owner
+        :type owner: tuple[str, int]
+        :return: Is the job owned by the new owner now?
+        :rtype: bool
+        """
+        with self._lock, self.engine.begin() as conn:
+            result = conn.execute(
+                update(self.jobs)
+                .where(
+                    self.jobs.c.job_id == stored["job_id"],
+                    self.jobs.c.owner_host == stored["owner_host"],
+                    self.jobs.c.owner_pid == stored["owner_pid"],
+                    self.jobs.c.heartbeat == stored["heartbeat"],
+                )
+                .values(owner_host=owner[0], owner_pid=owner[1], heartbeat=time.time())
+            )
+        return result.rowcount == 1
+
+    def request_cancel(self, job_id: str) -> None:
+        """Ask the owner of a job to cancel it."""
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                update(self.jobs)
+                .where(self.jobs.c.job_id == job_id)
+                .values(cancel_requested=True)
+            )
+
+    def cancel_requests(self, owner: tuple[str, int]) -> list[str]:
+        """Ids of the jobs of a process that are to be cancelled."""
+        stmt = select(self.jobs.c.job_id).where(
+            self.jobs.c.owner_host == owner[0],
+            self.jobs.c.owner_pid == owner[1],
+            self.jobs.c.cancel_requested.is_(True),
+        )
+        with self.engine.connect() as conn:
+            return list(conn.execute(stmt).scalars())
+
+    def set_status(self, job_id: str, status: JobStatus) -> None:
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                update(self.jobs)
+                .where(self.jobs.c.job_id == job_id)
+                .values(status=status.value)
+            )
+
+    def remove_job(self, job_id: str) -> None:
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(delete(self.jobs).where(self.jobs.c.job_id == job_id))
+
+    def stored_jobs(self, job_id: str | None = None) -> list[dict[str, Any]]:
+        """All stored jobs (or the one with the given id), oldest first."""
+        stmt = select(self.jobs).order_by(self.jobs.c.created)
+        if job_id is not None:
+            stmt = stmt.where(self.jobs.c.job_id == job_id)
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt)
+            return [
+                {**row._mapping, "options": json.loads(row.options or "{}")}
+                for row in rows
+            ]
+
+    def save(self, input_hash: str, items: dict[str, Any]) -> None:
+        """Store partial results.
+
+        :param input_hash: Hash of the input file
+        :type input_hash: str
+        :param items: Partial results (JSON serializable) by key
+        :type items: dict[str, Any]
+        """
+        if not items:
+            return
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                insert(self.results),
+                [
+                    {
+                        "input_hash": input_hash,
+                        "key": key,
+                        "value": json.dumps(value, default=_json_default),
+                    }
+                    for key, value in items.items()
+                ],
+            )
+
+    def load(self, input_hash: str, prefix: str = "") -> dict[str, Any]:
+        """Stored partial results.
+
+        :param input_hash: Hash of the input file
+        :type input_hash: str
+        :param prefix: Only keys starting with prefix, defaults to ""
+        :type prefix: str, optional
+        :return: Partial results by key
+        :rtype: dict[str, Any]
+        """
+        stmt = select(self.results.c.key, self.results.c.value).where(
+            self.results.c.input_hash == input_hash
+        )
+        if prefix:
+            stmt = stmt.where(self.results.c.key.startswith(prefix, autoescape=True))
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).tuples()
+            return {key: json.loads(value) for key, value in rows}
+
+    def clear(self, input_hash: str) -> None:
+        """Remove partial results of an input file."""
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(
+                delete(self.results).where(self.results.c.input_hash == input_hash)
+            )
+
+
+class Job:
+    """A batch job on an input file. Subclasses implement run(), reading
+    input_fpath and writing their result to result_fpath, and should check
+    killed regularly. Partial results can be checkpointed (checkpoint,
+    load_checkpoints) to be reused when the job is resumed.
+
+    Options (JSON serializable keyword arguments) are stored with the job,
+    file extensions and media type may depend on them."""
+
+    MAX_MSG_LENGTH = 100
+
+    def __init__(
+        self,
+        input_hash: str,
+        job_id: str | None = None,
+        checkpoints: Checkpoints | None = None,
+        **options,
+    ) -> None:
+        self.id = job_id or uuid.uuid4().hex
+        self.created = time.time()
+        self.killed = False
+        self.options = options
+
+        self.input_hash = input_hash
+        # set by the JobManager
+        self.input_fpath = ""
+        self.result_fpath = ""
+        self._checkpoints = checkpoints
+
+        self.status = JobStatus.PENDING
+        self.messages: list[str] = []
+        self.percent_done = 0.0
+
+        # progress and messages are updated from worker threads
+        self._lock = threading.Lock()
+        self._steps_done: float = 0
+        self._steps_total = 1
+
+    @property
+    def input_suffix(self) -> str:
+        """Input file extension."""
+        return ".bin"
+
+    @property
+    def result_suffix(self) -> str:
+        """Result file extension."""
+        return ".bin"
+
+    @property
+    def media_type(self) -> str:
+        """Media type of the result."""
+        return "application/octet-stream"
+
+    @property
+    def result_filename(self) -> str:
+        """Download name of the result."""
+        return "result" + self.result_suffix
+
+    def kill(self) -> None:
+        self.killed = True
+
+    def add_message(self, msg: str) -> None:
+        with self._lock:
+            self.messages.append(msg)
+            if len(self.messages) > self.MAX_MSG_LENGTH:
+                self.messages.pop(0)
+
+    def set_steps_total(self, n: int) -> None:
+        """Set the number of progress steps of the job."""
+        with self._lock:
+            self._steps_total = max(n, 1)
+
+    def step_done(self, n: float = 1) -> None:
+        """Count finished progress steps."""
+        with self._lock:
+            self._steps_done += n
+            self._update_percent()
+
+    def set_steps_done(self, n: float) -> None:
+        """Set the number of finished progress steps."""
+        with self._lock:
+            self._steps_done = n
+            self._update_percent()
+
+    def _update_percent(self) -> None:
+        self.percent_done = float(
+            min(100, (self._steps_done * 100) // self._steps_total)
+        )
+
+    def checkpoint(self, items: dict[str, Any]) -> None:
+        """Store partial results (JSON serializable) by key."""
+        if self._checkpoints is not None:
+            self._checkpoints.save(self.input_hash, items)
+
+    def load_checkpoints(self, prefix: str = "") -> dict[str, Any]:
+        """Partial results stored by this or an earlier job on the same input."""
+        if self._checkpoints is None:
+            return {}
+        return self._checkpoints.load(self.input_hash, prefix)
+
+    def get_state(self) -> dict[str, Any]:
+        """Status, messages since the last call and progress of the job.
+
+        :return: Job state
+        :rtype: dict[str, Any]
+        """
+        with self._lock:
+            state = {
+                "job_id": self.id,
+                "state": self.status,
+                "messages": self.messages,
+                "percent": self.percent_done,
+            }
+            self.messages = []
+        return state
+
+    def run(self) -> None:
+        """Do the work, write the result to result_fpath."""
+        raise NotImplementedError
+
+    def execute(self) -> None:
+        """Run the job in a worker, keeping track of its status."""
+        if self.killed:
+            return
+
+        self.status = JobStatus.STARTED
+        try:
+            self.run()
+        except Exception as exc:
+            logger.exception("Job %s failed", self.id)
+            self.add_message(f"Failed: {exc}")
+            self.status = JobStatus.ERROR
+            return
+
+        if self.killed:
+            # cancelled while running, result is not needed anymore
+            if os.path.exists(self.result_fpath):
+                os.remove(self.result_fpath)
+            self.add_message("Cancelled")
+            self.status = JobStatus.ERROR
+        else:
+            self.add_message("Done")
+            self.percent_done = 0.0
+            self.status = JobStatus.SUCCESS
+
+
+class JobManager:
+    """Runs jobs in a bounded worker pool, with a bounded queue, and keeps
+    inputs and results of jobs on disk.
+
+    Several processes (server workers) can share a result path and checkpoint
+    DB: each runs (owns) the jobs submitted to it, jobs of other processes are
+    looked up in the checkpoint DB (status and result, no progress) and
+    cancelled by their owner, and jobs of dead processes are taken over (by
+    one process each)."""
+
+    def __init__(
+        self,
+        result_path: str,
+        max_workers: int = 2,
+        max_queued: int = 8,
+        max_finished: int = 50,
+        checkpoint_db_url: str | None = None,
+    ) -> None:
+        """Runs jobs in a bounded worker pool, with a bounded queue.
+
+        :param result_path: Directory for job inputs and results
+        :type result_path: str
+        :param max_workers: Jobs running at the same time, defaults to 2
+        :type max_workers: int, optional
+        :param max_queued: Jobs waiting for a worker, defaults to 8
+        :type max_queued: int, optional
+        :param max_finished: Finished jobs (and results) kept, oldest are
+        removed first, defaults to 50
+        :type max_finished: int, optional
+        :param checkpoint_db_url: (SQLAlchemy) URI of the checkpoint DB,
+        defaults to a SQLite DB in result_path
+        :type checkpoint_db_url: str | None, optional
+        """
+        os.makedirs(result_path, exist_ok=True)
+        self.result_path = result_path
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+
+        if checkpoint_db_url is None:
+            checkpoint_db_url = (
+                f"sqlite:///{os.path.join(result_path, CHECKPOINT_DB_FNAME)}"
+            )
+        self.checkpoints = Checkpoints(checkpoint_db_url)
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="envirodata-job"
+        )
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._job_classes: dict[str, type[Job]] = {}
+        self._lock = threading.Lock()
+        self._shutting_down = False
+
+        # this process, as owner of its jobs in the checkpoint DB
+        self._owner = (socket.gethostname(), os.getpid())
+        # heartbeats, cancel requests and take-overs, started by resume
+        self._stopped = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def register(self, job_class: type[Job]) -> None:
+        """Make a kind of job known, needed to resume stored jobs of it."""
+        self._job_classes[job_class.__name__] = job_class
+
+    def _active(self) -> list[Job]:
+        return [
+            job
+            for job in self._jobs.values()
+            if job.status in (JobStatus.PENDING, JobStatus.STARTED)
+        ]
+
+    def _prune(self) -> None:
+        """Remove the oldest finished jobs beyond max_finished."""
+        finished = [
+            job
+            for job in self._jobs.values()
+            if job.status in (JobStatus.SUCCESS, JobStatus.ERROR)
+        ]
+        for job in finished[: max(len(finished) - self.max_finished, 0)]:
+            self._remove(job)
+
+    def _remove(self, job: Job) -> None:
+        """Forget a job, remove its files and checkpoints."""
+        del self._jobs[job.id]
+        self.checkpoints.remove_job(job.id)
+        if job.status != JobStatus.STARTED:
+            self._remove_files(job)
+
+    def _remove_files(self, job: Job) -> None:
+        if os.path.exists(job.result_fpath):
+            os.remove(job.result_fpath)
+
+        # input and partial results may be shared with other jobs (also of
+        # other processes)
+        if any(
+            other.input_hash == job.input_hash for other in self._jobs.values()
+        ) or any(
+            stored["input_hash"] == job.input_hash and stored["job_id"] != job.id
+            for stored in self.checkpoints.stored_jobs()
+        ):
+            return
+        if os.path.exists(job.input_fpath):
+            os.remove(job.input_fpath)
+        self.checkpoints.clear(job.input_hash)
+
+    def _make_job(
+        self,
+        job_class: type[Job],
+        input_hash: str,
+        options: dict[str, Any],
+        job_id: str | None = None,
+    ) -> Job:
+        job = job_class(
+            input_hash, job_id=job_id, checkpoints=self.checkpoints, **options
+        )
+        job.input_fpath = os.path.join(self.result_path, input_hash + job.input_suffix)
+        job.result_fpath = os.path.join(self.result_path, job.id + job.result_suffix)
+        return job
+
+    def _execute(self, job: Job) -> None:
+        """Run a job, storing its status."""
+        if job.killed:
+            return
+        self.checkpoints.set_status(job.id, JobStatus.STARTED)
+        start = time.perf_counter()
+        job.execute()
+        if not (job.killed and self._shutting_down):
+            kind = type(job).__name__
+            JOB_SECONDS.observe(time.perf_counter() - start, kind=kind)
+            JOBS_FINISHED.inc(kind=kind, status=job.status.value)
+        if job.killed:
+            # interrupted by shutdown: stays stored as unfinished (to resume),
+            # cancelled while running: forgotten already, clean up now
+            if not self._shutting_down:
+                with self._lock:
+                    self._remove_files(job)
+            return
+        if not self.checkpoints.stored_jobs(job.id):
+            # cancelled through another process
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._remove_files(job)
+            return
+        self.checkpoints.set_status(job.id, job.status)
+
+    def _queue(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        self._pool.submit(self._execute, job)
+
+    def _copy_input(self, input_file: BinaryIO) -> tuple[str, str]:
+        """Copy an input file to a temporary file in the result path, block by
+        block (not held in memory), hashing it on the way.
+
+        :return: Hash of the contents, path of the copy
+        :rtype: tuple[str, str]
+        """
+        digest = hashlib.sha256()
+        tmp_fpath = os.path.join(self.result_path, f"upload-{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_fpath, "wb") as f:
+                while block := input_file.read(COPY_BLOCK_SIZE):
+                    digest.update(block)
+                    f.write(block)
+        except BaseException:
+            os.remove(tmp_fpath)
+            raise
+        return digest.hexdigest(), tmp_fpath
+
+    def submit(self, job_class: type[Job], input_file: BinaryIO, **options) -> Job:
+        """Queue a job on an input file. If a job on the same file (with the
+        same options) exists already (queued, running or done), that job is
+        returned; a failed job is restarted, reusing its partial results.
+
+        :param job_class: Kind of job
+        :type job_class: type[Job]
+        :param input_file: Input file (binary, read to its end)
+        :type input_file: BinaryIO
+        :raises JobQueueFull: Too many jobs running or waiting
+        :return: The queued (or existing) job
+        :rtype: Job
+        """
+        self.register(job_class)
+        input_hash, tmp_fpath = self._copy_input(input_file)
+        try:
+            return self._submit(job_class, input_hash, tmp_fpath, options)
+        finally:
+            if os.path.exists(tmp_fpath):
+                os.remove(tmp_fpath)
+
+    def _submit(
+        self,
+        job_class: type[Job],
+        input_hash: str,
+        tmp_fpath: str,
+        options: dict[str, Any],
+    ) -> Job:
+        with self._lock:
+            for job in self._jobs.values():
+                if (
+                    isinstance(job, job_class)
+                    and job.input_hash == input_hash
+                    and job.options == options
+                ):
+                    if job.status != JobStatus.ERROR:
+                        logger.info("Input of job %s submitted again", job.id)
+                        return job
+                    # retry, keep partial results
+                    del self._jobs[job.id]
+                    self.checkpoints.remove_job(job.id)
+                    break
+
+            if len(self._active()) >= self.max_workers + self.max_queued:
+                raise JobQueueFull(
+                    f"Too many jobs ({self.max_workers} running, "
+                    f"{self.max_queued} queued), try again later."
+                )
+            self._prune()
+
+            job = self._make_job(job_class, input_hash, options)
+            # inputs are kept on disk, not in memory (and to resume)
+            os.replace(tmp_fpath, job.input_fpath)
+
+            self.checkpoints.add_job(job, self._owner)
+            self._queue(job)
+
+        logger.info("Queued job %s", job.id)
+        return job
+
+    def _owner_dead(self, stored: dict[str, Any], now: float) -> bool:
+        """Is the process owning a stored job gone (no recent heartbeat, or no
+        such process on this host)?"""
+        if stored["heartbeat"] is None or stored["heartbeat"] < now - HEARTBEAT_TIMEOUT:
+            return True
+        if stored["owner_host"] != self._owner[0]:
+            return False
+        if stored["owner_pid"] == self._owner[1]:
+            # an earlier process with the same pid (e.g., in a container)
+            return stored["job_id"] not in self._jobs
+        return not _process_alive(stored["owner_pid"])
+
+    def resume(self) -> None:
+        """Restore stored jobs (e.g., after a restart): queue unfinished jobs
+        again, keep finished jobs' results available. Only jobs of dead
+        processes are restored, each by one of the processes sharing the
+        result path. Starts watching stored jobs: heartbeats of the jobs of
+        this process, their cancel requests, and jobs of processes dying
+        later on."""
+        self.checkpoints.heartbeat(self._owner)
+        self._take_over()
+
+        if self._watcher is None:
+            self._stopped.clear()
+            self._watcher = threading.Thread(
+                target=self._watch, name="envirodata-jobs-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.checkpoints.heartbeat(self._owner)
+                for job_id in self.checkpoints.cancel_requests(self._owner):
+                    with self._lock:
+                        job = self._jobs.get(job_id)
+                        if job is not None:
+                            self._cancel(job)
+                    if job is not None:
+                        logger.info("Cancelled job %s on request", job_id)
+                self._take_over()
+            except Exception:
+                logger.exception("Could not update stored jobs")
+
+    def _take_over(self) -> None:
+        """Become the owner of the stored jobs of dead processes, and restore
+        them."""
+        now = time.time()
+        with self._lock:
+            if self._shutting_down:
+                return
+            for stored in self.checkpoints.stored_jobs():
+                job_class = self._job_classes.get(stored["kind"])
+                if (
+                    job_class is None
+                    or stored["job_id"] in self._jobs
+                    or not self._owner_dead(stored, now)
+                    # taken over by another process meanwhile
+                    or not self.checkpoints.claim(stored, self._owner)
+                ):
+                    continue
+
+                job = self._make_job(
+                    job_class, stored["input_hash"], stored["options"], stored["job_id"]
+                )
+                job.created = stored["created"]
+
+                status = JobStatus(stored["status"])
+                if stored["cancel_requested"]:
+                    logger.info("Cancelled job %s of a dead process", job.id)
+                    self.checkpoints.remove_job(job.id)
+                    self._remove_files(job)
+                elif status == JobStatus.SUCCESS and os.path.exists(job.result_fpath):
+                    job.status = status
+                    self._jobs[job.id] = job
+                elif status in (JobStatus.PENDING, JobStatus.STARTED) and (
+                    os.path.exists(job.input_fpath)
+                ):
+                    logger.info("Resuming job %s", job.id)
+                    self.checkpoints.set_status(job.id, JobStatus.PENDING)
+                    self._queue(job)
+                else:
+                    self.checkpoints.remove_job(job.id)
+
+    def _stored_job(self, job_id: str) -> Job:
+        """A job of another process, as stored (status, files), unless it is
+        to be cancelled.
+
+        :param job_id: Job id
+        :type job_id: str
+        :raises KeyError: Unknown job
+        :return: Job (not run by this process)
+        :rtype: Job
+        """
+        for stored in self.checkpoints.stored_jobs(job_id):
+            job_class = self._job_classes.get(stored["kind"])
+            if job_class is None or stored["cancel_requested"]:
+                break
+            job = self._make_job(
+                job_class, stored["input_hash"], stored["options"], stored["job_id"]
+            )
+            job.created = stored["created"]
+            job.status = JobStatus(stored["status"])
+            return job
+        raise KeyError(job_id)
+
+    def get(self, job_id: str) -> Job:
+        """Job by its id, also of other processes.
+
+        :param job_id: Job id
+        :type job_id: str
+        :raises KeyError: Unknown job
+        :return: Job
+        :rtype: Job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._stored_job(job_id)
+
+            if job.status in (
+                JobStatus.SUCCESS,
+                JobStatus.ERROR,
+            ) and not self.checkpoints.stored_jobs(job_id):
+                # cancelled through another process
+                del self._jobs[job_id]
+                self._remove_files(job)
+                raise KeyError(job_id)
+            return job
+
+    def jobs(self) -> list[Job]:
+        """All jobs known to this process, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel (if running or queued) and remove a job, its result and
+        partial results.
+
+        :param job_id: Job id
+        :type job_id: str
+        :raises KeyError: Unknown job
+        """
+        with self._lock:
+            if job_id not in self._jobs:
+                job = self._stored_job(job_id)
+                stored = self.checkpoints.stored_jobs(job_id)
+                if (
+                    stored
+                    and job.status in (JobStatus.PENDING, JobStatus.STARTED)
+                    and not self._owner_dead(stored[0], time.time())
+                ):
+                    # stopped by its owner, which cleans up when it is done
+                    self.checkpoints.request_cancel(job_id)
+                    logger.info(
+                        "Requested cancelling job %s of another process", job_id
+                    )
+                    return
+
+                # finished, or its owner is gone
+                self.checkpoints.remove_job(job_id)
+                self._remove_files(job)
+                logger.info("Cancelled job %s of another process", job_id)
+                return
+
+            self._cancel(self._jobs[job_id])
+
+        logger.info("Cancelled job %s", job_id)
+
+    def _cancel(self, job: Job) -> None:
+        """Stop (if running or queued) and remove a job of this process."""
+        job.kill()
+        if job.status == JobStatus.PENDING:
+            job.status = JobStatus.ERROR
+        self._remove(job)
+
+    def shutdown(self) -> None:
+        """Stop the workers. Running jobs are interrupted, but stay stored
+        as unfinished, to be resumed (by another process right away)."""
+        with self._lock:
+            self._shutting_down = True
+            for job in self._jobs.values():
+                job.kill()
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        # no heartbeat anymore: other processes take over the jobs
+        self.checkpoints.heartbeat(self._owner, now=0.0)
@@ -0,0 +1,36 @@
+"""Migrate cached station data (CacheDB) from one table per station
+into the observations table."""
+
+import sys
+import logging
+
+from envirodata.utils.cacheDB import CacheDB
+from envirodata.utils.general import get_cli_arguments, get_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHEDB_MODULE = "envirodata.services.cachedb"
+
+args = get_cli_arguments()
+
+config = get_config(args.config_file)
+
+
+def main() -> bool:
+    """Migrate all CacheDB services (or the ones given) to the observations
+    table, dropping the per-station tables."""
+    for service_config in config["environment"]["services"]:
+        if service_config["input"]["module"] != CACHEDB_MODULE:
+            continue
+        if args.services is not None and service_config["label"] not in args.services:
+            continue
+
+        logger.info("Migrating service %s", service_config["label"])
+        CacheDB(service_config["input"]["config"]["db_url"], bulk_load=True).migrate()
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Migrate cached Destatis (Zensus) data from one table per variable
+into the wide layout table."""
+
+import sys
+import logging
+
+from envirodata.services.destatis import Loader
+from envirodata.utils.general import get_cli_arguments, get_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DESTATIS_MODULE = "envirodata.services.destatis"
+
+args = get_cli_arguments()
+
+config = get_config(args.config_file)
+
+
+def main() -> bool:
+    """Migrate all Destatis services (or the ones given) to the wide layout."""
+    for service_config in config["environment"]["services"]:
+        if service_config["input"]["module"] != DESTATIS_MODULE:
+            continue
+        if args.services is not None and service_config["label"] not in args.services:
+            continue
+
+        logger.info("Migrating service %s", service_config["label"])
+        loader_config = dict(service_config["input"]["config"])
+        loader_config["layout"] = "wide"
+        Loader(**loader_config).migrate_to_wide()
+
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,83 @@
 """Run envirodata REST-API server to geocode addresses
 and deliver environmental factors."""
 
+import os
 import sys
+import json
 import logging
 import datetime
+import hashlib
+import time
+from contextlib import asynccontextmanager, contextmanager
 from importlib.metadata import version
-from typing import Any
+from typing import Any, Iterable, Iterator
 from io import BytesIO
 import pytz
-from enum import Enum
-import math
 from pathlib import Path
-import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, status, UploadFile, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import ORJSONResponse as JSONResponse
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+import numpy as np
 import pandas as pd
+import orjson
 import markdown
 import uvicorn.logging
 from dateutil import parser as dparser
 
 from envirodata.geocoder import Geocoder
 from envirodata.environment import Environment
+from envirodata.jobs import Job, JobManager, JobQueueFull, JobStatus
+from envirodata.utils import batchio
+from envirodata.utils.memory import memory_usage
+from envirodata.utils.metrics import (
+    CACHE_LOOKUPS,
+    CACHE_MISSES,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+)
+from envirodata.utils.profiling import Profiler, RequestTiming, timed_request
 
 from envirodata.utils.general import get_cli_arguments, get_config, get_git_commit_hash
 
 README_md_fpath = Path(__file__).parent.parent.parent.parent / "README.md"
 INSTALL_md_fpath = Path(__file__).parent.parent.parent.parent / "INSTALL.md"
 
+# concurrent geocoder requests and environment lookups of batch jobs
+GEOCODE_WORKERS = 8
+ENVIRONMENT_WORKERS = 4
+
+# geocoded addresses checkpointed at once by batch jobs
+CHECKPOINT_BATCH_SIZE = 100
+
+# records per /api/batch request, larger lists should be submitted as jobs
+MAX_BATCH_RECORDS = 10000
+
+HTTP_REQUESTS = Counter(
+    "envirodata_http_requests_total",
+    "HTTP requests by route and status",
+    ("method", "route", "status"),
+)
+HTTP_SECONDS = Histogram(
+    "envirodata_http_request_seconds",
+    "Duration of HTTP requests (until the response is sent)",
+    ("method", "route"),
+)
+BATCH_ROWS = Counter("envirodata_batch_rows_total", "Rows processed by batch jobs")
+
 # logger = logging.getLogger(__name__)
 logger = logging.getLogger("uvicorn.error")
 logger.setLevel(logging.DEBUG)
@@ -42,14 +86,77 @@ args = get_cli_arguments()
 
 config = get_config(args.config_file)
 
-app = FastAPI(**config["fastapi"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop batch jobs, thread pools and HTTP clients when the server
+    (process) stops."""
+    yield
+    jobs.shutdown()
+    if profiler is not None:
+        profiler.stop()
+    await geocoder.aclose()
+    await environment.aclose()
+    environment.shutdown()
+
+
+class MetricsMiddleware:
+    """Count and time HTTP requests by route (path template, e.g.
+    /api/jobs/{job_id}/status)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # unmatched paths are not used as labels (unbounded)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start, method=method, route=route
+            )
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+
+
+app = FastAPI(lifespan=lifespan, **config["fastapi"])
+
+app.add_middleware(MetricsMiddleware)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 templates = Jinja2Templates(directory="templates")
 
 geocoder = Geocoder(**config["geocoder"])
-environment = Environment(config["environment"])
+environment = Environment(
+    config["environment"], max_workers=config["environment"].get("max_workers", 16)
+)
+
+# sampling profiler of single-point requests, keeps the slowest (optional)
+profiling_config = dict(config.get("profiling", {}))
+profiler = (
+    Profiler(
+        profiling_config.get("path", "cache/profiles/"),
+        keep=profiling_config.get("keep", 10),
+        interval=profiling_config.get("interval", 0.005),
+    )
+    if profiling_config.get("enabled", False)
+    else None
+)
 
 start_date = datetime.datetime.fromisoformat(config["period"]["start_date"])
 if start_date.tzinfo is None:
@@ -59,122 +166,323 @@ end_date = datetime.datetime.fromisoformat(config["period"]["end_date"])
 if end_date.tzinfo is None:
     end_date = end_date.replace(tzinfo=pytz.UTC)
 
+# static response metadata, determined once at startup
+STATIC_METADATA = {
+    "package_version": version("envirodata"),
+    "git_commit_hash": get_git_commit_hash(),
+}
 
-class ExcelJob(threading.Thread):
 
-    MAX_MSG_LENGTH = 100
+class BatchJob(Job):
+    """Envirocode the rows (id, date, address or longitude and latitude) of
+    an Excel, CSV or Parquet file, chunk by chunk.
 
-    class Status(Enum):
-        ERROR = "ERROR"
-        PENDING = "PENDING"
-        SUCCESS = "SUCCESS"
-        STARTED = "STARTED"
-
-    def __init__(self, contents):
-        super().__init__()
-        self.killed = False
+    Options: input_format and output_format (xlsx, csv or parquet).
+    """
 
-        self.messages = []
-        self.status = ExcelJob.Status.PENDING
-        self.percentDone = 0.0
+    # progress per geocoded address / retrieved date and location
+    _step_weight = 1.0
 
-        self.buffer = BytesIO()
-        self.contents = contents
+    @property
+    def input_suffix(self) -> str:
+        return "." + self.options["input_format"]
 
-    def kill(self):
-        self.killed = True
+    @property
+    def result_suffix(self) -> str:
+        return "." + self.options["output_format"]
 
-    def add_message(self, msg):
-        self.messages.append(msg)
-        if len(self.messages) > self.MAX_MSG_LENGTH:
-            self.messages.pop(0)
+    @property
+    def media_type(self) -> str:
+        return batchio.FORMATS[self.options["output_format"]]
 
-    def run(self):
-        try:
-            self.status = ExcelJob.Status.STARTED
+    @property
+    def result_filename(self) -> str:
+        return "environment" + self.result_suffix
 
-            data = BytesIO(self.contents)
+    def _parse_rows(self, df):
+        """Row ids, UTC dates (or the parsing error), addresses and
+        coordinates (longitude, latitude) if given."""
+        has_coordinates = "longitude" in df.columns and "latitude" in df.columns
+        rows = []
+        for _, row in df.iterrows():
+            address, coordinates = row.get("address"), None
             try:
-                df = pd.read_excel(data, usecols=["id", "date", "address"])
-            except ValueError as exc:
-                self.status = ExcelJob.Status.ERROR
-                self.add_message(str(exc))
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
-                ) from exc
-
-            result = {}
-
-            i = 1
-            for idx, row in df.iterrows():
+                if has_coordinates and np.isfinite(
+                    [row["longitude"], row["latitude"]]
+                ).all():
+                    coordinates = (float(row["longitude"]), float(row["latitude"]))
+                elif not isinstance(address, str):
+                    raise ValueError("No address or coordinates given")
+                _date = row["date"]
+                if isinstance(_date, str):
+                    _date = dparser.parse(row["date"])
+                try:
+                    date = _date.astimezone(pytz.utc)
+                except:
+                    date = _date.tz_localize(pytz.utc)
+            except Exception as exc:
+                date = exc
+            rows.append((row["id"], date, address, coordinates))
+        return rows
+
+    def _geocode_all(self, addresses):
+        """Geocode unique addresses concurrently, reusing checkpointed
+        locations. Successfully geocoded addresses are checkpointed.
+
+        :return: location (longitude, latitude) or error by address
+        """
+        checkpointed = self.load_checkpoints("geocode:")
+        locations = {}
+        for address in addresses:
+            location = checkpointed.get(f"geocode:{address}")
+            if location is not None:
+                locations[address] = tuple(location)
+        self.step_done(len(locations) * self._step_weight)
+        CACHE_LOOKUPS.inc(len(addresses), cache="job_geocode")
+        CACHE_MISSES.inc(len(addresses) - len(locations), cache="job_geocode")
+
+        new_checkpoints = {}
+        with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as pool:
+            futures = {
+                pool.submit(_geocode, address): address
+                for address in addresses
+                if address not in locations
+            }
+            for future in as_completed(futures):
                 if self.killed:
-                    return
-                logger.info("Working on row %d of %d", i, len(df))
+                    pool.shutdown(cancel_futures=True)
+                    break
+                address = futures[future]
                 try:
-                    _date = row["date"]
-                    if isinstance(_date, str):
-                        _date = dparser.parse(row["date"])
-                    try:
-                        date = _date.astimezone(pytz.utc)
-                    except:
-                        date = _date.tz_localize(pytz.utc)
-                    result[row["id"]] = _retrieve(date, row["address"])
-                    self.add_message(f"Successfully retrieved row {i} of {len(df)}")
+                    geocoding = future.result()
+                    locations[address] = (
+                        geocoding["location"]["longitude"],
+                        geocoding["location"]["latitude"],
+                    )
+                    new_checkpoints[f"geocode:{address}"] = locations[address]
                 except Exception as exc:
-                    result[row["id"]] = {"failed": str(exc)}
-                    self.add_message(f"Error retrieving row {i} of {len(df)}: {exc}")
-                i += 1
-                self.percentDone = math.floor(float(i) / len(df) * 100.0)
-
-            i = 1
-            flat = pd.DataFrame()
-            for id, envrow in result.items():
+                    locations[address] = exc
+                self.step_done(self._step_weight)
+
+                if len(new_checkpoints) >= CHECKPOINT_BATCH_SIZE:
+                    self.checkpoint(new_checkpoints)
+                    new_checkpoints = {}
+
+        self.checkpoint(new_checkpoints)
+        return locations
+
+    def _lookup_location(self, location, dates, checkpointed):
+        """Environment at one location for several dates (one worker task,
+        so that per-location caches of the services are reused). Results
+        are checkpointed once the location is done."""
+        longitude, latitude = location
+        results = {}
+        new_checkpoints = {}
+        n_lookups = n_misses = 0
+        for date in dates:
+            if self.killed:
+                break
+            key = f"env:{longitude!r}:{latitude!r}:{date.isoformat()}"
+            n_lookups += 1
+            if key in checkpointed:
+                results[date] = checkpointed[key]
+                self.step_done(self._step_weight)
+                continue
+            n_misses += 1
+            try:
+                results[date] = environment.get(
+                    date, longitude, latitude, include_metadata=False
+                )
+                new_checkpoints[key] = results[date]
+            except Exception as exc:
+                results[date] = exc
+            self.step_done(self._step_weight)
+        self.checkpoint(new_checkpoints)
+        CACHE_LOOKUPS.inc(n_lookups, cache="job_environment")
+        CACHE_MISSES.inc(n_misses, cache="job_environment")
+        self.add_message(
+            f"Retrieved {len(dates)} date(s) at {latitude:.5f}, {longitude:.5f}"
+        )
+        return location, results
+
+    def _lookup_all(self, dates_by_location):
+        """Environment lookups for all unique (date, location) pairs, in a
+        worker pool grouped by location.
+
+        :return: environment result (or error) by location and date
+        """
+        checkpointed = self.load_checkpoints("env:")
+        environments = {}
+        with ThreadPoolExecutor(max_workers=ENVIRONMENT_WORKERS) as pool:
+            futures = [
+                pool.submit(
+                    self._lookup_location, location, sorted(dates), checkpointed
+                )
+                for location, dates in dates_by_location.items()
+            ]
+            for future in as_completed(futures):
                 if self.killed:
-                    return
-                try:
-                    env = {"id": id}
-                    for service, data in envrow["environment"].items():
-                        env[service] = data["values"]
-
-                    env_pd = pd.json_normalize(env)
-                    self.add_message(f"Successfully converted row {i} of {len(df)}")
-                except KeyError:  # if getting env failed previously, make an empty row
-                    env_pd = pd.DataFrame.from_dict({0: {"id": id}}, orient="index")
-                    self.add_message(f"Ignoring row {i} of {len(df)}")
-
-                i += 1
-                flat = pd.concat([flat, env_pd])
-
-            self.add_message("Writing to output file")
-            self.buffer = BytesIO()
-            with pd.ExcelWriter(self.buffer) as writer:
-                flat.to_excel(writer, index=False)
-
-            self.add_message("Done")
-            self.percentDone = 0.0
-
-            self.status = ExcelJob.Status.SUCCESS
-        except Exception:
-            self.add_message("Failed")
-            self.status = ExcelJob.Status.ERROR
-
-    def get_buffer(self):
-        return self.buffer
-
-    def get_state(self):
-        state = {
-            "state": self.status,
-            "messages": self.messages,
-            "percent": self.percentDone,
+                    pool.shutdown(cancel_futures=True)
+                    return environments
+                location, results = future.result()
+                environments[location] = results
+        return environments
+
+    def _process_chunk(self, df, first_row, n_rows):
+        """Output records of a chunk of rows, in input order."""
+        rows = self._parse_rows(df)
+        rows_done = first_row
+
+        # (1) geocode each address once, unless coordinates are given
+        addresses = {
+            address
+            for _, date, address, coordinates in rows
+            if not isinstance(date, Exception) and coordinates is None
         }
-        self.messages = []
-        return state
+        # progress: half a row per chunk row for geocoding, half for lookups
+        self._step_weight = len(rows) / 2 / max(len(addresses), 1)
+        self.add_message(f"Geocoding {len(addresses)} unique address(es)")
+        locations = self._geocode_all(addresses)
+        if self.killed:
+            return []
+        self.set_steps_done(rows_done + len(rows) / 2)
+
+        # (2) look up each (date, location) once
+        row_locations = []
+        dates_by_location: dict[tuple[float, float], set] = {}
+        for _, date, address, coordinates in rows:
+            location = coordinates or locations.get(address)
+            row_locations.append(location)
+            if isinstance(date, Exception) or isinstance(location, Exception):
+                continue
+            dates_by_location.setdefault(location, set()).add(date)
+
+        n_lookups = sum(len(dates) for dates in dates_by_location.values())
+        self._step_weight = len(rows) / 2 / max(n_lookups, 1)
+        self.add_message(
+            f"Retrieving {n_lookups} unique date/location combination(s) "
+            f"for rows {first_row + 1} to {first_row + len(rows)} of {n_rows}"
+        )
+        environments = self._lookup_all(dates_by_location)
+        if self.killed:
+            return []
+        self.set_steps_done(rows_done + len(rows))
+
+        # (3) output rows in input order
+        records = []
+        for i, ((id, date, _, _), location) in enumerate(
+            zip(rows, row_locations), start=first_row + 1
+        ):
+            if isinstance(date, Exception):
+                result = date
+            elif isinstance(location, Exception):
+                result = location
+            else:
+                result = environments[location][date]
+
+            if isinstance(result, Exception):
+                # if getting env failed, make an empty row
+                records.append({"id": id})
+                self.add_message(f"Error retrieving row {i} of {n_rows}: {result}")
+            else:
+                records.append(_flatten_values(id, result))
+
+        return records
+
+    def run(self):
+        input_format = self.options["input_format"]
+        n_rows = batchio.count_rows(self.input_fpath, input_format)
+        self.set_steps_total(n_rows)
+
+        writer = batchio.ChunkWriter(
+            self.result_fpath,
+            self.options["output_format"],
+            ["id"] + environment.result_columns(),
+        )
+        try:
+            first_row = 0
+            for df in batchio.read_chunks(self.input_fpath, input_format):
+                records = self._process_chunk(df, first_row, n_rows)
+                if self.killed:
+                    return
+                writer.write(pd.DataFrame.from_records(records))
+                first_row += len(df)
+                BATCH_ROWS.inc(len(df))
+        finally:
+            writer.close()
 
 
-# there is only one...
-excel_task_name = "EXCEL"
+def _flatten_values(id: Any, environment_result: dict[str, dict]) -> dict[str, Any]:
+    """Flat output row ("service.variable.statistic" columns) of a result.
+
+    :param id: row id
+    :type id: Any
+    :param environment_result: result of environment.get
+    :type environment_result: dict[str, dict]
+    :return: flat row
+    :rtype: dict[str, Any]
+    """
+    record = {"id": id}
+    for service, data in environment_result.items():
+        for variable, statistics in data["values"].items():
+            for statistic, value in statistics.items():
+                record[f"{service}.{variable}.{statistic}"] = value
+    return record
+
 
-running_threads: dict[str, ExcelJob] = {}
+jobs = JobManager(**config.get("jobs", {"result_path": "cache/jobs/"}))
+jobs.register(BatchJob)
+
+
+def _count_jobs() -> dict[tuple[str, ...], float]:
+    counts: dict[tuple[str, ...], float] = {(state.value,): 0.0 for state in JobStatus}
+    for job in jobs.jobs():
+        counts[(job.status.value,)] += 1
+    return counts
+
+
+Gauge(
+    "envirodata_jobs",
+    "Batch jobs known to this process, by state",
+    _count_jobs,
+    ("state",),
+)
+
+
+def _get_job(job_id: str) -> Job:
+    """Job by its id. (internal)
+
+    :param job_id: job id
+    :type job_id: str
+    :raises HTTPException: unknown job
+    :return: job
+    :rtype: Job
+    """
+    try:
+        return jobs.get(job_id)
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Unknown job"
+        ) from exc
+
+
+def _get_excel_job(job_id: str | None) -> Job | None:
+    """Job of the former single-job Excel API: by its id, or the newest Excel
+    job of this process. (internal)
+
+    :param job_id: job id, defaults to the newest Excel job
+    :type job_id: str | None
+    :raises HTTPException: unknown job
+    :return: job, None if there is no Excel job
+    :rtype: Job | None
+    """
+    if job_id is not None:
+        return _get_job(job_id)
+
+    excel_jobs = [
+        job for job in jobs.jobs() if job.options.get("input_format") == "xlsx"
+    ]
+    return excel_jobs[-1] if excel_jobs else None
 
 
 def _get_metadata(date: datetime.datetime) -> dict[str, Any]:
@@ -186,8 +494,7 @@ def _get_metadata(date: datetime.datetime) -> dict[str, Any]:
     :rtype: dict[str, Any]
     """
     metadata = {
-        "package_version": version("envirodata"),
-        "git_commit_hash": get_git_commit_hash(),
+        **STATIC_METADATA,
         "creation_date": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
     }
 
@@ -196,23 +503,15 @@ def _get_metadata(date: datetime.datetime) -> dict[str, Any]:
     return metadata
 
 
-def _retrieve(
-    date: datetime.datetime,
-    address: str,
-) -> dict[str, Any]:
-    """Retrieve environmental factors for a given date and address. (internal)
+def _geocode(address: str) -> dict[str, Any]:
+    """Geocode an address. (internal)
 
-    :param date: date requested
-    :type date: datetime.datetime
     :param address: address requested
     :type address: str
     :raises HTTPException: address could not be geocoded
-    :return: exposure estimate
+    :return: address, address found and location
     :rtype: dict[str, Any]
     """
-    metadata = _get_metadata(date)
-
-    # (1) geocode address
     try:
         longitude, latitude, address_found = geocoder.geocode(address)
     except IOError as exc:
@@ -221,20 +520,191 @@ def _retrieve(
             detail=f"Geocoding address failed: {str(exc)}",
         ) from exc
 
-    geocoding = {
+    return {
         "address": address,
         "address_found": address_found,
         "location": {"longitude": longitude, "latitude": latitude},
     }
 
-    # (2) get environmental factors
-    env = environment.get(date, longitude, latitude)
+
+async def _geocode_async(address: str) -> dict[str, Any]:
+    """Geocode an address without blocking the event loop. (internal)
+
+    :param address: address requested
+    :type address: str
+    :raises HTTPException: address could not be geocoded
+    :return: address, address found and location
+    :rtype: dict[str, Any]
+    """
+    try:
+        longitude, latitude, address_found = await geocoder.geocode_async(address)
+    except IOError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Geocoding address failed: {str(exc)}",
+        ) from exc
+
+    return {
+        "address": address,
+        "address_found": address_found,
+        "location": {"longitude": longitude, "latitude": latitude},
+    }
+
+
+def _point_geocoding(longitude: float, latitude: float) -> dict[str, Any]:
+    """Geocoding part of a response for coordinates given directly, same
+    shape as a geocoded address. (internal)
+
+    :param longitude: Geographical longitude
+    :type longitude: float
+    :param latitude: Geographical latitude
+    :type latitude: float
+    :return: (no) address and location
+    :rtype: dict[str, Any]
+    """
+    return {
+        "address": None,
+        "address_found": None,
+        "location": {"longitude": longitude, "latitude": latitude},
+    }
+
+
+async def _retrieve_location(
+    date: datetime.datetime,
+    geocoding: dict[str, Any],
+    include_metadata: bool = True,
+) -> dict[str, Any]:
+    """Retrieve environmental factors for a given date and geocoded location.
+    (internal)
+
+    :param date: date requested
+    :type date: datetime.datetime
+    :param geocoding: geocoding (address, address found and location)
+    :type geocoding: dict[str, Any]
+    :param include_metadata: add service metadata to each service's result
+    (batch outputs omit it), defaults to True
+    :type include_metadata: bool, optional
+    :return: exposure estimate
+    :rtype: dict[str, Any]
+    """
+    metadata = _get_metadata(date)
+
+    longitude = geocoding["location"]["longitude"]
+    latitude = geocoding["location"]["latitude"]
+    env = await environment.get_async(
+        date, longitude, latitude, include_metadata=include_metadata
+    )
 
     result = {"metadata": metadata, "geocoding": geocoding, "environment": env}
 
     return result
 
 
+@contextmanager
+def _request_timing(
+    request: dict[str, Any], timing: bool
+) -> Iterator[RequestTiming | None]:
+    """Timing of a single-point request, if requested or profiled. (internal)
+
+    :param request: request parameters (kept with its profile, no personal
+    data)
+    :type request: dict[str, Any]
+    :param timing: timing breakdown requested
+    :type timing: bool
+    :return: timing, None if neither requested nor profiled
+    :rtype: Iterator[RequestTiming | None]
+    """
+    if profiler is not None:
+        with profiler.profile(request) as request_timing:
+            yield request_timing
+    elif timing:
+        with timed_request() as request_timing:
+            yield request_timing
+    else:
+        yield None
+
+
+def _wants_timing(request: Request, timing: bool) -> bool:
+    """Timing breakdown requested, by query parameter or X-Envirodata-Timing
+    header. (internal)"""
+    header = request.headers.get("x-envirodata-timing", "")
+    return timing or header.lower() in ("1", "true", "yes")
+
+
+async def _retrieve(
+    date: datetime.datetime,
+    address: str,
+    include_metadata: bool = True,
+    timing: bool = False,
+) -> dict[str, Any]:
+    """Retrieve environmental factors for a given date and address. (internal)
+
+    :param date: date requested
+    :type date: datetime.datetime
+    :param address: address requested
+    :type address: str
+    :param include_metadata: add service metadata to each service's result
+    (batch outputs omit it), defaults to True
+    :type include_metadata: bool, optional
+    :param timing: add the timing breakdown (geocoding, each service and
+    variable) to the metadata, defaults to False
+    :type timing: bool, optional
+    :raises HTTPException: address could not be geocoded
+    :return: exposure estimate
+    :rtype: dict[str, Any]
+    """
+    # profiles are written to disk: keep a hash, not the address itself
+    address_hash = hashlib.sha256(address.encode("utf-8")).hexdigest()
+    with _request_timing(
+        {"date": date.isoformat(), "address_sha256": address_hash}, timing
+    ) as request_timing:
+        result = await _retrieve_location(
+            date, await _geocode_async(address), include_metadata
+        )
+    if timing and request_timing is not None:
+        result["metadata"]["timing"] = request_timing.breakdown()
+    return result
+
+
+async def _retrieve_point(
+    date: datetime.datetime,
+    longitude: float,
+    latitude: float,
+    include_metadata: bool = True,
+    timing: bool = False,
+) -> dict[str, Any]:
+    """Retrieve environmental factors for a given date and coordinates,
+    without geocoding. (internal)
+
+    :param date: date requested
+    :type date: datetime.datetime
+    :param longitude: Geographical longitude
+    :type longitude: float
+    :param latitude: Geographical latitude
+    :type latitude: float
+    :param include_metadata: add service metadata to each service's result
+    (batch outputs omit it), defaults to True
+    :type include_metadata: bool, optional
+    :param timing: add the timing breakdown (each service and variable) to
+    the metadata, defaults to False
+    :type timing: bool, optional
+    :raises HTTPException: coordinates out of range
+    :return: exposure estimate
+    :rtype: dict[str, Any]
+    """
+    longitude, latitude = validate_location(longitude, latitude)
+    with _request_timing(
+        {"date": date.isoformat(), "longitude": longitude, "latitude": latitude},
+        timing,
+    ) as request_timing:
+        result = await _retrieve_location(
+            date, _point_geocoding(longitude, latitude), include_metadata
+        )
+    if timing and request_timing is not None:
+        result["metadata"]["timing"] = request_timing.breakdown()
+    return result
+
+
 def validate_date(date: datetime.datetime) -> datetime.datetime:
     if date.tzinfo is None:
         logger.critical("Requested date not timezone-aware, assuming UTC!")
@@ -249,8 +719,186 @@ def validate_date(date: datetime.datetime) -> datetime.datetime:
     return date
 
 
-def main() -> None:
-    """Envirodata REST-API."""
+def validate_location(longitude: float, latitude: float) -> tuple[float, float]:
+    """Check geographical coordinates.
+
+    :param longitude: Geographical longitude
+    :type longitude: float
+    :param latitude: Geographical latitude
+    :type latitude: float
+    :raises HTTPException: coordinates out of range
+    :return: longitude and latitude
+    :rtype: tuple[float, float]
+    """
+    longitude, latitude = float(longitude), float(latitude)
+    if not (-180.0 <= longitude <= 180.0 and -90.0 <= latitude <= 90.0):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Coordinates out of range ({longitude}, {latitude})",
+        )
+    return longitude, latitude
+
+
+def _ndjson(obj: Any) -> bytes:
+    """One line of newline-delimited JSON. (internal)"""
+    return (
+        orjson.dumps(
+            jsonable_encoder(obj),
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+        + b"\n"
+    )
+
+
+def _parse_batch_record(record: Any) -> tuple[datetime.datetime, Any]:
+    """Date and address or coordinates of a /api/batch record. (internal)
+
+    :param record: {"date": ..., "address": ...} or
+    {"date": ..., "longitude": ..., "latitude": ...}
+    :type record: Any
+    :raises HTTPException: invalid record
+    :return: date, and address or (longitude, latitude)
+    :rtype: tuple[datetime.datetime, Any]
+    """
+    location: tuple[Any, Any] | str
+    try:
+        date = dparser.isoparse(record["date"])
+        if "longitude" in record and "latitude" in record:
+            location = (record["longitude"], record["latitude"])
+        else:
+            location = str(record["address"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Need date, and address or longitude and latitude "
+            f"({exc.__class__.__name__}: {exc})",
+        ) from exc
+
+    date = validate_date(date)
+    if isinstance(location, tuple):
+        try:
+            location = validate_location(*location)
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid coordinates: {exc}",
+            ) from exc
+    return date, location
+
+
+def _batch_results(records: Iterable[Any]) -> Iterator[bytes]:
+    """NDJSON results of /api/batch records: a metadata line first, then one
+    line per record with its id, geocoding and environment (or error), in
+    the order they are retrieved. (internal)
+
+    :param records: Records with id, date, and address or coordinates
+    :type records: Iterable[Any]
+    :return: NDJSON lines
+    :rtype: Iterator[bytes]
+    """
+    yield _ndjson(
+        {
+            "metadata": {
+                **STATIC_METADATA,
+                "creation_date": datetime.datetime.now(
+                    tz=datetime.timezone.utc
+                ).isoformat(),
+                "services": environment.metadata(),
+            }
+        }
+    )
+
+    # (1) validate records, invalid ones are answered right away
+    parsed = []
+    for i, record in enumerate(records):
+        id = record.get("id", i) if isinstance(record, dict) else i
+        try:
+            parsed.append((id, *_parse_batch_record(record)))
+        except HTTPException as exc:
+            yield _ndjson({"id": id, "error": exc.detail})
+
+    # (2) geocode each address once
+    addresses = {location for _, _, location in parsed if isinstance(location, str)}
+    geocodings: dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as pool:
+        futures = {pool.submit(_geocode, address): address for address in addresses}
+        for future in as_completed(futures):
+            try:
+                geocodings[futures[future]] = future.result()
+            except HTTPException as exc:
+                geocodings[futures[future]] = exc
+
+    # (3) retrieve environments, each (date, location) once
+    queries, owners = [], []
+    for id, date, location in parsed:
+        if isinstance(location, str):
+            geocoding = geocodings[location]
+            if isinstance(geocoding, HTTPException):
+                yield _ndjson({"id": id, "error": geocoding.detail})
+                continue
+        else:
+            geocoding = _point_geocoding(*location)
+        queries.append(
+            (
+                date,
+                geocoding["location"]["longitude"],
+                geocoding["location"]["latitude"],
+            )
+        )
+        owners.append((id, geocoding))
+
+    for index, env in environment.get_many(queries, max_workers=ENVIRONMENT_WORKERS):
+        id, geocoding = owners[index]
+        yield _ndjson({"id": id, "geocoding": geocoding, "environment": env})
+
+
+async def _read_batch_records(request: Request) -> list[Any]:
+    """Records of a /api/batch request body: a JSON list, or NDJSON (one
+    record per line, read as it is streamed in). (internal)
+
+    :param request: request
+    :type request: Request
+    :raises HTTPException: invalid JSON
+    :raises HTTPException: too many records
+    :return: records
+    :rtype: list[Any]
+    """
+    records: list[Any] = []
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            records = json.loads(await request.body())
+            if not isinstance(records, list):
+                raise ValueError("Expected a list of records")
+        else:
+            buffer = b""
+            async for chunk in request.stream():
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                records.extend(json.loads(line) for line in lines if line.strip())
+                if len(records) > MAX_BATCH_RECORDS:
+                    break
+            if buffer.strip():
+                records.append(json.loads(buffer))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {exc}"
+        ) from exc
+
+    if len(records) > MAX_BATCH_RECORDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"More than {MAX_BATCH_RECORDS} records, submit a job instead",
+        )
+    return records
+
+
+def create_app() -> FastAPI:
+    """Envirodata REST-API: register the routes and resume stored jobs. Called
+    once per server process (as app factory by each uvicorn worker).
+
+    :return: application
+    :rtype: FastAPI
+    """
 
     @app.get("/")
     def home(request: Request):
@@ -264,7 +912,7 @@ def main() -> None:
             "<table>", '<table class="table table-striped">'
         )
         return templates.TemplateResponse(
-            "home.html", context={"request": request, "readme": readme_html}
+            request, "home.html", context={"request": request, "readme": readme_html}
         )
 
     @app.get("/install")
@@ -279,12 +927,15 @@ def main() -> None:
             "<table>", '<table class="table table-striped">'
         )
         return templates.TemplateResponse(
-            "install.html", context={"request": request, "install": install_html}
+            request,
+            "install.html",
+            context={"request": request, "install": install_html},
         )
 
     @app.get("/manual")
     def manual(request: Request):
         return templates.TemplateResponse(
+            request,
             "manual.html",
             context={"request": request, "metadata": environment.metadata()},
         )
@@ -292,6 +943,7 @@ def main() -> None:
     @app.get("/excel")
     def excel(request: Request):
         return templates.TemplateResponse(
+            request,
             "excel.html",
             context={"request": request, "metadata": environment.metadata()},
         )
@@ -299,19 +951,21 @@ def main() -> None:
     @app.get("/metadata")
     def metadata(request: Request):
         return templates.TemplateResponse(
+            request,
             "metadata.html",
             context={"request": request, "metadata": environment.metadata()},
         )
 
     @app.get("/api/html")
-    def api_html(
+    async def api_html(
         request: Request, date: datetime.datetime, address: str
     ) -> HTMLResponse:
         date = validate_date(date)
 
-        result = _retrieve(date, address)
+        result = await _retrieve(date, address)
 
         return templates.TemplateResponse(
+            request,
             "result_table.html",
             context={
                 "request": request,
@@ -321,13 +975,20 @@ def main() -> None:
         )
 
     @app.get("/api/simple")
-    def api_simple(date: datetime.datetime, address: str) -> JSONResponse:
+    async def api_simple(
+        request: Request, date: datetime.datetime, address: str, timing: bool = False
+    ) -> JSONResponse:
         """Retrieve environmental factors for a given date and address.
 
+        :param request: request (X-Envirodata-Timing header)
+        :type request: Request
         :param date: date requested
         :type date: datetime.datetime
         :param address: address requested
         :type address: str
+        :param timing: add the timing breakdown to the metadata (or set the
+        X-Envirodata-Timing header), defaults to False
+        :type timing: bool, optional
         :raises HTTPException: date not within cached range
         :return: exposure estimate
         :rtype: JSONResponse
@@ -335,79 +996,256 @@ def main() -> None:
 
         date = validate_date(date)
 
-        result = _retrieve(date, address)
+        result = await _retrieve(date, address, timing=_wants_timing(request, timing))
 
         # serializes also datetimes, ...
         json_result = jsonable_encoder(result)
 
         return JSONResponse(json_result)
 
+    @app.get("/api/point/html")
+    async def api_point_html(
+        request: Request, date: datetime.datetime, longitude: float, latitude: float
+    ) -> HTMLResponse:
+        date = validate_date(date)
+
+        result = await _retrieve_point(date, longitude, latitude)
+
+        return templates.TemplateResponse(
+            request,
+            "result_table.html",
+            context={
+                "request": request,
+                "geocoding": result["geocoding"],
+                "environment": result["environment"],
+            },
+        )
+
+    @app.get("/api/point")
+    async def api_point(
+        request: Request,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        timing: bool = False,
+    ) -> JSONResponse:
+        """Retrieve environmental factors for a given date and coordinates,
+        without geocoding.
+
+        :param request: request (X-Envirodata-Timing header)
+        :type request: Request
+        :param date: date requested
+        :type date: datetime.datetime
+        :param longitude: geographical longitude
+        :type longitude: float
+        :param latitude: geographical latitude
+        :type latitude: float
+        :param timing: add the timing breakdown to the metadata (or set the
+        X-Envirodata-Timing header), defaults to False
+        :type timing: bool, optional
+        :raises HTTPException: date not within cached range
+        :raises HTTPException: coordinates out of range
+        :return: exposure estimate
+        :rtype: JSONResponse
+        """
+
+        date = validate_date(date)
+
+        result = await _retrieve_point(
+            date, longitude, latitude, timing=_wants_timing(request, timing)
+        )
+
+        # serializes also datetimes, ...
+        json_result = jsonable_encoder(result)
+
+        return JSONResponse(json_result)
+
+    @app.post("/api/batch")
+    async def api_batch(request: Request) -> StreamingResponse:
+        """Retrieve environmental factors for many records (id, date, and
+        address or longitude and latitude), sent as a JSON list or as NDJSON.
+
+        :param request: request, body with the records
+        :type request: Request
+        :raises HTTPException: invalid JSON or too many records
+        :return: NDJSON, a metadata line and a line per record as retrieved
+        :rtype: StreamingResponse
+        """
+        records = await _read_batch_records(request)
+
+        # retrieval blocks, the generator is iterated in the thread pool
+        return StreamingResponse(
+            _batch_results(records), media_type="application/x-ndjson"
+        )
+
     @app.post("/api/excel/submit", status_code=status.HTTP_201_CREATED)
     def api_excel_submit(file: UploadFile):
 
-        if excel_task_name in running_threads:
-            return {"message": "Job is already running"}
-
         if not file:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="No file selected"
             )
 
-        contents = file.file.read()
+        try:
+            job = jobs.submit(
+                BatchJob, file.file, input_format="xlsx", output_format="xlsx"
+            )
+        except JobQueueFull as exc:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(exc)
+            ) from exc
+
+        return {"message": "Job created", "job_id": job.id}
+
+    @app.post("/api/jobs", status_code=status.HTTP_201_CREATED)
+    def api_jobs_submit(file: UploadFile, output_format: str | None = None):
+        """Submit a batch job: an Excel, CSV or Parquet file with columns id,
+        date, and address or longitude and latitude.
+
+        :param file: input file (.xlsx, .csv or .parquet)
+        :type file: UploadFile
+        :param output_format: xlsx, csv or parquet, defaults to the input format
+        :type output_format: str | None, optional
+        :raises HTTPException: unsupported file format
+        :raises HTTPException: too many jobs
+        :return: job id
+        """
+        try:
+            input_format = batchio.format_from_filename(file.filename or "")
+            output_format = batchio.format_from_filename(
+                "." + (output_format or input_format)
+            )
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+            ) from exc
 
-        running_threads[excel_task_name] = ExcelJob(contents)
-        running_threads[excel_task_name].start()
+        try:
+            job = jobs.submit(
+                BatchJob,
+                file.file,
+                input_format=input_format,
+                output_format=output_format,
+            )
+        except JobQueueFull as exc:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(exc)
+            ) from exc
+
+        return {"message": "Job created", "job_id": job.id}
+
+    @app.get("/api/jobs", status_code=status.HTTP_200_OK)
+    def api_jobs() -> JSONResponse:
+        return JSONResponse(
+            [
+                {
+                    "job_id": job.id,
+                    "state": job.status,
+                    "percent": job.percent_done,
+                    "created": job.created,
+                }
+                for job in jobs.jobs()
+            ]
+        )
 
-        return {"message": "Job created"}
+    @app.get("/api/jobs/{job_id}/status", status_code=status.HTTP_200_OK)
+    def api_job_status(job_id: str) -> JSONResponse:
+        return JSONResponse(_get_job(job_id).get_state())
 
-    @app.get("/api/excel/status", status_code=status.HTTP_200_OK)
-    def api_excel_status() -> JSONResponse:
-        state = {
-            "state": ExcelJob.Status.PENDING,
-            "messages": [],
-            "percent": 0.0,
-        }
-        if excel_task_name in running_threads:
-            state = running_threads[excel_task_name].get_state()
-        return JSONResponse(state)
+    @app.get("/api/jobs/{job_id}/result")
+    def api_job_result(job_id: str) -> FileResponse:
+        job = _get_job(job_id)
+        if not job.status == JobStatus.SUCCESS:
+            raise HTTPException(
+                status_code=status.HTTP_425_TOO_EARLY, detail="Result not ready (yet)!"
+            )
+
+        return FileResponse(
+            job.result_fpath, media_type=job.media_type, filename=job.result_filename
+        )
 
-    @app.get("/api/excel/get")
-    def api_excel_get() -> StreamingResponse:
-        if excel_task_name not in running_threads:
+    @app.delete("/api/jobs/{job_id}", status_code=status.HTTP_200_OK)
+    def api_job_cancel(job_id: str):
+        try:
+            jobs.cancel(job_id)
+        except KeyError as exc:
             raise HTTPException(
-                status_code=status.HTTP_425_TOO_EARLY,
-                detail="Processing has not started yet!",
+                status_code=status.HTTP_404_NOT_FOUND, detail="Unknown job"
+            ) from exc
+
+        return True
+
+    # former single-job Excel API, kept for existing clients: the job given by
+    # job_id, or the newest Excel job
+    @app.get("/api/excel/status", status_code=status.HTTP_200_OK, deprecated=True)
+    def api_excel_status(job_id: str | None = None) -> JSONResponse:
+        job = _get_excel_job(job_id)
+        if job is None:
+            return JSONResponse(
+                {"state": JobStatus.PENDING, "messages": [], "percent": 0.0}
             )
-        jobstate = running_threads[excel_task_name].get_state()
-        if not jobstate["state"] == ExcelJob.Status.SUCCESS:
+        return api_job_status(job.id)
+
+    @app.get("/api/excel/get", deprecated=True)
+    def api_excel_get(job_id: str | None = None) -> FileResponse:
+        job = _get_excel_job(job_id)
+        if job is None:
             raise HTTPException(
-                status_code=status.HTTP_425_TOO_EARLY, detail="Result not ready (yet)!"
+                status_code=status.HTTP_425_TOO_EARLY,
+                detail="Processing has not started yet!",
             )
+        return api_job_result(job.id)
 
-        buffer = running_threads[excel_task_name].get_buffer()
-        return StreamingResponse(
-            BytesIO(buffer.getvalue()),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=environment.xlsx"},
+    @app.get("/api/excel/reset", status_code=status.HTTP_200_OK, deprecated=True)
+    def api_excel_reset(job_id: str | None = None):
+        job = _get_excel_job(job_id)
+        if job is None:
+            return True
+        return api_job_cancel(job.id)
+
+    @app.get("/metrics")
+    def metrics() -> PlainTextResponse:
+        """Metrics of this server process in the Prometheus text format."""
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4"
         )
 
-    @app.get("/api/excel/reset", status_code=status.HTTP_200_OK)
-    def api_excel_reset():
-        # no thread to kill anyway
-        if excel_task_name not in running_threads:
-            return True
+    @app.get("/api/memory")
+    def api_memory() -> JSONResponse:
+        """Memory usage (kB) of the server process answering the request.
+
+        :return: process id, resident set size and its anonymous, file-backed
+        (memory-mapped datasets, shared between workers) and shared parts
+        :rtype: JSONResponse
+        """
+        return JSONResponse({"pid": os.getpid(), **memory_usage()})
 
-        running_threads[excel_task_name].kill()
-        running_threads[excel_task_name].join()
+    # continue batch jobs interrupted by the last shutdown
+    jobs.resume()
 
-        if running_threads[excel_task_name].is_alive():
-            raise IOError("Excel thread still alive!")
+    if profiler is not None:
+        profiler.start()
 
-        del running_threads[excel_task_name]
+    logger.info(
+        "Server process %d started, memory (kB): %s", os.getpid(), memory_usage()
+    )
 
-        return True
+    return app
+
+
+def main() -> None:
+    """Envirodata REST-API."""
+    uvicorn_kwargs = dict(config["uvicorn"])
+
+    if uvicorn_kwargs.get("workers", 1) > 1:
+        # each worker process imports this module and builds its own app;
+        # large datasets are memory-mapped and shared between them
+        uvicorn.run(
+            "envirodata.scripts.run_server:create_app", factory=True, **uvicorn_kwargs
+        )
+        return
 
-    uvicorn_config = uvicorn.Config(app, **config["uvicorn"])
+    uvicorn_config = uvicorn.Config(create_app(), **uvicorn_kwargs)
     uvicorn_server = uvicorn.Server(uvicorn_config)
     uvicorn_server.run()
 
@@ -3,14 +3,16 @@ import hashlib
 import logging
 import os
 import copy
+from typing import Any, Iterator
 
 import geopandas as gp  # type: ignore
 import pandas as pd
 import requests
-from shapely import Point  # type: ignore
 import numpy as np
 
 from envirodata.services.base import BaseGetter, BaseLoader
+from envirodata.services.cachedb import StationSource as BaseStationSource
+from envirodata.utils.spatial import SphericalIndex
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +31,26 @@ STATION_DATA_PATH = os.path.join(
 #    data from the beginning of 2023.
 
 # priority: which value takes precedence if multiple exist (higher value is better)
-DATASETS = [
+DATASETS: list[dict[str, Any]] = [
     {"name": "archived", "dbindex": 1, "priority": 3},
     {"name": "verified", "dbindex": 2, "priority": 2},
     {"name": "uptodate", "dbindex": 3, "priority": 1},
 ]
 
+# values handed to the cache DB at once by the station source
+SOURCE_BATCH_SIZE = 500000
+
+# stations ranked at once when looking for the nearest one still operating
+NEAREST_STATIONS = 8
+
+
+def _to_utc_timestamp(date: datetime.datetime) -> pd.Timestamp:
+    """Timezone-aware (UTC) timestamp, naive dates are assumed to be UTC."""
+    timestamp = pd.Timestamp(date)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
 
 class Loader(BaseLoader):
     """Load (cache) airbase dataset."""
@@ -225,13 +241,111 @@ class Getter(BaseGetter):
         if not os.path.exists(os.path.join(self.cache_path, METADATA_FNAME)):
             raise IOError("No metadata found - did you load data?")
 
-        self.metadata = gp.read_parquet(os.path.join(self.cache_path, METADATA_FNAME))
+        # only the columns needed to find stations (held by every server
+        # process)
+        self.metadata = gp.read_parquet(
+            os.path.join(self.cache_path, METADATA_FNAME),
+            columns=[
+                "Operational Activity Begin",
+                "Operational Activity End",
+                "Air Pollutant",
+                "Country",
+                "geometry",
+            ]
+            + [f"localFilePath_{dataset['dbindex']}" for dataset in DATASETS],
+        )
+
+        # spatial index of the candidate stations of each pollutant, built once
+        self.station_index: dict[str, tuple[gp.GeoDataFrame, SphericalIndex]] = {
+            str(pollutant): (
+                stations,
+                SphericalIndex(
+                    stations.geometry.x.to_numpy(), stations.geometry.y.to_numpy()
+                ),
+            )
+            for pollutant, stations in self._candidate_stations().groupby(
+                "Air Pollutant"
+            )
+        }
+
+    def _candidate_stations(self) -> gp.GeoDataFrame:
+        """Stations that ever started measuring, and that we have cached in
+        any of the datasets.
+
+        :return: Station metadata
+        :rtype: gp.GeoDataFrame
+        """
+        ds = self.metadata
+
+        # stations that ever started measuring (filtering copies)
+        ds = ds[ds["Operational Activity Begin"].apply(lambda x: not pd.isnull(x))]
+
+        # and only stations that we have cached in any of the datasets
+        hasCachedData = ds["Country"].isna()
+        for dataset in DATASETS:
+            hasCachedData = (
+                hasCachedData | ds[f"localFilePath_{dataset['dbindex']}"].notna()
+            )
+
+        return ds[hasCachedData]
+
+    def _nearest_station(
+        self,
+        longitude: float,
+        latitude: float,
+        variable: str,
+        date: datetime.datetime,
+    ) -> pd.Series | None:
+        """Nearest candidate station measuring a pollutant that is still
+        operating at a given date.
+
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Pollutant
+        :type variable: str
+        :param date: Date
+        :type date: datetime.datetime
+        :return: Station metadata, None if there is no such station
+        :rtype: pd.Series | None
+        """
+        if variable not in self.station_index:
+            return None
+
+        stations, index = self.station_index[variable]
+
+        # either no measurement end date or end date after requested date
+        def good_end_date(x, date):
+            if pd.isnull(x):
+                return True
+            else:
+                return x > date
+
+        # rank more stations until one of them is still operating
+        k = NEAREST_STATIONS
+        while True:
+            _, nearest = index.query(longitude, latitude, k=k)
+            candidates = stations.iloc[nearest[0]]
+            operating = candidates["Operational Activity End"].apply(
+                lambda x: good_end_date(x, date)
+            )
+            if operating.any():
+                return candidates[operating.to_numpy()].iloc[0]
+            if k >= len(index):
+                return None
+            k *= 4
 
     @property
     def time_resolution(self):
         """Time resolution of the dataset."""
         return datetime.timedelta(hours=1)
 
+    @property
+    def thread_safe(self) -> bool:
+        """No shared mutable state between requests."""
+        return True
+
     def _get(
         self,
         date: datetime.datetime,
@@ -284,56 +398,11 @@ class Getter(BaseGetter):
         :rtype: tuple[list[datetime.datetime], list[float]]
         """
 
-        ds = self.metadata.copy()
-
-        # stations that ever started measuring
-        ds = ds[ds["Operational Activity Begin"].apply(lambda x: not pd.isnull(x))]
-
-        # either no measurement end date or end date after requested date
-        def good_end_date(x, date):
-            if pd.isnull(x):
-                return True
-            else:
-                return x > date
-
-        ds = ds[
-            ds["Operational Activity End"].apply(lambda x: good_end_date(x, end_date))
-        ]
-
-        if ds.empty:
-            return [start_date], [np.nan]
-
-        # and only stations that actually measure that pollutant
-        ds = ds[ds["Air Pollutant"] == variable]
-
-        if ds.empty:
-            return [start_date], [np.nan]
-
-        # and only stations that we have cached in any of the datasets
-        hasCachedData = ds["Country"].isna()
-        for dataset in DATASETS:
-            hasCachedData = (
-                hasCachedData | ds[f"localFilePath_{dataset['dbindex']}"].notna()
-            )
-
-        ds = ds[hasCachedData]
+        station = self._nearest_station(longitude, latitude, variable, end_date)
 
-        if ds.empty:
+        if station is None:
             return [start_date], [np.nan]
 
-        # OK - there should be something!
-
-        point = Point(longitude, latitude)
-
-        closest_df_item, distance = ds.sindex.nearest(
-            point, return_distance=True, return_all=False
-        )
-
-        # get item from df, make dict - improve, pls! ;)
-        stationRow = ds.iloc[closest_df_item[1]].to_dict(orient="index")
-        stationId = list(stationRow.keys())[0]
-        station = stationRow[stationId]
-
         result = [np.nan]
         times = [copy.copy(start_date)]
 
@@ -369,3 +438,96 @@ class Getter(BaseGetter):
                 highest_prio_found = dataset["priority"]
 
         return times, result
+
+
+class StationSource(BaseStationSource):
+    """Cached AirBASE data (see Loader) as a station source for the CacheDB
+    service (envirodata.services.cachedb)."""
+
+    def __init__(self, cache_path: str) -> None:
+        """Cached AirBASE data as a station source.
+
+        :param cache_path: Cache path of the AirBASE loader
+        :type cache_path: str
+        """
+        if not os.path.exists(os.path.join(cache_path, METADATA_FNAME)):
+            raise IOError("No metadata found - did you load data?")
+
+        self.metadata = gp.read_parquet(os.path.join(cache_path, METADATA_FNAME))
+
+    def _read_station(
+        self,
+        fpath: str,
+        start_date: datetime.datetime | None,
+        end_date: datetime.datetime | None,
+    ) -> pd.DataFrame:
+        """Valid measurements of a cached station file within the given dates."""
+        data = pd.read_parquet(fpath, columns=["Start", "Value", "Validity"])
+        data["Start"] = pd.to_datetime(data["Start"], utc=True)
+
+        # only valid measurements! https://dd.eionet.europa.eu/vocabulary/aq/observationvalidity
+        valid = data["Validity"] > 0
+        if start_date is not None:
+            valid &= data["Start"] >= _to_utc_timestamp(start_date)
+        if end_date is not None:
+            valid &= data["Start"] <= _to_utc_timestamp(end_date)
+
+        return data[valid]
+
+    def observations(
+        self,
+        start_date: datetime.datetime | None,
+        end_date: datetime.datetime | None,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """Observations between given dates, in batches of aligned arrays.
+
+        Datasets are read from lowest to highest priority, so that better data
+        supersedes existing data of the same station and time in the cache.
+
+        :param start_date: First date to load (None: from the beginning)
+        :type start_date: datetime.datetime | None
+        :param end_date: Last date to load (None: to the end)
+        :type end_date: datetime.datetime | None
+        :return: Batches of observations
+        :rtype: Iterator[dict[str, np.ndarray]]
+        """
+        stations = self.metadata[self.metadata["Air Pollutant"].notna()]
+
+        parts: list[pd.DataFrame] = []
+        n_rows = 0
+        for dataset in sorted(DATASETS, key=lambda x: x["priority"]):
+            column = f"localFilePath_{dataset['dbindex']}"
+            if column not in stations.columns:
+                continue
+
+            for station_id, station in stations[stations[column].notna()].iterrows():
+                data = self._read_station(station[column], start_date, end_date)
+                if data.empty:
+                    continue
+
+                parts.append(
+                    pd.DataFrame(
+                        {
+                            "station_ids": station_id,
+                            "longitudes": station.geometry.x,
+                            "latitudes": station.geometry.y,
+                            "parameters": station["Air Pollutant"],
+                            "dates": data["Start"].dt.tz_convert(None).to_numpy(),
+                            "values": data["Value"].to_numpy(dtype=np.float64),
+                        }
+                    )
+                )
+                n_rows += len(data)
+
+                if n_rows >= SOURCE_BATCH_SIZE:
+                    yield self._batch(parts)
+                    parts, n_rows = [], 0
+
+        if parts:
+            yield self._batch(parts)
+
+    @staticmethod
+    def _batch(parts: list[pd.DataFrame]) -> dict[str, np.ndarray]:
+        """Aligned arrays of a batch of observations."""
+        batch = pd.concat(parts, ignore_index=True)
+        return {name: batch[name].to_numpy() for name in batch.columns}
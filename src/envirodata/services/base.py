@@ -1,15 +1,18 @@
 """Base (blueprint) Envirodata service for datasets."""
 
 import abc
+import asyncio
 import datetime
 import logging
 from collections import OrderedDict
 import copy
 import os
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field, fields
 import yaml
 import json
-from typing import Any
+from typing import Any, Iterator
 
 import confuse  # type: ignore
 import numpy as np
@@ -18,12 +21,31 @@ from pytz import timezone, utc
 from pytz.exceptions import UnknownTimeZoneError
 
 from envirodata.utils.general import load_callable
+from envirodata.utils.metrics import Histogram
+from envirodata.utils.profiling import in_context, stage
 from envirodata.utils.statistics import AvailableStatistics, Statistic
 
 logger = logging.getLogger(__name__)
 
 
 TF = timezonefinder.TimezoneFinder()
+# TimezoneFinder reads from shared file handles, serialize lookups
+TF_LOCK = threading.Lock()
+
+# stages of getting a variable, by getter module (e.g., dwd, geotiff)
+TIMEZONE_SECONDS = Histogram(
+    "envirodata_timezone_seconds", "Duration of time zone lookups"
+)
+READ_SECONDS = Histogram(
+    "envirodata_getter_read_seconds",
+    "Duration of reading a variable's values from a dataset",
+    ("getter",),
+)
+STATISTICS_SECONDS = Histogram(
+    "envirodata_statistics_seconds",
+    "Duration of calculating a variable's statistics",
+    ("getter",),
+)
 
 
 @dataclass
@@ -33,11 +55,22 @@ class Variable:
     description: str
     units: str
     statistics: list[Statistic] = field(default_factory=list)
+    buffers: list[int] = field(default_factory=list)
 
     @property
     def metadata(self) -> dict[str, Any]:
         return {f.name: getattr(self, f.name) for f in fields(self)}
 
+    @property
+    def result_names(self) -> list[str]:
+        """Names of the values retrieved for this variable: its statistics,
+        then mean and maximum of each buffer."""
+        return [statistic.name for statistic in self.statistics] + [
+            f"buffer_{radius}m_{name}"
+            for radius in self.buffers
+            for name in ("mean", "max")
+        ]
+
     @property
     def metadata_serialized(self):
         _items = {}
@@ -109,6 +142,43 @@ class BaseGetter(metaclass=abc.ABCMeta):
         """Time resolution of the dataset."""
         raise NotImplementedError
 
+    # reads without blocking (implements _get_range_async, e.g., HTTP APIs):
+    # async callers await it instead of running it in a thread pool
+    asynchronous = False
+
+    @property
+    def thread_safe(self) -> bool:
+        """Can a single instance serve concurrent requests from several threads?
+        If not, Service keeps a bounded pool of instances, each used by one
+        thread at a time."""
+        return False
+
+    @property
+    def static(self) -> bool:
+        """Is the dataset time-invariant? Static getters implement _get_static,
+        all statistics are then the single value at the location."""
+        return False
+
+    def _get_static(
+        self,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> float:
+        """Get value for a time-invariant variable out of the (cached) input
+        dataset at a given point in space (internal)
+
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Variable to retrieve
+        :type variable: str
+        :return: Value for variable at given point in space.
+        :rtype: float
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def _get_range(
         self,
@@ -117,10 +187,13 @@ class BaseGetter(metaclass=abc.ABCMeta):
         longitude: float,
         latitude: float,
         variable: str,
-    ) -> tuple[list[datetime.datetime], list[float]]:
+    ) -> tuple[list[datetime.datetime] | np.ndarray, list[float] | np.ndarray]:
         """Get value for variable out of the (cached) input dataset
         for a given period in time and space (internal)
 
+        Times are either timezone-aware UTC datetimes, or a (naive, UTC)
+        datetime64 array.
+
         :param start_date: First date to retrieve
         :type start_date: datetime.datetime
         :param end_date: Last date to retrieve
@@ -169,14 +242,29 @@ class BaseGetter(metaclass=abc.ABCMeta):
 
         start_date, end_date = self._get_statistics_time_range(statistic, date, tz)
 
-        valid_idx = np.logical_and(all_times >= start_date, all_times <= end_date)
+        if all_times.dtype.kind == "M":
+            # datetime64 (UTC): select vectorized, only convert the selection
+            valid_idx = np.logical_and(
+                all_times >= np.datetime64(start_date.replace(tzinfo=None), "us"),
+                all_times <= np.datetime64(end_date.replace(tzinfo=None), "us"),
+            )
+        else:
+            valid_idx = np.logical_and(all_times >= start_date, all_times <= end_date)
 
-        times = all_times[valid_idx]
         values = all_values[valid_idx]
 
         if not np.any(np.isfinite(values)):
             return np.nan
 
+        times: list[datetime.datetime]
+        if all_times.dtype.kind == "M":
+            times = [
+                t.replace(tzinfo=utc)
+                for t in all_times[valid_idx].astype("datetime64[us]").tolist()
+            ]
+        else:
+            times = list(all_times[valid_idx])
+
         assert times[0].tzinfo is not None
         assert (times[0].tzinfo == utc) or (times[0].tzinfo == datetime.timezone.utc)
 
@@ -237,14 +325,97 @@ class BaseGetter(metaclass=abc.ABCMeta):
         :return: Value for variable at given point in time and space.
         :rtype: float
         """
-        result = {}
-
         # our input has to be in UTC
         assert date.tzinfo is not None
         assert date.tzinfo == utc
 
+        getter = type(self).__module__.rsplit(".", 1)[-1]
+
+        # time-invariant data: no time series, no time zone needed
+        if self.static:
+            with READ_SECONDS.time(getter=getter), stage("read"):
+                value = self._get_static(longitude, latitude, variable.name)
+            return {statistic.name: value for statistic in variable.statistics}
+
+        tz, start_date, end_date = self._get_time_range(
+            date, longitude, latitude, variable
+        )
+
+        # load data
+        with READ_SECONDS.time(getter=getter), stage("read"):
+            times, values = self._get_range(
+                start_date, end_date, longitude, latitude, variable.name
+            )
+
+        return self._get_statistics(date, times, values, variable, tz)
+
+    async def get_async(
+        self,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: Variable,
+    ) -> dict:
+        """Get value for variable out of the input dataset for a given place in
+        time and space, without blocking the event loop (asynchronous getters
+        only, see get).
+
+        :param date: Date to retrieve
+        :type date: datetime.datetime
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Variable to retrieve
+        :type variable: Variable
+        :return: Statistics for variable at given point in time and space.
+        :rtype: dict
+        """
+        assert date.tzinfo is not None
+        assert date.tzinfo == utc
+
+        getter = type(self).__module__.rsplit(".", 1)[-1]
+
+        # the time zone lookup blocks (and is serialized): not in the event loop
+        tz, start_date, end_date = await asyncio.get_running_loop().run_in_executor(
+            None,
+            in_context(self._get_time_range, date, longitude, latitude, variable),
+        )
+
+        with READ_SECONDS.time(getter=getter), stage("read", sample=False):
+            times, values = await self._get_range_async(
+                start_date, end_date, longitude, latitude, variable.name
+            )
+
+        return self._get_statistics(date, times, values, variable, tz, sample=False)
+
+    async def _get_range_async(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> tuple[Any, Any]:
+        """Values of a variable in a time range, without blocking (see
+        _get_range), for asynchronous getters."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Release resources of async callers (e.g., HTTP connections)."""
+
+    def _get_time_range(
+        self,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: Variable,
+    ) -> tuple[Any, datetime.datetime, datetime.datetime]:
+        """Time zone of the location, and the time range needed for all
+        statistics of a variable."""
         # find time zone for location
-        tzname = TF.timezone_at(lng=longitude, lat=latitude)
+        with TIMEZONE_SECONDS.time(), stage("timezone"), TF_LOCK:
+            tzname = TF.timezone_at(lng=longitude, lat=latitude)
         if tzname is None:
             raise UnknownTimeZoneError
         try:
@@ -263,23 +434,36 @@ class BaseGetter(metaclass=abc.ABCMeta):
             start_date = min(start_date, new_start_date)
             end_date = max(end_date, new_end_date)
 
-        # load data
-        _times, _values = self._get_range(
-            start_date, end_date, longitude, latitude, variable.name
-        )
+        return tz, start_date, end_date
 
-        times = np.array(_times)
-        values = np.array(_values)
+    def _get_statistics(
+        self,
+        date: datetime.datetime,
+        times: Any,
+        values: Any,
+        variable: Variable,
+        tz: Any,
+        sample: bool = True,
+    ) -> dict:
+        """All statistics of a variable (the current value is also a
+        "statistic") from its values in the time range."""
+        getter = type(self).__module__.rsplit(".", 1)[-1]
 
-        # get all statistics (the current value is also a "statistic")
-        for statistic in variable.statistics:
-            result[statistic.name] = self._calc_statistic(
-                date,
-                times,
-                values,
-                statistic,
-                tz=tz,
-            )
+        times = np.array(times)
+        values = np.array(values)
+
+        result = {}
+        with STATISTICS_SECONDS.time(getter=getter), stage(
+            "statistics", sample=sample
+        ):
+            for statistic in variable.statistics:
+                result[statistic.name] = self._calc_statistic(
+                    date,
+                    times,
+                    values,
+                    statistic,
+                    tz=tz,
+                )
 
         return result
 
@@ -288,13 +472,20 @@ class Service:
     """An environmental factors service providing one or several
     variables from a common source dataset."""
 
-    def __init__(self, config: dict | OrderedDict | confuse.Configuration) -> None:
+    def __init__(
+        self,
+        config: dict | OrderedDict | confuse.Configuration,
+        max_getters: int = 16,
+    ) -> None:
         """A service is created based on the provided configuration.
         A service is a python module with methods to load and get variable data.
 
         :param config: Configuration of the service, needs to contain
         information on input and output config.
         :type config: dict | OrderedDict | confuse.Configuration
+        :param max_getters: Instances of a getter that is not thread-safe
+        (retrievals running at the same time), defaults to 16
+        :type max_getters: int, optional
         """
         self.variables: list[Variable] = self._load_variables(
             os.path.join(config["metadata"], "variables")
@@ -304,12 +495,30 @@ class Service:
             open(os.path.join(config["metadata"], "metadata.yaml"), "rb"),
             yaml.SafeLoader,
         )
+        # static, build once
+        self._metadata_cache = {
+            "service": self._metadata,
+            "variables": {
+                variable.name: variable.metadata for variable in self.variables
+            },
+        }
 
         self._loader: None | BaseLoader = None
         self._loader_config = config["input"]
 
+        # thread-safe getters are shared, others are pooled (idle instances
+        # are reused by any thread, at most max_getters exist)
         self._getter: None | BaseGetter = None
+        self._idle_getters: list[BaseGetter] = []
+        self._getter_slots = threading.BoundedSemaphore(max_getters)
+        self._getter_lock = threading.Lock()
         self._getter_config = config["output"]
+        # getter of async callers (event loop thread)
+        self._loop_getter: None | BaseGetter = None
+
+        # async callers await asynchronous getters, others run in threads
+        self._getter_class = load_callable(self._getter_config["module"], "Getter")
+        self.asynchronous: bool = getattr(self._getter_class, "asynchronous", False)
 
     def _load_variables(self, variable_path) -> list[Variable]:
         _variables: list[Variable] = []
@@ -337,19 +546,81 @@ class Service:
 
         self._loader.load(start_date, end_date)
 
+    def _new_getter(self) -> BaseGetter:
+        """Create a getter (open datasets), the shared instance if it is
+        thread-safe. Call with _getter_lock held."""
+        getter = self._getter_class(**self._getter_config["config"])
+        if getter.thread_safe:
+            self._getter = getter
+        else:
+            logger.debug("Created a getter instance for the pool")
+        return getter
+
+    @contextmanager
+    def _use_getter(self) -> Iterator[BaseGetter]:
+        """Getter for one retrieval: the shared instance if the getter is
+        thread-safe, otherwise an idle instance of the pool (waits if all
+        max_getters instances are in use).
+
+        :return: Getter
+        :rtype: Iterator[BaseGetter]
+        """
+        # getters are created (datasets opened) on first use
+        with stage("getter_setup"):
+            getter = self._getter
+            if getter is None:
+                self._getter_slots.acquire()
+                try:
+                    with self._getter_lock:
+                        if self._getter is not None:
+                            getter = self._getter
+                        elif self._idle_getters:
+                            getter = self._idle_getters.pop()
+                        else:
+                            getter = self._new_getter()
+                except BaseException:
+                    self._getter_slots.release()
+                    raise
+                if getter is self._getter:
+                    self._getter_slots.release()
+
+        if getter is self._getter:
+            yield getter
+            return
+
+        try:
+            yield getter
+        finally:
+            with self._getter_lock:
+                self._idle_getters.append(getter)
+            self._getter_slots.release()
+
+    def _get_loop_getter(self) -> BaseGetter:
+        """Getter of async callers, which all run in the event loop thread:
+        the shared instance, or an instance of their own.
+
+        :return: Getter
+        :rtype: BaseGetter
+        """
+        if self._loop_getter is None:
+            with self._getter_lock:
+                self._loop_getter = self._getter or self._new_getter()
+        return self._loop_getter
+
     def metadata(self) -> dict[str, dict]:
-        metadata = {"service": self._metadata}
-        metadata["variables"] = {
-            variable.name: variable.metadata for variable in self.variables
-        }
+        """Service and variable metadata (shared, do not modify).
 
-        return metadata
+        :return: Metadata of the service and its variables
+        :rtype: dict[str, dict]
+        """
+        return self._metadata_cache
 
     def get(
         self,
         date: datetime.datetime,
         longitude: float,
         latitude: float,
+        include_metadata: bool = True,
     ) -> dict[str, dict]:
         """Retrieve values for (a subset of) the variables in this dataset at
         a given point in time and space.
@@ -360,17 +631,69 @@ class Service:
         :type longitude: float
         :param latitude: Geographical latitude
         :type latitude: float
+        :param include_metadata: Add service and variable metadata, defaults to True
+        :type include_metadata: bool, optional
+        :return: Values of all requested variables, and metadata for each variable
+        :rtype: dict[str, dict]
+        """
+        values = {}
+        with self._use_getter() as getter:
+            for variable in self.variables:
+                with stage("variables", variable.name):
+                    values[variable.name] = getter.get(
+                        date, longitude, latitude, variable
+                    )
+
+        result: dict[str, dict] = {"values": values}
+        if include_metadata:
+            result["metadata"] = self.metadata()
+
+        return result
+
+    async def get_async(
+        self,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        include_metadata: bool = True,
+    ) -> dict[str, dict]:
+        """Retrieve values for (a subset of) the variables in this dataset at
+        a given point in time and space, without blocking the event loop, the
+        variables concurrently (asynchronous getters only, see get).
+
+        :param date: Date to retrieve
+        :type date: datetime.datetime
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param include_metadata: Add service and variable metadata, defaults to True
+        :type include_metadata: bool, optional
         :return: Values of all requested variables, and metadata for each variable
         :rtype: dict[str, dict]
         """
-        if self._getter is None:
-            output_class = load_callable(self._getter_config["module"], "Getter")
-            self._getter = output_class(**self._getter_config["config"])
+        with stage("getter_setup", sample=False):
+            getter = self._get_loop_getter()
 
-        return {
+        async def get_variable(variable: Variable) -> dict:
+            with stage("variables", variable.name, sample=False):
+                return await getter.get_async(date, longitude, latitude, variable)
+
+        values = await asyncio.gather(
+            *(get_variable(variable) for variable in self.variables)
+        )
+
+        result: dict[str, dict] = {
             "values": {
-                variable.name: self._getter.get(date, longitude, latitude, variable)
-                for variable in self.variables
-            },
-            "metadata": self.metadata(),
+                variable.name: value for variable, value in zip(self.variables, values)
+            }
         }
+        if include_metadata:
+            result["metadata"] = self.metadata()
+
+        return result
+
+    async def aclose(self) -> None:
+        """Close the connections of an asynchronous getter (async callers)."""
+        if self._loop_getter is not None:
+            await self._loop_getter.aclose()
@@ -0,0 +1,151 @@
+"""Envirodata service for station datasets cached in a CacheDB."""
+
+import abc
+import datetime
+import logging
+import time
+from typing import Iterator
+
+import numpy as np
+
+from envirodata.services.base import BaseLoader, BaseGetter
+from envirodata.utils.cacheDB import CacheDB
+from envirodata.utils.general import load_callable
+
+logger = logging.getLogger(__name__)
+
+
+class StationSource(metaclass=abc.ABCMeta):
+    """Blueprint of a station dataset that can be loaded into a CacheDB.
+
+    Configured in the loader config as ``source: {module, name, config}``.
+    """
+
+    @abc.abstractmethod
+    def observations(
+        self,
+        start_date: datetime.datetime | None,
+        end_date: datetime.datetime | None,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """Observations between given dates, in batches of aligned arrays
+        with the arguments of CacheDB.insert_many (station_ids, longitudes,
+        latitudes, parameters, dates, values). Later batches supersede
+        earlier ones.
+
+        :param start_date: First date to load (None: from the beginning)
+        :type start_date: datetime.datetime | None
+        :param end_date: Last date to load (None: to the end)
+        :type end_date: datetime.datetime | None
+        :return: Batches of observations
+        :rtype: Iterator[dict[str, np.ndarray]]
+        """
+        raise NotImplementedError
+
+
+class Loader(BaseLoader):
+    """Load (cache) a station dataset into a CacheDB."""
+
+    def __init__(self, db_url: str, source: dict) -> None:
+        """Load (cache) a station dataset into a CacheDB.
+
+        :param db_url: (SQLAlchemy) URI of the cache DB
+        :type db_url: str
+        :param source: Station source: module, name and config (keyword
+        arguments) of a StationSource
+        :type source: dict
+        """
+        # own connections, tuned for bulk loading (not shared with getters)
+        self.cache = CacheDB(db_url, bulk_load=True)
+
+        source_class = load_callable(source["module"], source["name"])
+        self.source: StationSource = source_class(**source.get("config", {}))
+
+    def load(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+    ) -> None:
+        """Load (cache) all data between given dates.
+
+        :param start_date: First date to load
+        :type start_date: datetime.datetime
+        :param end_date: Last date to load
+        :type end_date: datetime.datetime
+        """
+        # migrating drops tables, it is run explicitly (migrate_cachedb)
+        if self.cache.legacy_station_tables():
+            logger.warning(
+                "Cache DB has per-station tables of the old layout, "
+                "their values are not used until migrated (migrate_cachedb)."
+            )
+
+        n_rows = 0
+        t_start = time.perf_counter()
+        for batch in self.source.observations(start_date, end_date):
+            n_rows += self.cache.insert_many(
+                batch["station_ids"],
+                batch["longitudes"],
+                batch["latitudes"],
+                batch["parameters"],
+                batch["dates"],
+                batch["values"],
+            )
+
+        elapsed = time.perf_counter() - t_start
+        logger.info(
+            "Cached %d values (%.0f rows/s)", n_rows, n_rows / max(elapsed, 1e-9)
+        )
+
+
+class Getter(BaseGetter):
+    """Get values of the nearest station with data from a CacheDB."""
+
+    def __init__(self, db_url: str, time_resolution_minutes: int = 60) -> None:
+        """Get values of the nearest station with data from a CacheDB.
+
+        :param db_url: (SQLAlchemy) URI of the cache DB
+        :type db_url: str
+        :param time_resolution_minutes: Time resolution of the dataset,
+        defaults to 60
+        :type time_resolution_minutes: int, optional
+        """
+        self.cache = CacheDB(db_url)
+        self._time_resolution = datetime.timedelta(minutes=time_resolution_minutes)
+
+    @property
+    def time_resolution(self):
+        """Time resolution of the dataset."""
+        return self._time_resolution
+
+    @property
+    def thread_safe(self) -> bool:
+        """Pooled connections, station index guarded by a lock."""
+        return True
+
+    def _get_range(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get values for variable of the nearest station that has data in the
+        given period.
+
+        :param start_date: First date to retrieve
+        :type start_date: datetime.datetime
+        :param end_date: Last date to retrieve
+        :type end_date: datetime.datetime
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Variable to retrieve
+        :type variable: str
+        :return: Times (UTC, datetime64) and values, empty if nothing found
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        return self.cache.get_range(
+            longitude, latitude, start_date, end_date, variable
+        )
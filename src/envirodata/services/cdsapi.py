@@ -4,6 +4,7 @@ import os
 import logging
 import datetime
 import copy
+import threading
 from typing import Any
 
 import cdsapi  # type: ignore
@@ -11,9 +12,14 @@ import netCDF4  # type: ignore
 import numpy as np
 
 from envirodata.services.base import BaseLoader, BaseGetter
+from envirodata.utils.spatial import haversine_vectorized
 
 logger = logging.getLogger(__name__)
 
+# the HDF5 library underneath netCDF4 is not thread-safe (even with separate
+# handles), serialize all access
+NETCDF_LOCK = threading.RLock()
+
 
 class Loader(BaseLoader):
     """Load (cache) cdsapi dataset."""
@@ -147,8 +153,9 @@ class Loader(BaseLoader):
                 )
 
         try:
-            nc = netCDF4.Dataset(output_fname)  # pylint: disable=no-member
-            nc.close()
+            with NETCDF_LOCK:
+                nc = netCDF4.Dataset(output_fname)  # pylint: disable=no-member
+                nc.close()
         except Exception as exc:
             raise IOError(f"No data found for {date.isoformat()}!") from exc
 
@@ -190,6 +197,12 @@ class Getter(BaseGetter):
         """Time resolution of the dataset."""
         return datetime.timedelta(hours=1)
 
+    @property
+    def thread_safe(self) -> bool:
+        """NetCDF access (and caching the grid) is serialized through
+        NETCDF_LOCK."""
+        return True
+
     def _calc_time_since_analysis(
         self, date: datetime.datetime, nc: netCDF4.Dataset  # pylint: disable=no-member
     ) -> list[datetime.datetime]:
@@ -262,14 +275,31 @@ class Getter(BaseGetter):
 
         output_fname = start_date.strftime(self.cache_fpath_pattern)
 
-        try:
-            nc = netCDF4.Dataset(output_fname)  # pylint: disable=no-member
-        except OSError as exc:
-            logger.info(
-                "No data found for {:s}!".format(start_date.strftime("%Y-%m-%d"))
-            )
-            raise exc
+        with NETCDF_LOCK:
+            try:
+                nc = netCDF4.Dataset(output_fname)  # pylint: disable=no-member
+            except OSError as exc:
+                logger.info(
+                    "No data found for {:s}!".format(start_date.strftime("%Y-%m-%d"))
+                )
+                raise exc
+
+            try:
+                return self._get_from_nc(
+                    nc, start_date, end_date, longitude, latitude, variable
+                )
+            finally:
+                nc.close()
 
+    def _get_from_nc(
+        self,
+        nc: netCDF4.Dataset,  # pylint: disable=no-member
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> tuple[list[datetime.datetime], list[float]]:
         lons, lats = self._get_lons_lats(nc)
 
         times = self.calc_time(start_date, nc)
@@ -279,11 +309,12 @@ class Getter(BaseGetter):
         )[0]
 
         def _get_index(lons, lats, lon, lat):
-            ddelta = (lons - lon) ** 2 + (lats - lat) ** 2
-            idxes = np.where(ddelta == np.min(ddelta))
-            return (idxes[0][0], idxes[1][0])
+            distance = haversine_vectorized(lat, lon, lats, lons)
+            # (latitude, longitude) index, as in meshgrid output
+            idxes = np.unravel_index(np.argmin(distance), distance.shape)
+            return (idxes[0], idxes[1])
 
-        xidx, yidx = _get_index(lons, lats, longitude, latitude)
+        yidx, xidx = _get_index(lons, lats, longitude, latitude)
 
         chosen_times = [times[i] for i in tidxes]
 
@@ -3,33 +3,142 @@
 import logging
 import os
 import datetime
+import functools
+import tempfile
+import time
+from typing import Iterator
 from sqlalchemy import (
     create_engine,
+    inspect,
+    insert,
+    text,
     Table,
     Column,
+    Index,
+    BigInteger,
     Integer,
     Float,
     String,
     MetaData,
     select,
 )
-from sqlalchemy.ext.automap import automap_base
-from sqlalchemy.orm import Session
-from sqlalchemy.engine import make_url
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.engine import Connection, Engine, make_url
 import pandas as pd
-import random
 
 import numpy as np
 
 from envirodata.services.base import BaseLoader, BaseGetter
-from envirodata.utils.general import copy_or_download
-from envirodata.utils.spatial import calculate_inspire_grid_id
+from envirodata.utils.general import copy_or_download, configure_sqlite_for_bulk_load
+from envirodata.utils.metrics import CACHE_LOOKUPS, CACHE_MISSES
+from envirodata.utils.spatial import (
+    GRID_DTYPE,
+    GridArray,
+    calculate_inspire_grid_id,
+    calculate_inspire_grid_indices,
+    decode_grid_key,
+    encode_grid_key,
+    format_inspire_grid_ids,
+    parse_inspire_grid_ids,
+)
 
 logger = logging.getLogger(__name__)
 
 TIME_RESOLUTION = datetime.timedelta(hours=1)
 
+# rows of the census csv read (and inserted) at once
+CSV_CHUNK_SIZE = 100000
+
+# (integer) key column of the wide layout table
+GRID_KEY_FIELD = "grid_key"
+
+# number of cells (all variables) kept in memory by the Getter (wide layout)
+CELL_CACHE_SIZE = 4096
+
+# maximum number of cells per SQL query in batch lookups
+SQL_IN_CHUNK_SIZE = 500
+
+
+def read_grid_from_db(
+    engine: Engine,
+    table: Table,
+    variable_name: str,
+    grid_id_field: str,
+    fpath: str | None = None,
+    chunk_size: int = CSV_CHUNK_SIZE,
+) -> GridArray:
+    """Materialize a variable stored in the DB as a dense grid.
+
+    :param engine: DB engine
+    :type engine: Engine
+    :param table: Table holding the variable
+    :type table: Table
+    :param variable_name: Variable (and column) name
+    :type variable_name: str
+    :param grid_id_field: Column with the INSPIRE grid ID (or integer grid key)
+    :type grid_id_field: str
+    :param fpath: Write grid to this path (without extension), defaults to None
+    :type fpath: str | None, optional
+    :param chunk_size: Number of rows read at once, defaults to CSV_CHUNK_SIZE
+    :type chunk_size: int, optional
+    :return: Grid
+    :rtype: GridArray
+    """
+    stmt = select(table.c[grid_id_field], table.c[variable_name])
+
+    north_idx, east_idx, values = [], [], []
+    with engine.connect() as conn:
+        for chunk in pd.read_sql(stmt, conn, chunksize=chunk_size):
+            if pd.api.types.is_integer_dtype(chunk[grid_id_field]):
+                _north_idx, _east_idx = decode_grid_key(chunk[grid_id_field])
+            else:
+                _north_idx, _east_idx = parse_inspire_grid_ids(chunk[grid_id_field])
+            north_idx.append(_north_idx)
+            east_idx.append(_east_idx)
+            values.append(
+                pd.to_numeric(chunk[variable_name], errors="coerce").to_numpy(
+                    dtype=GRID_DTYPE
+                )
+            )
+
+    if len(values) == 0:
+        raise ValueError(f"No data found for {variable_name}")
+
+    return GridArray.from_cells(
+        np.concatenate(north_idx),
+        np.concatenate(east_idx),
+        np.concatenate(values),
+        fpath=fpath,
+    )
+
+
+def upsert_statement(engine: Engine, table: Table, variable_name: str):
+    """Insert statement for one variable of the wide layout table that updates
+    the variable if the grid cell exists already.
+
+    :param engine: DB engine
+    :type engine: Engine
+    :param table: Wide layout table
+    :type table: Table
+    :param variable_name: Variable (and column) name
+    :type variable_name: str
+    :raises ValueError: DB does not support upserts
+    :return: Insert statement
+    """
+    stmt: sqlite.Insert | postgresql.Insert
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(table)
+    elif engine.dialect.name == "postgresql":
+        stmt = postgresql.insert(table)
+    else:
+        raise ValueError(f"Wide layout not supported for {engine.dialect.name}")
+
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[GRID_KEY_FIELD]],
+        set_={variable_name: stmt.excluded[variable_name]},
+    )
+
 
 class Loader(BaseLoader):
     """Load dataset."""
@@ -42,6 +151,10 @@ class Loader(BaseLoader):
         decimal: str = ",",
         grid_id_field: str = "GITTER_ID_100m",
         cache_path: str = "cache",
+        chunk_size: int = CSV_CHUNK_SIZE,
+        grid_path: str | None = None,
+        layout: str = "tables",
+        wide_table: str = "census",
     ) -> None:
         """Load dataset into local cache.
 
@@ -51,13 +164,30 @@ class Loader(BaseLoader):
         :type db_url: str
         :param separator: csv field separator character, defaults to ';'
         :type separator: str
+        :param chunk_size: Number of csv rows read and inserted at once,
+        defaults to CSV_CHUNK_SIZE
+        :type chunk_size: int
+        :param grid_path: Directory to write dense grid files for the Getter
+        to memory-map, defaults to None (no grid files)
+        :type grid_path: str | None
+        :param layout: "tables" (one table per csv) or "wide" (one table with
+        all variables keyed by an integer grid key), defaults to "tables"
+        :type layout: str
+        :param wide_table: Name of the table for the wide layout, defaults to "census"
+        :type wide_table: str
 
         """
+        if layout not in ("tables", "wide"):
+            raise ValueError(f"Unknown layout {layout}")
+
         self.csv_paths = csv_paths
         self.csv_separator = separator
         self.csv_decimal = decimal
         self.db_url = db_url
         self.grid_id_field = grid_id_field
+        self.chunk_size = chunk_size
+        self.layout = layout
+        self.wide_table = wide_table
 
         logger.debug("Memory DB located at %s", db_url)
 
@@ -70,26 +200,25 @@ class Loader(BaseLoader):
         self.cache_path = cache_path
         os.makedirs(self.cache_path, exist_ok=True)
 
-    def _load_csv(self, variable_name: str, csv_path: str):
-        tmp_path = os.path.join(
-            self.cache_path, str(random.randint(10, 1000000)) + ".csv"
-        )
-        copy_or_download(
-            csv_path,
-            tmp_path,
-        )
-
-        # https://medium.com/@anusoosanbaby/efficiently-importing-csv-data-into-postgresql-using-python-and-sqlalchemy-052693aa921a
-        df = pd.read_csv(tmp_path, sep=self.csv_separator, decimal=self.csv_decimal)
-
-        try:
-            os.remove(tmp_path)
-        except FileNotFoundError:
-            pass
-
-        engine = create_engine(self.db_url)
-
-        metadata = MetaData()
+        self.grid_path = grid_path
+        if self.grid_path is not None:
+            os.makedirs(self.grid_path, exist_ok=True)
+
+    def _create_table(
+        self, conn: Connection, variable_name: str, dtypes: pd.Series
+    ) -> Table:
+        """Create table for a variable, column types inferred from (the first
+        chunk of) the csv.
+
+        :param conn: DB connection
+        :type conn: Connection
+        :param variable_name: Variable (and table) name
+        :type variable_name: str
+        :param dtypes: pandas dtypes of the csv columns
+        :type dtypes: pd.Series
+        :return: Table
+        :rtype: Table
+        """
 
         def infer_sqlalchemy_type(dtype):
             """Map pandas dtype to SQLAlchemy's types"""
@@ -103,23 +232,259 @@ class Loader(BaseLoader):
                 return String
 
         columns: list[Column] = [
-            Column(
-                str(name),
-                infer_sqlalchemy_type(dtype),
-                primary_key=(name == self.grid_id_field),  # make grid ID a primary key
-            )
-            for name, dtype in df.dtypes.items()
+            Column(str(name), infer_sqlalchemy_type(dtype))
+            for name, dtype in dtypes.items()
         ]
 
-        table = Table(variable_name, metadata, *columns)
+        table = Table(variable_name, MetaData(), *columns)
+        table.create(conn)
 
-        try:
-            table.create(engine)
-        except OperationalError:
+        return table
+
+    def _read_csv_chunks(self, csv_path: str) -> Iterator[pd.DataFrame]:
+        return pd.read_csv(
+            csv_path,
+            sep=self.csv_separator,
+            decimal=self.csv_decimal,
+            chunksize=self.chunk_size,
+        )
+
+    def _prepare_wide_table(self, engine: Engine) -> Table:
+        """Create the wide layout table, or add missing variable columns.
+
+        :param engine: DB engine
+        :type engine: Engine
+        :return: Wide layout table
+        :rtype: Table
+        """
+        if not inspect(engine).has_table(self.wide_table):
+            Table(
+                self.wide_table,
+                MetaData(),
+                Column(GRID_KEY_FIELD, BigInteger, primary_key=True),
+                *[Column(str(name), Float) for name in self.csv_paths],
+            ).create(engine)
+        else:
+            columns = [c["name"] for c in inspect(engine).get_columns(self.wide_table)]
+            quote = engine.dialect.identifier_preparer.quote
+            with engine.begin() as conn:
+                for name in self.csv_paths:
+                    if name not in columns:
+                        logger.info("Adding %s to %s", name, self.wide_table)
+                        conn.execute(
+                            text(
+                                f"ALTER TABLE {quote(self.wide_table)} "
+                                f"ADD COLUMN {quote(name)} FLOAT"
+                            )
+                        )
+
+        metadata = MetaData()
+        metadata.reflect(bind=engine, only=[self.wide_table])
+
+        return metadata.tables[self.wide_table]
+
+    def _has_wide_variable(self, engine: Engine, variable_name: str) -> bool:
+        """Has the variable been loaded into the wide layout table yet?"""
+        table = self._prepare_wide_table(engine)
+        stmt = select(table.c[GRID_KEY_FIELD]).where(
+            table.c[variable_name].is_not(None)
+        )
+        with engine.connect() as conn:
+            return conn.execute(stmt.limit(1)).first() is not None
+
+    def _upsert_wide(
+        self,
+        conn: Connection,
+        stmt,
+        variable_name: str,
+        grid_ids: pd.Series,
+        values: pd.Series,
+    ) -> None:
+        """Insert (or update) values of a variable in the wide layout table.
+
+        :param conn: DB connection
+        :type conn: Connection
+        :param stmt: Upsert statement for this variable
+        :param variable_name: Variable (and column) name
+        :type variable_name: str
+        :param grid_ids: INSPIRE grid IDs
+        :type grid_ids: pd.Series
+        :param values: Values
+        :type values: pd.Series
+        """
+        grid_keys = encode_grid_key(*parse_inspire_grid_ids(grid_ids))
+        _values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+
+        # NaN -> NULL
+        records = [
+            {GRID_KEY_FIELD: int(key), variable_name: None if np.isnan(v) else v}
+            for key, v in zip(grid_keys, _values.tolist())
+        ]
+        conn.execute(stmt, records)
+
+    def _ingest_csv_wide(
+        self, engine: Engine, variable_name: str, csv_path: str
+    ) -> None:
+        """Stream a csv into the wide layout table in chunks of bounded size.
+
+        :param engine: DB engine
+        :type engine: Engine
+        :param variable_name: Variable (and column) name
+        :type variable_name: str
+        :param csv_path: Path to (local) csv
+        :type csv_path: str
+        """
+        table = self._prepare_wide_table(engine)
+        stmt = upsert_statement(engine, table, variable_name)
+
+        n_rows = 0
+        t_start = time.perf_counter()
+
+        with engine.begin() as conn:
+            for chunk in self._read_csv_chunks(csv_path):
+                self._upsert_wide(
+                    conn, stmt, variable_name, chunk[self.grid_id_field], chunk[variable_name]
+                )
+
+                n_rows += len(chunk)
+                logger.info(
+                    "Loaded %d rows of %s into %s (%.0f rows/s)",
+                    n_rows,
+                    variable_name,
+                    self.wide_table,
+                    n_rows / (time.perf_counter() - t_start),
+                )
+
+    def migrate_to_wide(self) -> None:
+        """Migrate an existing cache with one table per variable into the
+        wide layout table (old tables are kept)."""
+        engine = create_engine(self.db_url)
+        configure_sqlite_for_bulk_load(engine)
+
+        table = self._prepare_wide_table(engine)
+
+        for variable_name in self.csv_paths:
+            if not inspect(engine).has_table(variable_name):
+                logger.warning("No table for %s, skipping.", variable_name)
+                continue
+            if self._has_wide_variable(engine, variable_name):
+                logger.info(f"{variable_name} already migrated, skipping.")
+                continue
+
+            metadata = MetaData()
+            metadata.reflect(bind=engine, only=[variable_name])
+            source = metadata.tables[variable_name]
+
+            stmt = upsert_statement(engine, table, variable_name)
+            source_stmt = select(
+                source.c[self.grid_id_field], source.c[variable_name]
+            )
+
+            n_rows = 0
+            with engine.begin() as conn:
+                for chunk in pd.read_sql(
+                    source_stmt, conn.engine, chunksize=self.chunk_size
+                ):
+                    self._upsert_wide(
+                        conn,
+                        stmt,
+                        variable_name,
+                        chunk[self.grid_id_field],
+                        chunk[variable_name],
+                    )
+                    n_rows += len(chunk)
+                    logger.info("Migrated %d rows of %s", n_rows, variable_name)
+
+            logger.info(
+                "Migrated %s into %s, table %s can be dropped.",
+                variable_name,
+                self.wide_table,
+                variable_name,
+            )
+
+    def _ingest_csv(self, engine: Engine, variable_name: str, csv_path: str) -> None:
+        """Stream a csv into a new table in chunks of bounded size. All chunks
+        are inserted in a single transaction, the grid ID index is created
+        after loading.
+
+        :param engine: DB engine
+        :type engine: Engine
+        :param variable_name: Variable (and table) name
+        :type variable_name: str
+        :param csv_path: Path to (local) csv
+        :type csv_path: str
+        """
+        n_rows = 0
+        t_start = time.perf_counter()
+
+        with engine.begin() as conn:
+            table = None
+            for chunk in self._read_csv_chunks(csv_path):
+                if table is None:
+                    table = self._create_table(conn, variable_name, chunk.dtypes)
+
+                # NaN -> NULL
+                records = (
+                    chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+                )
+                conn.execute(insert(table), records)
+
+                n_rows += len(chunk)
+                logger.info(
+                    "Loaded %d rows into %s (%.0f rows/s)",
+                    n_rows,
+                    variable_name,
+                    n_rows / (time.perf_counter() - t_start),
+                )
+
+            if table is None:
+                logger.critical("No data found in %s", csv_path)
+                return
+
+            Index(
+                f"ix_{variable_name}_{self.grid_id_field}",
+                table.c[self.grid_id_field],
+                unique=True,
+            ).create(conn)
+
+        logger.info(
+            "Loaded %s: %d rows in %.1f s",
+            variable_name,
+            n_rows,
+            time.perf_counter() - t_start,
+        )
+
+    def _load_csv(self, variable_name: str, csv_path: str):
+        engine = create_engine(self.db_url)
+        configure_sqlite_for_bulk_load(engine)
+
+        if self.layout == "wide":
+            if self._has_wide_variable(engine, variable_name):
+                logger.info(f"{variable_name} already loaded, not updating.")
+                return
+        elif inspect(engine).has_table(variable_name):
             logger.info(f"Table {variable_name} already exists, not updating.")
             return
 
-        df.to_sql(variable_name, con=engine, if_exists="append", index=False)
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_path, suffix=".csv", delete=False
+        ) as tmp:
+            tmp_path = tmp.name
+
+        try:
+            copy_or_download(
+                csv_path,
+                tmp_path,
+            )
+            if self.layout == "wide":
+                self._ingest_csv_wide(engine, variable_name, tmp_path)
+            else:
+                self._ingest_csv(engine, variable_name, tmp_path)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
 
     def load(
         self,
@@ -137,6 +502,39 @@ class Loader(BaseLoader):
         for variable_name, csv_path in self.csv_paths.items():
             self._load_csv(variable_name, csv_path)
 
+            if self.grid_path is not None:
+                self._write_grid(variable_name)
+
+    def _write_grid(self, variable_name: str) -> None:
+        """Write dense grid file for a variable (if not there yet).
+
+        :param variable_name: Variable name
+        :type variable_name: str
+        """
+        assert self.grid_path is not None
+        fpath = os.path.join(self.grid_path, variable_name)
+        if GridArray.exists(fpath):
+            logger.info(f"Grid for {variable_name} already exists, not updating.")
+            return
+
+        engine = create_engine(self.db_url)
+
+        table_name, key_field = variable_name, self.grid_id_field
+        if self.layout == "wide":
+            table_name, key_field = self.wide_table, GRID_KEY_FIELD
+
+        metadata = MetaData()
+        metadata.reflect(bind=engine, only=[table_name])
+
+        read_grid_from_db(
+            engine,
+            metadata.tables[table_name],
+            variable_name,
+            key_field,
+            fpath=fpath,
+        )
+        logger.info("Wrote grid for %s", variable_name)
+
 
 class Getter(BaseGetter):
     """Get values from cached dataset."""
@@ -146,31 +544,109 @@ class Getter(BaseGetter):
         db_url: str,
         grid_id_field: str = "GITTER_ID_100m",
         resolution: int = 100,
+        grid_path: str | None = None,
+        materialize: bool = False,
+        layout: str = "tables",
+        wide_table: str = "census",
     ):
         """Get values from cached dataset.
 
-        :param cache_path: Path to data cache
-        :type cache_path: str | pathlib.Path
-        :param output_crs: pyproj string describing output CRS, defaults to "EPSG:4326"
+        :param db_url: Path to DB connection
+        :type db_url: str
+        :param grid_id_field: Column with the INSPIRE grid ID,
+        defaults to "GITTER_ID_100m"
+        :type grid_id_field: str
+        :param resolution: Grid cell size (m), defaults to 100
+        :type resolution: int
+        :param grid_path: Directory with dense grid files written by the Loader
+        (memory-mapped), defaults to None
+        :type grid_path: str | None
+        :param materialize: Without grid files, read all variables from the DB
+        into in-memory dense grids at startup, defaults to False
+        :type materialize: bool
+        :param layout: "tables" (one table per variable) or "wide" (one table
+        with all variables keyed by an integer grid key), defaults to "tables"
+        :type layout: str
+        :param wide_table: Name of the table for the wide layout, defaults to "census"
+        :type wide_table: str
 
         """
+        if layout not in ("tables", "wide"):
+            raise ValueError(f"Unknown layout {layout}")
 
         self.resolution = resolution
         self.grid_field_id = grid_id_field
-
-        # table needs primary key for this to work!
-        self.base = automap_base()
+        self.layout = layout
 
         engine = create_engine(db_url)
 
-        self.base.prepare(autoload_with=engine)
-        self.session = Session(engine)
+        self.metadata = MetaData()
+        self.metadata.reflect(bind=engine)
+        # one session per thread
+        self.session = scoped_session(sessionmaker(engine))
+
+        # table holding each variable
+        self.tables: dict[str, Table] = {}
+        if self.layout == "wide":
+            self.wide_table = self.metadata.tables[wide_table]
+            self.tables = {
+                column.name: self.wide_table
+                for column in self.wide_table.columns
+                if column.name != GRID_KEY_FIELD
+            }
+            key_field = GRID_KEY_FIELD
+        else:
+            self.tables = {
+                name: table
+                for name, table in self.metadata.tables.items()
+                if name in table.columns
+            }
+            key_field = self.grid_field_id
+
+        # all variables of a cell are fetched at once (wide layout)
+        self._get_cell = functools.lru_cache(maxsize=CELL_CACHE_SIZE)(
+            self._query_cell
+        )
+
+        # variables available as dense grids are looked up by array indexing
+        self.grids: dict[str, GridArray] = {}
+        for variable, table in self.tables.items():
+            if grid_path is not None:
+                fpath = os.path.join(grid_path, variable)
+                if GridArray.exists(fpath):
+                    self.grids[variable] = GridArray.load(fpath)
+                else:
+                    logger.warning("No grid file for %s, using DB.", variable)
+            elif materialize:
+                logger.info("Materializing grid for %s", variable)
+                self.grids[variable] = read_grid_from_db(
+                    engine, table, variable, key_field
+                )
 
     @property
     def time_resolution(self):
         """Time resolution of the dataset."""
         return datetime.timedelta(days=1)  # useless?
 
+    @property
+    def thread_safe(self) -> bool:
+        """Sessions are thread-local, grids are read-only."""
+        return True
+
+    @property
+    def static(self) -> bool:
+        """Census data is time-invariant."""
+        return True
+
+    def _get_static(
+        self,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> float:
+        _, value = self._get(None, longitude, latitude, variable)
+        return value
+
     def _get_range(
         self,
         start_date: datetime.datetime,
@@ -182,32 +658,21 @@ class Getter(BaseGetter):
 
         logger.debug("Assuming time invariant fields!")
 
-        # just get once, then repeat (faster)
-        _, value = self._get(end_date, longitude, latitude, variable)
+        _, value = self._get(start_date, longitude, latitude, variable)
 
-        times = []
-        values = []
-        cur_date = start_date
-        while cur_date < end_date:
-            times.append(cur_date)
-            values.append(value)
-            cur_date += self.time_resolution
-        times.append(end_date)
-        values.append(value)
-
-        return times, values
+        return [start_date], [value]
 
     def _get(
         self,
-        date: datetime.datetime,
+        date: datetime.datetime | None,
         longitude: float,
         latitude: float,
         variable: str,
-    ) -> tuple[datetime.datetime, float]:
+    ) -> tuple[datetime.datetime | None, float]:
         """Get value for variable out of cached NetCDF4 file
 
-        :param date: Date to retrieve
-        :type date: datetime.datetime
+        :param date: Date to retrieve (None for static lookups)
+        :type date: datetime.datetime | None
         :param longitude: Geographical longitude
         :type longitude: float
         :param latitude: Geographical latitude
@@ -218,14 +683,28 @@ class Getter(BaseGetter):
         :rtype: float
         """
 
+        if variable in self.grids:
+            north_idx, east_idx = calculate_inspire_grid_indices(
+                longitude, latitude, cell_size=self.resolution
+            )
+            return date, float(self.grids[variable].lookup(north_idx, east_idx)[0])
+
+        if self.layout == "wide":
+            grid_key = encode_grid_key(
+                *calculate_inspire_grid_indices(
+                    longitude, latitude, cell_size=self.resolution
+                )
+            )
+            CACHE_LOOKUPS.inc(cache="destatis_cell")
+            return date, self._get_cell(int(grid_key)).get(variable, np.nan)
+
         grid_id = calculate_inspire_grid_id(
             longitude, latitude, cell_size=self.resolution
         )
 
-        grid_column = getattr(self.base.classes[variable], self.grid_field_id)
-        var_column = getattr(self.base.classes[variable], variable)
+        table = self.tables[variable]
 
-        stmt = select(var_column).where(grid_column == grid_id)
+        stmt = select(table.c[variable]).where(table.c[self.grid_field_id] == grid_id)
 
         row = self.session.scalars(stmt).first()
 
@@ -235,3 +714,70 @@ class Getter(BaseGetter):
             value = np.nan
 
         return date, value
+
+    def _query_cell(self, grid_key: int) -> dict[str, float]:
+        """Get all variables of a grid cell from the wide layout table.
+
+        :param grid_key: Integer grid key
+        :type grid_key: int
+        :return: Values by variable name (variables without value are left out)
+        :rtype: dict[str, float]
+        """
+        CACHE_MISSES.inc(cache="destatis_cell")
+        stmt = select(self.wide_table).where(
+            self.wide_table.c[GRID_KEY_FIELD] == grid_key
+        )
+
+        row = self.session.execute(stmt).mappings().first()
+        if row is None:
+            return {}
+
+        return {
+            name: value
+            for name, value in row.items()
+            if name != GRID_KEY_FIELD and value is not None
+        }
+
+    def get_values(
+        self,
+        longitudes: np.ndarray,
+        latitudes: np.ndarray,
+        variable: str,
+    ) -> np.ndarray:
+        """Get values for variable at many points at once.
+
+        :param longitudes: Geographical longitudes
+        :type longitudes: np.ndarray
+        :param latitudes: Geographical latitudes
+        :type latitudes: np.ndarray
+        :param variable: Variable to retrieve
+        :type variable: str
+        :return: Values for variable at given points
+        :rtype: np.ndarray
+        """
+        # all points are projected at once
+        north_idx, east_idx = calculate_inspire_grid_indices(
+            np.asarray(longitudes), np.asarray(latitudes), cell_size=self.resolution
+        )
+
+        if variable in self.grids:
+            return self.grids[variable].lookup(north_idx, east_idx)
+
+        table = self.tables[variable]
+        if self.layout == "wide":
+            key_column = table.c[GRID_KEY_FIELD]
+            keys = encode_grid_key(north_idx, east_idx).ravel().tolist()
+        else:
+            key_column = table.c[self.grid_field_id]
+            keys = format_inspire_grid_ids(north_idx, east_idx, self.resolution)
+
+        # one query per batch of (unique) cells
+        unique_keys = list(set(keys))
+        found: dict[str | int, float] = {}
+        for i in range(0, len(unique_keys), SQL_IN_CHUNK_SIZE):
+            stmt = select(key_column, table.c[variable]).where(
+                key_column.in_(unique_keys[i : i + SQL_IN_CHUNK_SIZE])
+            )
+            found.update(self.session.execute(stmt).tuples().all())
+
+        return np.array([found.get(key, np.nan) for key in keys], dtype=np.float64)
@@ -2,6 +2,7 @@ import logging
 import datetime
 from typing import Any
 
+import httpx
 import requests  # type: ignore
 import numpy as np
 
@@ -39,19 +40,51 @@ class Loader(BaseLoader):
 class Getter(BaseGetter):
     """Get values from dataset."""
 
-    def __init__(self, api_url: str) -> None:
+    # BrightSky API calls: async callers await them
+    asynchronous = True
+
+    def __init__(self, api_url: str, max_connections: int = 100) -> None:
         """_summary_
 
         :param api_url: BrightSky weather API endpoint URI
         :type api_url: str
+        :param max_connections: Concurrent API calls of async callers,
+        defaults to 100
+        :type max_connections: int, optional
         """
         self.api_url = api_url
 
+        # async HTTP client of async callers, created on first use (in the
+        # event loop it is used in)
+        self._max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+
     @property
     def time_resolution(self):
         """Time resolution of the dataset."""
         return datetime.timedelta(hours=1)
 
+    @property
+    def thread_safe(self) -> bool:
+        """No shared mutable state between requests."""
+        return True
+
+    @staticmethod
+    def _params(
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+    ) -> dict[str, str]:
+        return {
+            "lat": str(latitude),
+            "lon": str(longitude),
+            "date": start_date.isoformat(sep="T"),
+            "last_date": end_date.isoformat(sep="T"),
+            "tz": "Etc/UTC",
+            "units": "si",
+        }
+
     def _load_json_from_api(
         self,
         start_date: datetime.datetime,
@@ -74,24 +107,16 @@ class Getter(BaseGetter):
         :return: API response as json
         :rtype: Any
         """
-        params = {
-            "lat": str(latitude),
-            "lon": str(longitude),
-            "date": start_date.isoformat(sep="T"),
-            "last_date": end_date.isoformat(sep="T"),
-            "tz": "Etc/UTC",
-            "units": "si",
-        }
+        params = self._params(start_date, end_date, longitude, latitude)
         try:
             response = requests.get(self.api_url, params=params, timeout=10)
             response.raise_for_status()
         except requests.exceptions.RequestException as exc:
             logger.critical(
-                "Could not get data for %s - %s: %s (%s)",
+                "Could not get data for %s - %s: %s",
                 start_date.isoformat(),
                 end_date.isoformat(),
-                response.reason,
-                str(response.status_code),
+                str(exc),
             )
             raise IOError from exc
 
@@ -103,6 +128,42 @@ class Getter(BaseGetter):
 
         return data
 
+    async def _load_json_from_api_async(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+    ) -> Any:
+        """Call BrightSky API and retrieve DWD data, without blocking the
+        event loop (see _load_json_from_api)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=10,
+                limits=httpx.Limits(max_connections=self._max_connections),
+            )
+
+        params = self._params(start_date, end_date, longitude, latitude)
+        try:
+            response = await self._client.get(self.api_url, params=params)
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            logger.critical(
+                "Could not get data for %s - %s: %s",
+                start_date.isoformat(),
+                end_date.isoformat(),
+                str(exc),
+            )
+            raise IOError from exc
+
+        try:
+            data = response.json()
+        except ValueError as exc:
+            logger.critical("Could not decode response: %s", str(exc))
+            raise IOError from exc
+
+        return data
+
     def _get_range(
         self,
         start_date: datetime.datetime,
@@ -130,6 +191,32 @@ class Getter(BaseGetter):
 
         data = self._load_json_from_api(_start_date, _end_date, longitude, latitude)
 
+        return self._parse_weather(data, variable)
+
+    async def _get_range_async(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> tuple[list[datetime.datetime], list[float]]:
+        """Get values for variable from the API without blocking the event
+        loop (see _get_range)."""
+        _start_date = start_date - self.time_resolution / 2.0
+        _end_date = end_date + self.time_resolution / 2.0
+
+        data = await self._load_json_from_api_async(
+            _start_date, _end_date, longitude, latitude
+        )
+
+        return self._parse_weather(data, variable)
+
+    @staticmethod
+    def _parse_weather(
+        data: Any, variable: str
+    ) -> tuple[list[datetime.datetime], list[float]]:
+        """Times and values of variable in an API response."""
         result = []
         times = []
 
@@ -150,3 +237,9 @@ class Getter(BaseGetter):
                         logger.debug("Could not cast result for %s as float", variable)
 
         return times, result
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client (connections) of async callers."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
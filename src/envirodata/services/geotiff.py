@@ -2,20 +2,193 @@
 
 import logging
 import os
+import math
 import datetime
+import threading
 from collections import OrderedDict
+from dataclasses import dataclass
 
 import numpy as np
 import rasterio
 from pyproj import Transformer
+from rasterio.crs import CRS  # type: ignore
+from rasterio.transform import Affine, rowcol  # type: ignore
 
-from envirodata.services.base import BaseLoader, BaseGetter
+from envirodata.services.base import (
+    BaseLoader,
+    BaseGetter,
+    Variable,
+    STATISTICS_SECONDS,
+)
 from envirodata.utils.general import copy_or_download
+from envirodata.utils.memory import load_shared_array, load_shared_array_with_metadata
+from envirodata.utils.profiling import stage
+from envirodata.utils.spatial import R_EARTH
 
 logger = logging.getLogger(__name__)
 
 TIME_RESOLUTION = datetime.timedelta(hours=1)
 
+# exponent of the power mean used to approximate the box maximum
+MAX_APPROXIMATION_POWER = 16
+
+
+def build_summed_area_tables(
+    data: np.ndarray, nodata: float | None = None, power: int = MAX_APPROXIMATION_POWER
+) -> tuple[np.ndarray, dict]:
+    """Build summed-area tables (integral images) for a raster.
+
+    Three tables are stacked: sum of valid values, count of valid pixels and
+    sum of normalized values raised to `power` (used to approximate the maximum).
+    Tables are zero-padded in front, so the sum over rows r0..r1-1 and columns
+    c0..c1-1 is T[r1, c1] - T[r0, c1] - T[r1, c0] + T[r0, c0].
+
+    :param data: Raster values
+    :type data: np.ndarray
+    :param nodata: Raster nodata value, defaults to None
+    :type nodata: float | None, optional
+    :param power: Exponent of the power mean, defaults to MAX_APPROXIMATION_POWER
+    :type power: int, optional
+    :return: Stacked tables (3, rows + 1, cols + 1) and normalization parameters
+    :rtype: tuple[np.ndarray, dict]
+    """
+    data = np.asarray(data, dtype=np.float64)
+
+    valid = np.isfinite(data)
+    if nodata is not None:
+        valid &= data != nodata
+
+    if np.any(valid):
+        vmin = float(np.min(data[valid]))
+        vmax = float(np.max(data[valid]))
+    else:
+        vmin, vmax = 0.0, 0.0
+    span = vmax - vmin
+
+    tables = np.zeros((3, data.shape[0] + 1, data.shape[1] + 1), dtype=np.float64)
+
+    values = np.where(valid, data, 0.0)
+    tables[0, 1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    tables[1, 1:, 1:] = valid.cumsum(axis=0, dtype=np.float64).cumsum(axis=1)
+    if span > 0:
+        normalized = np.where(valid, (data - vmin) / span, 0.0) ** power
+        tables[2, 1:, 1:] = normalized.cumsum(axis=0).cumsum(axis=1)
+
+    return tables, {"vmin": vmin, "vmax": vmax, "power": power}
+
+
+def box_statistics(
+    tables: np.ndarray, parameters: dict, row0: int, row1: int, col0: int, col1: int
+) -> tuple[float, float]:
+    """Mean and (approximate) maximum of valid pixels within a box, in O(1).
+
+    :param tables: Summed-area tables from build_summed_area_tables
+    :type tables: np.ndarray
+    :param parameters: Normalization parameters from build_summed_area_tables
+    :type parameters: dict
+    :param row0: First row (inclusive)
+    :type row0: int
+    :param row1: Last row (exclusive)
+    :type row1: int
+    :param col0: First column (inclusive)
+    :type col0: int
+    :param col1: Last column (exclusive)
+    :type col1: int
+    :return: Box mean, box maximum (power mean approximation, never above the
+    true maximum)
+    :rtype: tuple[float, float]
+    """
+    sums = (
+        tables[:, row1, col1]
+        - tables[:, row0, col1]
+        - tables[:, row1, col0]
+        + tables[:, row0, col0]
+    )
+    total, count, power_total = (float(x) for x in sums)
+
+    # counts are exact in float64, but guard against round-off anyway
+    if count < 0.5:
+        return np.nan, np.nan
+
+    mean = total / count
+    span = parameters["vmax"] - parameters["vmin"]
+    power_mean = max(power_total / count, 0.0) ** (1.0 / parameters["power"])
+    maximum = parameters["vmin"] + span * power_mean
+
+    return mean, maximum
+
+
+def _load_band(raster_path: str) -> np.ndarray:
+    """First band of a cached GeoTIFF, memory-mapped from a .npy copy
+    (prepared once, shared between processes)."""
+
+    def read():
+        with rasterio.open(raster_path) as dset:
+            return dset.read(1)
+
+    return load_shared_array(
+        raster_path.replace(".tif", ".band.npy"), read, source_fpath=raster_path
+    )
+
+
+@dataclass
+class Raster:
+    """Values (memory-mapped) and georeferencing of a cached GeoTIFF. No
+    GDAL dataset handle is kept open, so a raster can be shared between
+    threads."""
+
+    values: np.ndarray
+    transform: Affine
+    crs: CRS
+    nodata: float | None
+
+    @classmethod
+    def open(cls, raster_path: str) -> "Raster":
+        with rasterio.open(raster_path) as dset:
+            transform, crs, nodata = dset.transform, dset.crs, dset.nodata
+        return cls(_load_band(raster_path), transform, crs, nodata)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.values.shape
+
+    @property
+    def res(self) -> tuple[float, float]:
+        return abs(self.transform.a), abs(self.transform.e)
+
+    def index(self, x: float, y: float) -> tuple[int, int]:
+        """Row and column of the pixel containing a point (raster CRS)."""
+        row, col = rowcol(self.transform, x, y, op=math.floor)
+        return int(row), int(col)
+
+
+def _summed_area_table_paths(cache_path: str, variable: str) -> tuple[str, str]:
+    return (
+        os.path.join(cache_path, variable + ".sat.npy"),
+        os.path.join(cache_path, variable + ".sat.json"),
+    )
+
+
+def _load_summed_area_tables(
+    cache_path: str, variable: str
+) -> tuple[np.ndarray, dict]:
+    """Summed-area tables of a cached GeoTIFF, memory-mapped from a .sat.npy
+    file (built once, and again when the raster is newer; shared between
+    processes), and their normalization parameters."""
+    raster_path = os.path.join(cache_path, variable + ".tif")
+    tables_path, parameters_path = _summed_area_table_paths(cache_path, variable)
+
+    def build() -> tuple[np.ndarray, dict]:
+        logger.info("Building summed-area tables for %s", variable)
+        with rasterio.open(raster_path) as dset:
+            nodata = dset.nodata
+        band = _load_band(raster_path)
+        return build_summed_area_tables(band, nodata)
+
+    return load_shared_array_with_metadata(
+        tables_path, parameters_path, build, source_fpath=raster_path
+    )
+
 
 class Loader(BaseLoader):
     """Load dataset."""
@@ -24,6 +197,7 @@ class Loader(BaseLoader):
         self,
         data_table: dict | OrderedDict,
         cache_path: str,
+        summed_area_tables: bool = True,
     ) -> None:
         """Load dataset into local cache.
 
@@ -31,10 +205,14 @@ class Loader(BaseLoader):
         :type data_table: dict | OrderedDict
         :param cache_path: Path to data cache
         :type cache_path: str | pathlib.Path
+        :param summed_area_tables: Precompute summed-area tables for buffer
+        statistics, defaults to True
+        :type summed_area_tables: bool, optional
 
         """
         self.data_table = data_table
         self.cache_path = cache_path
+        self.summed_area_tables = summed_area_tables
 
         os.makedirs(self.cache_path, exist_ok=True)
 
@@ -55,6 +233,12 @@ class Loader(BaseLoader):
             output_path = os.path.join(self.cache_path, variable + ".tif")
             copy_or_download(input_path, output_path)
 
+            if os.path.exists(output_path):
+                _load_band(output_path)
+
+            if self.summed_area_tables and os.path.exists(output_path):
+                _load_summed_area_tables(self.cache_path, variable)
+
 
 class Getter(BaseGetter):
     """Get values from cached dataset."""
@@ -71,27 +255,151 @@ class Getter(BaseGetter):
         :param output_crs: pyproj string describing output CRS, defaults to "EPSG:4326"
 
         """
-
-        def read(fname):
-            dset = rasterio.open(fname)
-            return (dset, dset.read(1))
+        self.cache_path = cache_path
 
         self.data = {
-            x.replace(".tif", ""): read(os.path.join(cache_path, x))
+            x.replace(".tif", ""): Raster.open(os.path.join(cache_path, x))
             for x in os.listdir(cache_path)
             if x.endswith(".tif")
         }
 
         self.transformers = {
-            name: Transformer.from_crs(output_crs, data[0].crs, always_xy=True)
-            for name, data in self.data.items()
+            name: Transformer.from_crs(output_crs, raster.crs, always_xy=True)
+            for name, raster in self.data.items()
         }
 
+        # summed-area tables are loaded on first use of buffer statistics
+        self.summed_area_tables: dict[str, tuple[np.ndarray, dict]] = {}
+        self._summed_area_tables_lock = threading.Lock()
+
     @property
     def time_resolution(self):
         """Time resolution of the dataset."""
         return datetime.timedelta(hours=1)
 
+    @property
+    def thread_safe(self) -> bool:
+        """Rasters are read-only arrays without open GDAL handles, pyproj
+        transformers are thread-safe."""
+        return True
+
+    @property
+    def static(self) -> bool:
+        """Rasters are time-invariant."""
+        return True
+
+    def _get_summed_area_tables(self, variable: str) -> tuple[np.ndarray, dict]:
+        """Summed-area tables for a variable, memory-mapped from cache (built
+        there by the Loader, or by the first process that needs them).
+
+        :param variable: Variable name
+        :type variable: str
+        :return: Summed-area tables and normalization parameters
+        :rtype: tuple[np.ndarray, dict]
+        """
+        with self._summed_area_tables_lock:
+            if variable not in self.summed_area_tables:
+                self.summed_area_tables[variable] = _load_summed_area_tables(
+                    self.cache_path, variable
+                )
+
+        return self.summed_area_tables[variable]
+
+    def _buffer_half_widths(
+        self, variable: str, latitude: float, radius: float
+    ) -> tuple[int, int]:
+        """Half widths (rows, columns) in pixels of a square buffer.
+
+        :param variable: Variable name
+        :type variable: str
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param radius: Buffer radius (m)
+        :type radius: float
+        :return: Half widths in rows and columns
+        :rtype: tuple[int, int]
+        """
+        raster = self.data[variable]
+        xres, yres = raster.res
+
+        dx = dy = float(radius)
+        if raster.crs.is_geographic:
+            dy = math.degrees(radius / R_EARTH)
+            dx = dy / max(math.cos(math.radians(latitude)), 1e-6)
+
+        return int(round(dy / abs(yres))), int(round(dx / abs(xres)))
+
+    def _get_buffer_statistics(
+        self, longitude: float, latitude: float, variable: Variable
+    ) -> dict[str, float]:
+        """Mean and (approximate) maximum within square buffers around a point.
+
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Variable to retrieve
+        :type variable: Variable
+        :return: Buffer statistics by name (e.g., buffer_100m_mean)
+        :rtype: dict[str, float]
+        """
+        result = {}
+
+        x, y = self.transformers[variable.name].transform(longitude, latitude)
+        row, col = self.data[variable.name].index(x, y)
+        nrows, ncols = self.data[variable.name].shape
+
+        tables, parameters = self._get_summed_area_tables(variable.name)
+
+        for radius in variable.buffers:
+            hrows, hcols = self._buffer_half_widths(variable.name, latitude, radius)
+
+            row0, row1 = max(row - hrows, 0), min(row + hrows + 1, nrows)
+            col0, col1 = max(col - hcols, 0), min(col + hcols + 1, ncols)
+
+            mean, maximum = np.nan, np.nan
+            if row0 < row1 and col0 < col1:
+                mean, maximum = box_statistics(
+                    tables, parameters, row0, row1, col0, col1
+                )
+
+            # see Variable.result_names
+            result[f"buffer_{radius}m_mean"] = mean
+            result[f"buffer_{radius}m_max"] = maximum
+
+        return result
+
+    def get(
+        self,
+        date: datetime.datetime,
+        longitude: float,
+        latitude: float,
+        variable: Variable,
+    ) -> dict:
+        """Get value for variable out of the input dataset
+        for a given place in time and space, including buffer statistics.
+
+        :param date: Date to retrieve
+        :type date: datetime.datetime
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param variable: Variable to retrieve
+        :type variable: Variable
+        :return: Statistics for variable at given point in time and space.
+        :rtype: dict
+        """
+        result = super().get(date, longitude, latitude, variable)
+
+        if variable.buffers:
+            with STATISTICS_SECONDS.time(getter="geotiff"), stage("statistics"):
+                result.update(
+                    self._get_buffer_statistics(longitude, latitude, variable)
+                )
+
+        return result
+
     def _get_range(
         self,
         start_date: datetime.datetime,
@@ -100,22 +408,28 @@ class Getter(BaseGetter):
         latitude: float,
         variable: str,
     ) -> tuple[list[datetime.datetime], list[float]]:
-        """Get value for variable out of cached NetCDF4 file
+        return [start_date], [self._get_static(longitude, latitude, variable)]
+
+    def _get_static(
+        self,
+        longitude: float,
+        latitude: float,
+        variable: str,
+    ) -> float:
+        """Get value for variable out of cached GeoTIFF
 
-        :param date: Date to retrieve
-        :type date: datetime.datetime
         :param longitude: Geographical longitude
         :type longitude: float
         :param latitude: Geographical latitude
         :type latitude: float
         :param variable: Variable to retrieve
         :type variable: str
-        :return: Value for variable at given point in time and space.
+        :return: Value for variable at given point in space.
         :rtype: float
         """
         x, y = self.transformers[variable].transform(longitude, latitude)
 
-        row, col = self.data[variable][0].index(x, y)
+        row, col = self.data[variable].index(x, y)
 
         logger.debug(
             "%d, %d -> %d, %d -> %d, %d (dataset: %s)",
@@ -125,20 +439,20 @@ class Getter(BaseGetter):
             y,
             row,
             col,
-            self.data[variable][0].shape,
+            self.data[variable].shape,
         )
 
         # if we are sampling outside the raster bounds, return NaN
         value = np.nan
         if (
             row < 0
-            or row >= self.data[variable][0].shape[0]
+            or row >= self.data[variable].shape[0]
             or col < 0
-            or col >= self.data[variable][0].shape[1]
+            or col >= self.data[variable].shape[1]
         ):
             logger.debug("Out of bounds sampling for %s!", variable)
         else:
             logger.debug("Valid sampling for %s!", variable)
-            value = float(self.data[variable][1][row, col])
+            value = float(self.data[variable].values[row, col])
 
-        return [start_date], [value]
+        return value
@@ -0,0 +1,194 @@
+"""Chunked reading and writing of batch job tables (Excel, CSV, Parquet)."""
+
+import csv
+import logging
+from typing import Any, Iterator, TextIO
+
+import openpyxl  # type: ignore
+import pandas as pd  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# file formats of batch inputs and outputs, by file extension
+FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# rows read, processed and written at once
+CHUNK_SIZE = 10000
+
+INPUT_COLUMNS = ("id", "date", "address", "longitude", "latitude")
+
+
+def format_from_filename(fname: str) -> str:
+    """Batch file format of a file name.
+
+    :param fname: File name
+    :type fname: str
+    :raises ValueError: Unsupported file format
+    :return: Format (file extension)
+    :rtype: str
+    """
+    fmt = fname.rsplit(".", 1)[-1].lower()
+    if fmt not in FORMATS:
+        raise ValueError(
+            f"Unsupported file format of {fname}, use one of {', '.join(FORMATS)}"
+        )
+    return fmt
+
+
+def _check_columns(columns) -> list[str]:
+    """Input columns present, need id, date, and address or coordinates."""
+    present = [column for column in INPUT_COLUMNS if column in columns]
+    has_location = "address" in present or (
+        "longitude" in present and "latitude" in present
+    )
+    if "id" not in present or "date" not in present or not has_location:
+        raise ValueError(
+            "Need columns id, date, and address or longitude and latitude"
+        )
+    return present
+
+
+def count_rows(fpath: str, fmt: str) -> int:
+    """Number of rows of a batch input file (for progress reporting).
+
+    :param fpath: File path
+    :type fpath: str
+    :param fmt: File format
+    :type fmt: str
+    :return: Number of rows
+    :rtype: int
+    """
+    if fmt == "parquet":
+        return pq.ParquetFile(fpath).metadata.num_rows
+    if fmt == "csv":
+        with open(fpath, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    workbook = openpyxl.load_workbook(fpath, read_only=True)
+    n_rows = max((workbook.active.max_row or 1) - 1, 0)
+    workbook.close()
+    return n_rows
+
+
+def read_chunks(
+    fpath: str, fmt: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Read the input columns (id, date, address and/or longitude, latitude)
+    of a batch input file in chunks.
+
+    :param fpath: File path
+    :type fpath: str
+    :param fmt: File format
+    :type fmt: str
+    :param chunk_size: Rows per chunk, defaults to CHUNK_SIZE
+    :type chunk_size: int, optional
+    :raises ValueError: Required columns missing
+    :return: Chunks
+    :rtype: Iterator[pd.DataFrame]
+    """
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(fpath)
+        columns = _check_columns(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(
+            batch_size=chunk_size, columns=columns
+        ):
+            yield batch.to_pandas()
+    elif fmt == "csv":
+        columns = _check_columns(pd.read_csv(fpath, nrows=0).columns)
+        yield from pd.read_csv(fpath, usecols=columns, chunksize=chunk_size)
+    else:
+        # no chunked reading of Excel files in pandas
+        df = pd.read_excel(fpath)
+        df = df[_check_columns(df.columns)]
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+
+
+class ChunkWriter:
+    """Write a table chunk by chunk to an Excel, CSV or Parquet file.
+
+    Columns are fixed up front (id and all configured values), so values
+    first retrieved in a later chunk are not lost; missing values are empty.
+    """
+
+    def __init__(self, fpath: str, fmt: str, columns: list[str]) -> None:
+        """Write a table chunk by chunk.
+
+        :param fpath: File path
+        :type fpath: str
+        :param fmt: File format
+        :type fmt: str
+        :param columns: Columns, id first, then the value columns
+        :type columns: list[str]
+        """
+        self.fpath = fpath
+        self.fmt = fmt
+        self.columns = columns
+
+        self._workbook: openpyxl.Workbook | None = None
+        self._worksheet: Any = None
+        self._csv_file: TextIO | None = None
+        self._parquet_writer: pq.ParquetWriter | None = None
+        # unknown columns are dropped, warn once
+        self._dropped: set[str] = set()
+
+        if self.fmt == "xlsx":
+            self._workbook = openpyxl.Workbook(write_only=True)
+            self._worksheet = self._workbook.create_sheet()
+            self._worksheet.append(columns)
+        elif self.fmt == "csv":
+            self._csv_file = open(self.fpath, "w", newline="")
+            csv.writer(self._csv_file).writerow(columns)
+        else:
+            # ids as strings, values as float64 in all chunks (a schema
+            # inferred per chunk would differ, e.g. int without missing values)
+            schema = pa.schema(
+                [pa.field(columns[0], pa.string())]
+                + [pa.field(column, pa.float64()) for column in columns[1:]]
+            )
+            self._parquet_writer = pq.ParquetWriter(self.fpath, schema)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Write a chunk.
+
+        :param df: Chunk of the table
+        :type df: pd.DataFrame
+        """
+        dropped = set(df.columns) - set(self.columns) - self._dropped
+        if dropped:
+            logger.warning("Dropping unknown output columns %s", sorted(dropped))
+            self._dropped |= dropped
+
+        df = df.reindex(columns=self.columns)
+        if self._worksheet is not None:
+            df = df.astype(object)
+            # empty cells for missing values
+            for row in df.where(df.notna(), None).itertuples(index=False):
+                self._worksheet.append(list(row))
+        elif self._csv_file is not None:
+            df.to_csv(self._csv_file, header=False, index=False)
+        elif self._parquet_writer is not None:
+            id_column, values = self.columns[0], self.columns[1:]
+            df = df.astype({id_column: str})
+            df[values] = (
+                df[values].apply(pd.to_numeric, errors="coerce").astype("float64")
+            )
+            self._parquet_writer.write_table(
+                pa.Table.from_pandas(
+                    df, schema=self._parquet_writer.schema, preserve_index=False
+                )
+            )
+
+    def close(self) -> None:
+        """Finish the file."""
+        if self._workbook is not None:
+            self._workbook.save(self.fpath)
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
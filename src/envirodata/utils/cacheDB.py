@@ -1,39 +1,107 @@
 import logging
 import datetime
+import threading
+from typing import Any
 
 import numpy as np
 
 from sqlalchemy import (
     create_engine,
+    inspect,
     MetaData,
     Table,
     Column,
     String,
     Float,
+    BigInteger,
+    PrimaryKeyConstraint,
     UniqueConstraint,
-    TIMESTAMP,
+    case,
     insert,
     select,
 )
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert
+
+from envirodata.utils.general import configure_sqlite_for_bulk_load
+from envirodata.utils.spatial import SphericalIndex
 
 logger = logging.getLogger(__name__)
 
+# tables of the cache layout, everything else is a (legacy) station table
+CACHE_TABLES = ("stations", "variables", "observations")
+
+# number of nearest stations checked for data with a single query
+# (grows by CANDIDATE_GROWTH for each further query)
+CANDIDATE_STATIONS = 10
+CANDIDATE_GROWTH = 4
+
+# rows copied at once when migrating legacy station tables
+MIGRATION_CHUNK_SIZE = 100000
+
+# rows sent to the db with a single executemany when bulk inserting
+BULK_BATCH_SIZE = 50000
+
+
+def to_epoch(date: datetime.datetime) -> int:
+    """Seconds since epoch (UTC) of a date, naive dates are assumed to be UTC.
+
+    :param date: Date
+    :type date: datetime.datetime
+    :return: Seconds since epoch
+    :rtype: int
+    """
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return int(date.timestamp())
+
+
+def to_epoch_array(dates) -> np.ndarray:
+    """Seconds since epoch (UTC) of many dates, naive dates are assumed to be UTC.
+
+    :param dates: Dates (datetime64 array, datetimes or seconds since epoch)
+    :type dates: array-like
+    :return: Seconds since epoch
+    :rtype: np.ndarray
+    """
+    dates = np.asarray(dates)
+    if dates.dtype.kind == "M":
+        return dates.astype("datetime64[s]").astype(np.int64)
+    if dates.dtype.kind in "iu":
+        return dates.astype(np.int64)
+    return np.fromiter(
+        (to_epoch(date) for date in dates), dtype=np.int64, count=len(dates)
+    )
+
 
 class CacheDB:
     """SQLAlchemy DB interface to cache retrieved values"""
 
-    def __init__(self, db_uri: str) -> None:
+    def __init__(self, db_uri: str, bulk_load: bool = False) -> None:
         """SQLAlchemy DB interface to cache retrieved values
 
+        All values are stored in a single observations table keyed by
+        (station_id, parameter, date), dates as seconds since epoch (UTC).
+
         :param db_uri: (SQLAlchemy) URI for db connection
         :type db_uri: str
+        :param bulk_load: Tune the connections for bulk loading (relaxed
+        syncing, only for loaders: not crash-safe), defaults to False
+        :type bulk_load: bool, optional
         """
         logger.debug("Setting up cache DB at %s", db_uri)
         self.engine = create_engine(
             db_uri, echo=logger.getEffectiveLevel() == logging.DEBUG
         )
+        if bulk_load:
+            configure_sqlite_for_bulk_load(self.engine)
         self.metadata = MetaData()
-        self.metadata.reflect(bind=self.engine)
+        # only reflect the cache layout, not legacy per-station tables
+        existing_tables = inspect(self.engine).get_table_names()
+        self.metadata.reflect(
+            bind=self.engine,
+            only=[name for name in CACHE_TABLES if name in existing_tables],
+        )
         if "stations" not in self.metadata.tables:
             _ = Table(
                 "stations",
@@ -50,12 +118,145 @@ class CacheDB:
                 Column("parameter", String),
                 UniqueConstraint("station_id", "parameter"),
             )
+        if "observations" not in self.metadata.tables:
+            # primary key doubles as covering index for range reads,
+            # no separate rowid needed
+            _ = Table(
+                "observations",
+                self.metadata,
+                Column("station_id", String, nullable=False),
+                Column("parameter", String, nullable=False),
+                Column("date", BigInteger, nullable=False),
+                Column("value", Float),
+                PrimaryKeyConstraint(
+                    "station_id",
+                    "parameter",
+                    "date",
+                    sqlite_on_conflict="REPLACE",
+                ),
+                sqlite_with_rowid=False,
+            )
         self.metadata.create_all(self.engine)
 
-    def create_station_table(
+        self.stations = self.metadata.tables["stations"]
+        self.variables = self.metadata.tables["variables"]
+        self.observations = self.metadata.tables["observations"]
+
+        # spatial index of stations by parameter, built on first use and
+        # dropped whenever stations or parameters are added
+        self._station_index: dict[str, tuple[np.ndarray, SphericalIndex]] | None = (
+            None
+        )
+        self._station_index_lock = threading.Lock()
+
+        # known station ids and (station_id, parameter) pairs, loaded on first
+        # use so that inserts do not need to look them up in the db
+        self._known_stations: set[str] | None = None
+        self._known_variables: set[tuple[str, str]] | None = None
+        self._known_lock = threading.Lock()
+
+    def legacy_station_tables(self) -> list[str]:
+        """Names of per-station tables of the old cache layout.
+
+        :return: Table names
+        :rtype: list[str]
+        """
+        return [
+            name
+            for name in inspect(self.engine).get_table_names()
+            if name not in CACHE_TABLES
+        ]
+
+    def migrate(self) -> None:
+        """Move values from per-station tables (old cache layout) into the
+        observations table, and drop the per-station tables."""
+        for station_id in self.legacy_station_tables():
+            legacy = Table(station_id, MetaData(), autoload_with=self.engine)
+            if not {"date", "parameter", "value"} <= set(legacy.columns.keys()):
+                logger.warning("Not a station table: %s, skipping.", station_id)
+                continue
+
+            logger.info("Migrating station table %s", station_id)
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    select(legacy.c.date, legacy.c.parameter, legacy.c.value)
+                ).tuples()
+                while rows := result.fetchmany(MIGRATION_CHUNK_SIZE):
+                    conn.execute(
+                        insert(self.observations),
+                        [
+                            {
+                                "station_id": station_id,
+                                "parameter": parameter,
+                                "date": to_epoch(date),
+                                "value": value,
+                            }
+                            for date, parameter, value in rows
+                        ],
+                    )
+                legacy.drop(conn)
+
+    def _load_known(self) -> None:
+        """Read known stations and (station, parameter) pairs from the db,
+        if not done yet. Caller must hold the lock."""
+        if self._known_stations is not None:
+            return
+
+        with self.engine.connect() as conn:
+            self._known_stations = set(
+                conn.execute(select(self.stations.c.station_id)).scalars()
+            )
+            self._known_variables = set(
+                conn.execute(
+                    select(self.variables.c.station_id, self.variables.c.parameter)
+                ).tuples()
+            )
+
+    def _register(
+        self, stations: dict[str, tuple[float, float]], variables: set[tuple[str, str]]
+    ) -> None:
+        """Add unknown stations and (station, parameter) pairs to the db.
+
+        :param stations: Station locations (longitude, latitude) by station id
+        :type stations: dict[str, tuple[float, float]]
+        :param variables: (station_id, parameter) pairs
+        :type variables: set[tuple[str, str]]
+        """
+        with self._known_lock:
+            self._load_known()
+            assert self._known_stations is not None
+            assert self._known_variables is not None
+
+            new_stations: list[dict[str, Any]] = [
+                {"station_id": station_id, "longitude": lon, "latitude": lat}
+                for station_id, (lon, lat) in stations.items()
+                if station_id not in self._known_stations
+            ]
+            new_variables = [
+                {"station_id": station_id, "parameter": parameter}
+                for station_id, parameter in variables - self._known_variables
+            ]
+            if not new_stations and not new_variables:
+                return
+
+            with self.engine.begin() as conn:
+                if new_stations:
+                    logger.info("Adding %d station(s)", len(new_stations))
+                    conn.execute(insert(self.stations), new_stations)
+                if new_variables:
+                    conn.execute(insert(self.variables), new_variables)
+
+            self._known_stations.update(x["station_id"] for x in new_stations)
+            self._known_variables.update(
+                (x["station_id"], x["parameter"]) for x in new_variables
+            )
+
+        self._station_index = None
+
+    def create_station(
         self, station_id: str, longitude: float, latitude: float
     ) -> None:
-        """Create a new data table for a station, remember station in stations table.
+        """Remember a station (and its location) in the stations table.
 
         :param station_id: Station ID
         :type station_id: str
@@ -64,60 +265,120 @@ class CacheDB:
         :param latitude: Geographical latitude
         :type latitude: float
         """
-        # if we have it already, ignore
-        if station_id in self.metadata.tables:
-            return
-
-        logger.critical("Adding station table for %s", station_id)
-        _ = Table(
-            station_id,
-            self.metadata,
-            Column("date", TIMESTAMP),
-            Column("parameter", String),
-            Column("value", Float),
-            UniqueConstraint("date", "parameter", sqlite_on_conflict="REPLACE"),
-        )
-
-        stmt = insert(self.metadata.tables["stations"]).values(
-            station_id=station_id, longitude=longitude, latitude=latitude
-        )
-        with self.engine.connect() as conn:
-            _ = conn.execute(stmt)
-            conn.commit()
-
-        self.metadata.create_all(self.engine)
+        self._register({station_id: (longitude, latitude)}, set())
 
     def create_variable_table_entry(self, station_id: str, parameter: str) -> None:
-        """Check if parameter has already been cached for station.
+        """Remember that a parameter is cached for a station.
 
         :param station_id: Station id
         :type station_id: str
         :param parameter: Parameter
         :type parameter: str
-        :return: Is parameter already cached for station?
-        :rtype: bool
         """
-        tbl = self.metadata.tables["variables"]
+        self._register({}, {(station_id, parameter)})
 
-        stmt = (
-            select(tbl)
-            .where(tbl.c.station_id == station_id)
-            .where(tbl.c.parameter == parameter)
-        )
+    def _insert_observations(self, conn, rows: list[tuple]) -> None:
+        """Insert observations, replacing existing values.
 
-        with self.engine.connect() as conn:
-            mei = conn.execute(stmt)
-            result = mei.all()
-
-        if len(result) == 0:
-            with self.engine.connect() as conn:
-                _ = conn.execute(
-                    insert(self.metadata.tables["variables"]),
-                    {"station_id": station_id, "parameter": parameter},
+        :param conn: DB connection
+        :param rows: (station_id, parameter, date, value) tuples
+        :type rows: list[tuple]
+        """
+        tbl = self.observations
+        if self.engine.dialect.name == "sqlite":
+            # conflicting rows are replaced by the primary key's conflict
+            # clause, skip SQLAlchemy's per-row parameter processing
+            sql = str(insert(tbl).compile(dialect=self.engine.dialect))
+            conn.exec_driver_sql(sql, rows)
+            return
+
+        stmt: Insert
+        if self.engine.dialect.name == "postgresql":
+            upsert = postgresql.insert(tbl)
+            stmt = upsert.on_conflict_do_update(
+                index_elements=[tbl.c.station_id, tbl.c.parameter, tbl.c.date],
+                set_={"value": upsert.excluded.value},
+            )
+        else:
+            stmt = insert(tbl)
+
+        columns = ("station_id", "parameter", "date", "value")
+        conn.execute(stmt, [dict(zip(columns, row)) for row in rows])
+
+    def insert_many(
+        self,
+        station_ids,
+        longitudes,
+        latitudes,
+        parameters,
+        dates,
+        values,
+        batch_size: int = BULK_BATCH_SIZE,
+    ) -> int:
+        """Insert values of many stations and parameters into the db, in a
+        single transaction. All arguments are aligned arrays with one element
+        per value (station locations are taken from the first value of each
+        station).
+
+        :param station_ids: Station ids
+        :type station_ids: array-like
+        :param longitudes: Geographical longitudes of the stations
+        :type longitudes: array-like
+        :param latitudes: Geographical latitudes of the stations
+        :type latitudes: array-like
+        :param parameters: Parameters
+        :type parameters: array-like
+        :param dates: Dates (datetime64, datetimes or seconds since epoch)
+        :type dates: array-like
+        :param values: Values
+        :type values: array-like
+        :param batch_size: Rows sent to the db at once, defaults to BULK_BATCH_SIZE
+        :type batch_size: int, optional
+        :return: Number of rows inserted
+        :rtype: int
+        """
+        station_ids = np.asarray(station_ids).astype(str)
+        parameters = np.asarray(parameters).astype(str)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        epochs = to_epoch_array(dates)
+        values = np.asarray(values, dtype=np.float64)
+
+        n_rows = len(values)
+        if not (
+            len(station_ids)
+            == len(parameters)
+            == len(longitudes)
+            == len(latitudes)
+            == len(epochs)
+            == n_rows
+        ):
+            raise ValueError("All arrays must have the same length.")
+        if n_rows == 0:
+            return 0
+
+        _, first = np.unique(station_ids, return_index=True)
+        stations = {
+            station_ids[i]: (float(longitudes[i]), float(latitudes[i])) for i in first
+        }
+        self._register(stations, set(zip(station_ids.tolist(), parameters.tolist())))
+
+        with self.engine.begin() as conn:
+            for start in range(0, n_rows, batch_size):
+                batch = slice(start, start + batch_size)
+                self._insert_observations(
+                    conn,
+                    list(
+                        zip(
+                            station_ids[batch].tolist(),
+                            parameters[batch].tolist(),
+                            epochs[batch].tolist(),
+                            values[batch].tolist(),
+                        )
+                    ),
                 )
-                conn.commit()
 
-        return
+        return n_rows
 
     def insert(
         self,
@@ -147,81 +408,136 @@ class CacheDB:
         """
         logger.debug("Inserting data for %s %s", station_id, parameters[0])
 
-        self.create_station_table(station_id, longitude, latitude)
-        self.create_variable_table_entry(station_id, parameters[0])
+        n_values = len(values)
+        self.insert_many(
+            np.full(n_values, station_id),
+            np.full(n_values, longitude),
+            np.full(n_values, latitude),
+            parameters,
+            dates,
+            values,
+        )
 
-        data = [
-            {"parameter": prm, "date": dat, "value": val}
-            for prm, dat, val in zip(parameters, dates, values)
-        ]
+    def _get_station_index(self) -> dict[str, tuple[np.ndarray, SphericalIndex]]:
+        """Spatial index of the stations having each parameter.
 
-        with self.engine.connect() as conn:
-            _ = conn.execute(
-                insert(self.metadata.tables[station_id]),
-                data,
-            )
-            conn.commit()
+        :return: Station ids and their spatial index by parameter
+        :rtype: dict[str, tuple[np.ndarray, SphericalIndex]]
+        """
+        with self._station_index_lock:
+            if self._station_index is None:
+                stmt = select(
+                    self.variables.c.parameter,
+                    self.stations.c.station_id,
+                    self.stations.c.longitude,
+                    self.stations.c.latitude,
+                ).join(
+                    self.stations,
+                    self.stations.c.station_id == self.variables.c.station_id,
+                )
+                with self.engine.connect() as conn:
+                    rows = conn.execute(stmt).tuples().all()
+
+                by_parameter: dict[str, list] = {}
+                for parameter, station_id, longitude, latitude in rows:
+                    by_parameter.setdefault(parameter, []).append(
+                        (station_id, longitude, latitude)
+                    )
+
+                self._station_index = {
+                    parameter: (
+                        np.array([x[0] for x in stations], dtype=object),
+                        SphericalIndex(
+                            [x[1] for x in stations], [x[2] for x in stations]
+                        ),
+                    )
+                    for parameter, stations in by_parameter.items()
+                }
+
+            return self._station_index
+
+    def nearest_stations(
+        self, longitude: float, latitude: float, parameter: str, k: int
+    ) -> list[str]:
+        """k nearest stations that have the given parameter.
+
+        :param longitude: Geographical longitude
+        :type longitude: float
+        :param latitude: Geographical latitude
+        :type latitude: float
+        :param parameter: Parameter
+        :type parameter: str
+        :param k: Number of stations
+        :type k: int
+        :return: Station ids, nearest first
+        :rtype: list[str]
+        """
+        station_index = self._get_station_index()
+        if parameter not in station_index:
+            return []
+
+        station_ids, index = station_index[parameter]
+        _, nearest = index.query(longitude, latitude, k=k)
+
+        return station_ids[nearest[0]].tolist()
 
     def _get(
         self,
-        station_id: str,
+        station_ids: list[str],
         start_date: datetime.datetime,
         end_date: datetime.datetime,
         parameter: str,
-    ) -> list[float]:
-        """Get value for a station at a given date.
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get values in a date range of the first station (in the given order)
+        that has data, with a single query.
 
-        :param station_id: Station id
-        :type station_id: str
+        :param station_ids: Station ids, by priority
+        :type station_ids: list[str]
         :param start_date: Start date
         :type start_date: datetime.datetime
         :param end_date: End date
         :type end_date: datetime.datetime
         :param parameter: Parameter
         :type parameter: str
-        :raises ValueError: Station id unknown
-        :return: Value for given date and parameter
-        :rtype: float
+        :return: Dates (UTC, datetime64[s]) and values (float64) ordered by
+        date, empty if no station has data
+        :rtype: tuple[np.ndarray, np.ndarray]
         """
-        if station_id not in self.metadata.tables:
-            raise ValueError(f"Unknown station ID {station_id}")
+        tbl = self.observations
+
+        in_range = (
+            (tbl.c.parameter == parameter)
+            & (tbl.c.date >= to_epoch(start_date))
+            & (tbl.c.date <= to_epoch(end_date))
+        )
 
-        tbl = self.metadata.tables[station_id]
+        priority = case(
+            {station_id: i for i, station_id in enumerate(station_ids)},
+            value=tbl.c.station_id,
+        )
+        first_station = (
+            select(tbl.c.station_id)
+            .where(tbl.c.station_id.in_(station_ids))
+            .where(in_range)
+            .order_by(priority)
+            .limit(1)
+            .scalar_subquery()
+        )
 
         stmt = (
-            select(tbl.c.value)
-            .where(tbl.c.parameter == parameter)
-            .where(tbl.c.date >= start_date)
-            .where(tbl.c.date <= end_date)
+            select(tbl.c.date, tbl.c.value)
+            .where(tbl.c.station_id == first_station)
+            .where(in_range)
             .order_by(tbl.c.date)
         )
 
-        result = []
-        with self.engine.connect() as conn:
-            mei = conn.execute(stmt)
-            # if there are any values
-            all_values = mei.all()
-            if len(all_values) > 0:
-                # we merge them into a list
-                result = [float(x[0]) for x in all_values]
-
-        return result
-
-    def _get_from_stations(self, var: str) -> list:
-        """Get values of a given variable from the stations table
-
-        :param var: Variable name
-        :type var: str
-        :return: Values of this variable
-        :rtype: list
-        """
-        tbl = self.metadata.tables["stations"]
-        stmt = select(tbl.c[var])
         with self.engine.connect() as conn:
-            mei = conn.execute(stmt)
-            result = mei.all()
+            rows = conn.execute(stmt).all()
+
+        # epoch seconds are exact in float64, NULL values become NaN
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
 
-        return [x[0] for x in result]
+        return data[:, 0].astype(np.int64).astype("datetime64[s]"), data[:, 1]
 
     def get(
         self, longitude: float, latitude: float, date: datetime.datetime, parameter: str
@@ -241,13 +557,13 @@ class CacheDB:
         :rtype: float
         """
 
-        data = self.get_range(
+        _, values = self.get_range(
             longitude, latitude, date, date + datetime.timedelta(days=1), parameter
         )
-        if len(data) < 1:
+        if len(values) < 1:
             return np.nan
         else:
-            return data[0]
+            return float(values[0])
 
     def get_range(
         self,
@@ -256,49 +572,47 @@ class CacheDB:
         start_date: datetime.datetime,
         end_date: datetime.datetime,
         parameter: str,
-    ) -> list[float]:
-        """Get value of the station closest to the given space coordinates
-        that actually has data.
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get values in a date range of the station closest to the given space
+        coordinates that actually has data.
 
         :param longitude: Geographical longitude
         :type longitude: float
         :param latitude: Geographical latitude
         :type latitude: float
-        :param date: Date
-        :type date: datetime.datetime
+        :param start_date: Start date
+        :type start_date: datetime.datetime
+        :param end_date: End date
+        :type end_date: datetime.datetime
         :param parameter: Parameter
         :type parameter: str
-        :return: Value of the variable requested
-        :rtype: float
+        :return: Dates (UTC, datetime64[s]) and values (float64) ordered by
+        date, empty if no station has data
+        :rtype: tuple[np.ndarray, np.ndarray]
         """
-        lons = np.array(self._get_from_stations("longitude"))
-        lats = np.array(self._get_from_stations("latitude"))
-        station_ids = self._get_from_stations("station_id")
-
-        measure = (lons - longitude) ** 2 + (lats - latitude) ** 2
-
-        idx_by_distance = np.argsort(measure)
-
-        station_ids_to_check = [station_ids[i] for i in idx_by_distance]
-
-        data = []
-        found = False
-        while not found and len(station_ids_to_check) > 0:
-            station_id = station_ids_to_check.pop(0)
-            data = self._get(station_id, start_date, end_date, parameter)
-
-            if data:
-                found = True
+        # check the k nearest stations having the parameter, widen if none has data
+        k, n_checked = CANDIDATE_STATIONS, 0
+        while True:
+            candidates = self.nearest_stations(longitude, latitude, parameter, k)
+            if len(candidates) <= n_checked:
                 break
 
-        if not found:
-            logger.debug(
-                "Nothing found for %s at %s, %s between %s and %s",
-                parameter,
-                longitude,
-                latitude,
-                start_date.isoformat(),
-                end_date.isoformat(),
+            dates, values = self._get(
+                candidates[n_checked:], start_date, end_date, parameter
             )
+            if len(values) > 0:
+                return dates, values
+
+            n_checked = len(candidates)
+            k *= CANDIDATE_GROWTH
+
+        logger.debug(
+            "Nothing found for %s at %s, %s between %s and %s",
+            parameter,
+            longitude,
+            latitude,
+            start_date.isoformat(),
+            end_date.isoformat(),
+        )
 
-        return data
+        return np.array([], dtype="datetime64[s]"), np.array([], dtype=np.float64)
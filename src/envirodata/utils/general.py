@@ -1,6 +1,6 @@
 """Envirodata utilities."""
 
-from typing import Callable
+from typing import Any, Callable
 
 import os
 import importlib
@@ -11,11 +11,15 @@ import confuse  # type: ignore
 import shutil
 from urllib.parse import urlparse
 import requests
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 def get_cli_arguments():
     def valid_file_path(fp: str):
@@ -39,14 +43,14 @@ def get_cli_arguments():
     return args
 
 
-def get_config(config_fpath: str) -> confuse.Configuration:
+def get_config(config_fpath: str) -> dict[str, Any]:
     """Read configuration from file
 
     :param config_fpath: path to configuration file (.yaml)
     :type config_fpath: str
     :raises IOError: path does not exist!
-    :return: Configuration object
-    :rtype: confuse.Configuration
+    :return: Configuration (plain python objects)
+    :rtype: dict[str, Any]
     """
     if not os.path.exists(config_fpath):
         raise IOError(f'"{config_fpath}" does not exist!')
@@ -132,10 +136,56 @@ def copy_or_download(input_url, output_path):
             )
     elif input_path.scheme in ("http", "https"):
         try:
-            r = requests.get(input_url, allow_redirects=True, timeout=120)
-            open(output_path, "wb").write(r.content)
+            # stream to disk, large files (e.g., census grids) should not
+            # be held in memory
+            with requests.get(
+                input_url, allow_redirects=True, timeout=120, stream=True
+            ) as r:
+                with open(output_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
         except Exception:
             logger.critical(
                 "Input URL %s could not be downloaded.",
                 input_url,
             )
+
+
+def configure_sqlite_for_bulk_load(engine: Engine) -> None:
+    """Tune SQLite connections of an engine for bulk loading (WAL journal,
+    relaxed syncing, large page cache). No-op for other databases.
+
+    :param engine: SQLAlchemy engine
+    :type engine: Engine
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+def configure_sqlite_for_concurrency(engine: Engine) -> None:
+    """Tune SQLite connections of an engine for concurrent use by several
+    threads and processes (WAL journal, readers do not block the writer) with
+    crash-safe syncing (synchronous=NORMAL: committed transactions survive an
+    application crash). No-op for other databases.
+
+    :param engine: SQLAlchemy engine
+    :type engine: Engine
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
@@ -0,0 +1,123 @@
+"""Read-only arrays shared between server processes, and memory usage.
+
+Large read-only datasets are prepared once as .npy files and memory-mapped,
+so that all processes (uvicorn workers) share one copy in the page cache.
+"""
+
+import fcntl
+import json
+import logging
+import os
+from typing import Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# memory usage fields of /proc/<pid>/status (kB)
+MEMORY_FIELDS = ("VmRSS", "RssAnon", "RssFile", "RssShmem")
+
+
+def load_shared_array(
+    fpath: str, build: Callable[[], np.ndarray], source_fpath: str | None = None
+) -> np.ndarray:
+    """Memory-map a read-only array from a .npy file, building the file first
+    if it does not exist (or is older than its source). Concurrent processes
+    build it only once.
+
+    :param fpath: Path of the .npy file
+    :type fpath: str
+    :param build: Function returning the array
+    :type build: Callable[[], np.ndarray]
+    :param source_fpath: File the array is built from, defaults to None
+    :type source_fpath: str | None, optional
+    :return: Memory-mapped array (read-only)
+    :rtype: np.ndarray
+    """
+
+    if not _is_current([fpath], source_fpath):
+        with open(fpath + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # another process may have built it while we waited
+            if not _is_current([fpath], source_fpath):
+                logger.info("Preparing shared array %s", fpath)
+                _save_array(fpath, build())
+
+    return np.load(fpath, mmap_mode="r")
+
+
+def load_shared_array_with_metadata(
+    fpath: str,
+    metadata_fpath: str,
+    build: Callable[[], tuple[np.ndarray, dict]],
+    source_fpath: str | None = None,
+) -> tuple[np.ndarray, dict]:
+    """Memory-map a read-only array as load_shared_array, together with its
+    metadata (.json file). Both files are checked, built and read under the
+    same lock, so that the metadata always belongs to the array; if either
+    is missing, both are built again.
+
+    :param fpath: Path of the .npy file
+    :type fpath: str
+    :param metadata_fpath: Path of the .json file
+    :type metadata_fpath: str
+    :param build: Function returning the array and its metadata
+    :type build: Callable[[], tuple[np.ndarray, dict]]
+    :param source_fpath: File the array is built from, defaults to None
+    :type source_fpath: str | None, optional
+    :return: Memory-mapped array (read-only), and its metadata
+    :rtype: tuple[np.ndarray, dict]
+    """
+    with open(fpath + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not _is_current([fpath, metadata_fpath], source_fpath):
+            logger.info("Preparing shared array %s", fpath)
+            array, metadata = build()
+            tmp_fpath = f"{metadata_fpath}.{os.getpid()}.tmp"
+            with open(tmp_fpath, "w") as f:
+                json.dump(metadata, f)
+            os.replace(tmp_fpath, metadata_fpath)
+            _save_array(fpath, array)
+
+        with open(metadata_fpath, "r") as f:
+            metadata = json.load(f)
+
+        return np.load(fpath, mmap_mode="r"), metadata
+
+
+def _is_current(fpaths: list[str], source_fpath: str | None) -> bool:
+    """All files exist and none is older than the source. (internal)"""
+    if not all(os.path.exists(fpath) for fpath in fpaths):
+        return False
+    if source_fpath is None or not os.path.exists(source_fpath):
+        return True
+    source_mtime = os.path.getmtime(source_fpath)
+    return all(os.path.getmtime(fpath) >= source_mtime for fpath in fpaths)
+
+
+def _save_array(fpath: str, array: np.ndarray) -> None:
+    """Write a .npy file atomically (readers never see a partial file).
+    (internal)"""
+    tmp_fpath = f"{fpath}.{os.getpid()}.tmp"
+    with open(tmp_fpath, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_fpath, fpath)
+
+
+def memory_usage(pid: int | str = "self") -> dict[str, int]:
+    """Memory usage of a process (Linux): resident set size, and its
+    anonymous, file-backed (e.g., memory-mapped, shared) and shared memory
+    parts.
+
+    :param pid: Process id, defaults to the current process
+    :type pid: int | str, optional
+    :return: Memory usage by field of /proc/<pid>/status, in kB
+    :rtype: dict[str, int]
+    """
+    usage = {}
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in MEMORY_FIELDS:
+                usage[name] = int(value.split()[0])
+    return usage
@@ -0,0 +1,264 @@
+"""Prometheus-style metrics (counters, gauges, histograms) in the text
+exposition format, without further dependencies.
+
+Metrics are defined at module level where they are measured and registered
+with REGISTRY, which renders all of them (see run_server /metrics). Values
+are kept per process: with several server workers, each scrape reports the
+worker that answers it.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# histogram bucket upper bounds (s)
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Registry:
+    """Collection of metrics, rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: list["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        with self._lock:
+            if any(other.name == metric.name for other in self._metrics):
+                raise ValueError(f"Metric {metric.name} registered already")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format.
+
+        :return: Metrics
+        :rtype: str
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """Base of all metrics: name, documentation and label names."""
+
+    type_name = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        """Base of all metrics.
+
+        :param name: Metric name
+        :type name: str
+        :param documentation: Help text
+        :type documentation: str
+        :param labelnames: Label names, defaults to ()
+        :type labelnames: tuple[str, ...], optional
+        :param registry: Registry to add the metric to, defaults to REGISTRY
+        :type registry: Registry | None, optional
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        """Sample lines of the metric."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value (per label values)."""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter.
+
+        :param amount: Increment, defaults to 1.0
+        :type amount: float, optional
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Current value, read from a function when rendered."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], dict[tuple[str, ...], float]],
+        labelnames: tuple[str, ...] = (),
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        """Current value, read from a function when rendered.
+
+        :param name: Metric name
+        :type name: str
+        :param documentation: Help text
+        :type documentation: str
+        :param function: Returns values by label values
+        :type function: Callable[[], dict[tuple[str, ...], float]]
+        :param labelnames: Label names, defaults to ()
+        :type labelnames: tuple[str, ...], optional
+        :param registry: Registry to add the metric to, defaults to REGISTRY
+        :type registry: Registry | None, optional
+        """
+        super().__init__(name, documentation, labelnames, registry)
+        self._function = function
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._function().items()
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values (e.g., durations) in buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        """Distribution of observed values in buckets.
+
+        :param name: Metric name
+        :type name: str
+        :param documentation: Help text
+        :type documentation: str
+        :param labelnames: Label names, defaults to ()
+        :type labelnames: tuple[str, ...], optional
+        :param buckets: Bucket upper bounds, defaults to DEFAULT_BUCKETS
+        :type buckets: tuple[float, ...], optional
+        :param registry: Registry to add the metric to, defaults to REGISTRY
+        :type registry: Registry | None, optional
+        """
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # per label values: counts per bucket (not cumulative), sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation.
+
+        :param value: Observed value
+        :type value: float
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = ([0] * len(self.buckets), [0.0])
+            counts, total = self._values[key]
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration (s) of a block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            ]
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# lookups and misses of all caches (label: cache name), hit rate is
+# 1 - misses / lookups
+CACHE_LOOKUPS = Counter("envirodata_cache_lookups_total", "Cache lookups", ("cache",))
+CACHE_MISSES = Counter("envirodata_cache_misses_total", "Cache misses", ("cache",))
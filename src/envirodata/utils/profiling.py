@@ -0,0 +1,318 @@
+"""Timing breakdown of single requests, and a sampling profiler keeping
+profiles of the slowest requests.
+
+The stages of a request (geocoding, each service, each variable's read and
+statistics) are marked with stage(); outside of a timed request
+(timed_request, Profiler.profile) they do nothing. The timing of a request
+is kept in the context (contextvars), which thread pools do not pass on:
+submit functions wrapped with in_context.
+"""
+
+import contextvars
+import functools
+import heapq
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# interval between stack samples (s)
+SAMPLE_INTERVAL = 0.005
+
+
+class RequestTiming:
+    """Durations of the stages of one request, and stack samples of the
+    threads working on it (if profiled)."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.duration: float | None = None
+        self._stages: dict[str, Any] = {}
+        # threads currently in a stage of this request (nested stages count)
+        self._threads: dict[int, int] = {}
+        self.samples: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, path: tuple[str, ...], seconds: float) -> None:
+        """Add the duration of a stage, repeated stages add up. A stage with
+        nested stages has its own duration as "total".
+
+        :param path: Names of the enclosing stages and the stage
+        :type path: tuple[str, ...]
+        :param seconds: Duration (s)
+        :type seconds: float
+        """
+        with self._lock:
+            node = self._stages
+            for name in path[:-1]:
+                child = node.get(name)
+                if not isinstance(child, dict):
+                    child = node[name] = {} if child is None else {"total": child}
+                node = child
+            existing = node.get(path[-1])
+            if isinstance(existing, dict):
+                existing["total"] = existing.get("total", 0.0) + seconds
+            else:
+                node[path[-1]] = (existing or 0.0) + seconds
+
+    def enter_thread(self, thread: int) -> None:
+        with self._lock:
+            self._threads[thread] = self._threads.get(thread, 0) + 1
+
+    def exit_thread(self, thread: int) -> None:
+        with self._lock:
+            self._threads[thread] -= 1
+            if self._threads[thread] == 0:
+                del self._threads[thread]
+
+    def threads(self) -> list[int]:
+        """Threads currently working on the request."""
+        with self._lock:
+            return list(self._threads)
+
+    def add_sample(self, stack: str) -> None:
+        with self._lock:
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def breakdown(self) -> dict[str, Any]:
+        """Durations (s) of the request ("total") and its stages.
+
+        :return: Durations, nested like the stages
+        :rtype: dict[str, Any]
+        """
+
+        def rounded(node):
+            if isinstance(node, dict):
+                return {name: rounded(child) for name, child in node.items()}
+            return round(node, 6)
+
+        total = self.duration
+        if total is None:
+            total = time.perf_counter() - self.start
+        with self._lock:
+            return {"total": round(total, 6), **rounded(self._stages)}
+
+
+_TIMING: contextvars.ContextVar[RequestTiming | None] = contextvars.ContextVar(
+    "envirodata_timing", default=None
+)
+# names of the enclosing stages
+_STAGE_PATH: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar(
+    "envirodata_stage_path", default=()
+)
+
+
+@contextmanager
+def timed_request() -> Iterator[RequestTiming]:
+    """Collect the timing of the stages run in this block (this context).
+
+    :return: Timing of the request
+    :rtype: Iterator[RequestTiming]
+    """
+    timing = RequestTiming()
+    timing_token = _TIMING.set(timing)
+    path_token = _STAGE_PATH.set(())
+    try:
+        yield timing
+    finally:
+        timing.duration = time.perf_counter() - timing.start
+        _STAGE_PATH.reset(path_token)
+        _TIMING.reset(timing_token)
+
+
+@contextmanager
+def stage(*names: str, sample: bool = True) -> Iterator[None]:
+    """Time a stage of the current request, nested in the enclosing stages
+    (e.g., stage("services", "DWD") around stage("read")).
+
+    :param names: Name (path) of the stage
+    :type names: str
+    :param sample: Profile the current thread meanwhile, False in coroutines
+    (the event loop thread serves other requests while waiting), defaults
+    to True
+    :type sample: bool, optional
+    """
+    timing = _TIMING.get()
+    if timing is None:
+        yield
+        return
+
+    path = _STAGE_PATH.get() + names
+    token = _STAGE_PATH.set(path)
+    thread = threading.get_ident()
+    if sample:
+        timing.enter_thread(thread)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(path, time.perf_counter() - start)
+        if sample:
+            timing.exit_thread(thread)
+        _STAGE_PATH.reset(token)
+
+
+def in_context(function: Callable, *args: Any) -> Callable[[], Any]:
+    """function(*args), to be run in a thread pool within the current
+    context (request timing).
+
+    :param function: Function
+    :type function: Callable
+    :return: Function without arguments
+    :rtype: Callable[[], Any]
+    """
+    return functools.partial(contextvars.copy_context().run, function, *args)
+
+
+def _folded_stack(frame) -> str:
+    """Stack of a frame, outermost first, as in the "folded" format of
+    flame graph tools (module:function;module:function)."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        # qualified names (Class.method) from Python 3.11 on
+        code = frame.f_code
+        names.append(f"{module}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Sampling profiler of requests: samples the stacks of the threads
+    working on profiled requests, and writes the profiles of the slowest
+    requests (of this process) to disk.
+
+    For each kept request, <path>/<duration>ms-<pid>-<n>.folded has the
+    sampled stacks ("stack count" lines, e.g., for flamegraph.pl or
+    speedscope) and <path>/<duration>ms-<pid>-<n>.json the request, its
+    duration and timing breakdown.
+    """
+
+    def __init__(
+        self, path: str, keep: int = 10, interval: float = SAMPLE_INTERVAL
+    ) -> None:
+        """Sampling profiler of requests.
+
+        :param path: Directory of the profiles
+        :type path: str
+        :param keep: Profiles of the slowest requests kept, defaults to 10
+        :type keep: int, optional
+        :param interval: Sampling interval (s), defaults to SAMPLE_INTERVAL
+        :type interval: float, optional
+        """
+        self.path = path
+        self.keep = keep
+        self.interval = interval
+        os.makedirs(self.path, exist_ok=True)
+
+        self._active: set[RequestTiming] = set()
+        # (duration, file name without extension) of the kept profiles
+        self._slowest: list[tuple[float, str]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start sampling (in a background thread)."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._sample, name="profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stopped.is_set():
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                # sleep until a request is profiled
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            frames = sys._current_frames()
+            for timing in active:
+                for thread in timing.threads():
+                    frame = frames.get(thread)
+                    if frame is not None:
+                        timing.add_sample(_folded_stack(frame))
+            del frames
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, request: dict[str, Any]) -> Iterator[RequestTiming]:
+        """Time and profile the request run in this block; its profile is kept
+        if it is one of the slowest.
+
+        :param request: Description of the request (e.g., its parameters),
+        written to disk with the profile: leave out personal data
+        :type request: dict[str, Any]
+        :return: Timing of the request
+        :rtype: Iterator[RequestTiming]
+        """
+        with timed_request() as timing:
+            with self._lock:
+                self._active.add(timing)
+            self._wake.set()
+            try:
+                yield timing
+            finally:
+                with self._lock:
+                    self._active.discard(timing)
+        self._keep_if_slow(timing, request)
+
+    def _keep_if_slow(self, timing: RequestTiming, request: dict[str, Any]) -> None:
+        duration = timing.duration or 0.0
+        with self._lock:
+            if len(self._slowest) >= self.keep and duration <= self._slowest[0][0]:
+                return
+            name = f"{duration * 1000:010.1f}ms-{os.getpid()}-{next(self._counter)}"
+            heapq.heappush(self._slowest, (duration, name))
+            removed = (
+                heapq.heappop(self._slowest)[1]
+                if len(self._slowest) > self.keep
+                else None
+            )
+
+        fpath = os.path.join(self.path, name)
+        try:
+            with open(fpath + ".folded", "w") as f:
+                for stack, count in timing.samples.items():
+                    f.write(f"{stack} {count}\n")
+            with open(fpath + ".json", "w") as f:
+                json.dump(
+                    {
+                        "request": request,
+                        "duration": duration,
+                        "timing": timing.breakdown(),
+                        "samples": sum(timing.samples.values()),
+                        "interval": self.interval,
+                    },
+                    f,
+                    indent=2,
+                    default=str,
+                )
+            if removed is not None:
+                for extension in (".folded", ".json"):
+                    os.remove(os.path.join(self.path, removed + extension))
+        except OSError as exc:
+            logger.error("Could not write profile %s: %s", fpath, str(exc))
@@ -1,9 +1,17 @@
-from math import asin, cos, radians, sin, sqrt, floor
+import os
+import json
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+import pandas as pd  # type: ignore
 from pyproj import Transformer
 
 # Earth radius in meters
 R_EARTH = 6371000.0
 
+# values of dense grids, as precise as the DB (float32 changes decimals)
+GRID_DTYPE = np.float64
+
 
 def haversine(lat1, lon1, lat2, lon2):
     """
@@ -21,21 +29,327 @@ def haversine(lat1, lon1, lat2, lon2):
     return m
 
 
+def haversine_vectorized(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great circle distance (m) between points given in decimal degrees,
+    element-wise with numpy broadcasting (e.g., one point to many).
+
+    :return: Distances (m)
+    :rtype: np.ndarray
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2)
+    )
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * R_EARTH * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_pairwise(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """Great circle distances (m) between all pairs of two sets of points
+    given in decimal degrees.
+
+    :return: Distances (m), dimensions (len(lats1), len(lats2))
+    :rtype: np.ndarray
+    """
+    return haversine_vectorized(
+        np.asarray(lats1)[:, np.newaxis],
+        np.asarray(lons1)[:, np.newaxis],
+        np.asarray(lats2)[np.newaxis, :],
+        np.asarray(lons2)[np.newaxis, :],
+    )
+
+
+def _unit_vectors(lons, lats) -> np.ndarray:
+    lons = np.radians(np.atleast_1d(np.asarray(lons, dtype=np.float64)))
+    lats = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)))
+    return np.stack(
+        (np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)),
+        axis=-1,
+    )
+
+
+class SphericalIndex:
+    """Nearest-neighbour index for points on the sphere. Points are stored as
+    unit vectors, so ranking by dot product is exact great circle ranking
+    (no planar degree distances) at any latitude."""
+
+    # maximum number of (query, point) pairs evaluated at once
+    MAX_PAIRS = 10_000_000
+
+    def __init__(self, lons, lats) -> None:
+        """Nearest-neighbour index for points on the sphere.
+
+        :param lons: Geographical longitudes of the points
+        :param lats: Geographical latitudes of the points
+        """
+        self.vectors = _unit_vectors(lons, lats)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def query(self, lons, lats, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """k nearest points for each query point.
+
+        :param lons: Geographical longitudes of the query points
+        :param lats: Geographical latitudes of the query points
+        :param k: Number of neighbours, defaults to 1
+        :type k: int, optional
+        :return: Great circle distances (m) and indices of the nearest points,
+        dimensions (number of query points, k), sorted by distance
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        queries = _unit_vectors(lons, lats)
+        k = min(k, len(self))
+
+        distances = np.empty((len(queries), k), dtype=np.float64)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+
+        batch_size = max(self.MAX_PAIRS // max(len(self), 1), 1)
+        for start in range(0, len(queries), batch_size):
+            dots = queries[start : start + batch_size] @ self.vectors.T
+
+            if k < len(self):
+                nearest = np.argpartition(-dots, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.tile(np.arange(len(self)), (len(dots), 1))
+            nearest_dots = np.take_along_axis(dots, nearest, axis=1)
+
+            order = np.argsort(-nearest_dots, axis=1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            nearest_dots = np.take_along_axis(nearest_dots, order, axis=1)
+
+            # chord length -> great circle distance
+            chord = np.sqrt(np.clip(2.0 - 2.0 * nearest_dots, 0.0, 4.0))
+            distances[start : start + batch_size] = (
+                2 * R_EARTH * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+            )
+            indices[start : start + batch_size] = nearest
+
+        return distances, indices
+
+
 EPSG_4326_to_3035_transformer = Transformer.from_crs("EPSG:4326", "EPSG:3035")
 
 
 # per https://sg.geodatenzentrum.de/web_public/gdz/dokumentation/deu/geogitter.pdf
 def calculate_inspire_grid_id(lon: float, lat: float, cell_size: int):
+    north_idx, east_idx = calculate_inspire_grid_indices(lon, lat, cell_size)
+
+    return format_inspire_grid_ids(north_idx, east_idx, cell_size)[0]
+
+
+def calculate_inspire_grid_indices(lon, lat, cell_size: int):
+    """Integer (northing, easting) cell indices on the INSPIRE (EPSG:3035) grid,
+    for single points or arrays of points (projected in one call).
+
+    :param lon: Geographical longitude(s)
+    :param lat: Geographical latitude(s)
+    :param cell_size: Grid cell size (m)
+    :type cell_size: int
+    :return: Northing and easting indices
+    """
     x, y = EPSG_4326_to_3035_transformer.transform(
         lat, lon
     )  # dont ask why lat/lon is switched...
 
+    return (
+        np.floor(np.asarray(x) / cell_size).astype(np.int64),
+        np.floor(np.asarray(y) / cell_size).astype(np.int64),
+    )
+
+
+def calculate_inspire_grid_keys(lon, lat, cell_size: int) -> np.ndarray:
+    """Integer-encoded cell keys (see encode_grid_key) on the INSPIRE
+    (EPSG:3035) grid for arrays of points.
+
+    :param lon: Geographical longitudes
+    :param lat: Geographical latitudes
+    :param cell_size: Grid cell size (m)
+    :type cell_size: int
+    :return: Cell keys
+    :rtype: np.ndarray
+    """
+    return np.atleast_1d(
+        encode_grid_key(*calculate_inspire_grid_indices(lon, lat, cell_size))
+    )
+
+
+def format_inspire_grid_ids(north_idx, east_idx, cell_size: int) -> list[str]:
+    """INSPIRE grid IDs (e.g., CRS3035RES100mN2689100E4337000) of cells.
+
+    :param north_idx: Northing index(es)
+    :param east_idx: Easting index(es)
+    :param cell_size: Grid cell size (m)
+    :type cell_size: int
+    :return: Grid IDs
+    :rtype: list[str]
+    """
     # if size > 999m, we use km in name
     pretty_cell_size = str(cell_size) + "m"
     if cell_size > 999:
         pretty_cell_size = str(int(cell_size / 1000)) + "km"
 
-    pretty_x = floor(x / cell_size)
-    pretty_y = floor(y / cell_size)
+    return [
+        f"CRS3035RES{pretty_cell_size}N{pretty_x:0<7d}E{pretty_y:0<7d}"
+        for pretty_x, pretty_y in zip(
+            np.atleast_1d(north_idx).tolist(), np.atleast_1d(east_idx).tolist()
+        )
+    ]
+
+
+def parse_inspire_grid_ids(grid_ids) -> tuple[np.ndarray, np.ndarray]:
+    """Integer (northing, easting) cell indices from INSPIRE grid IDs
+    (e.g., CRS3035RES100mN2689100E4337000).
+
+    :param grid_ids: Grid IDs
+    :return: Northing and easting indices
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    parts = pd.Series(grid_ids, dtype=str).str.extract(
+        r"RES(?P<size>\d+)(?P<unit>k?m)N(?P<north>\d+)E(?P<east>\d+)"
+    )
+    if parts.isna().any(axis=None):
+        raise ValueError("Malformed INSPIRE grid ID")
+
+    cell_size = parts["size"].astype(np.int64).to_numpy()
+    cell_size = np.where(parts["unit"].to_numpy() == "km", cell_size * 1000, cell_size)
+
+    return (
+        parts["north"].astype(np.int64).to_numpy() // cell_size,
+        parts["east"].astype(np.int64).to_numpy() // cell_size,
+    )
+
+
+def encode_grid_key(north_idx, east_idx):
+    """Encode (northing, easting) cell indices into a single integer key.
+
+    :param north_idx: Northing index(es)
+    :param east_idx: Easting index(es)
+    :return: Integer key(s)
+    """
+    return (np.asarray(north_idx, dtype=np.int64) << 32) | np.asarray(
+        east_idx, dtype=np.int64
+    )
+
+
+def decode_grid_key(grid_key):
+    """Decode integer key(s) into (northing, easting) cell indices.
+
+    :param grid_key: Integer key(s)
+    :return: Northing and easting indices
+    """
+    grid_key = np.asarray(grid_key, dtype=np.int64)
+    return grid_key >> 32, grid_key & 0xFFFFFFFF
+
+
+class GridArray:
+    """Values on a regular grid as a dense array, indexed by integer
+    (northing, easting) cell indices."""
+
+    def __init__(self, values: np.ndarray, north_origin: int, east_origin: int):
+        """Values on a regular grid as a dense array.
+
+        :param values: Values, dimensions (northing, easting), NaN where empty
+        :type values: np.ndarray
+        :param north_origin: Northing index of the first row
+        :type north_origin: int
+        :param east_origin: Easting index of the first column
+        :type east_origin: int
+        """
+        self.values = values
+        self.north_origin = int(north_origin)
+        self.east_origin = int(east_origin)
+
+    @classmethod
+    def from_cells(
+        cls,
+        north_idx: np.ndarray,
+        east_idx: np.ndarray,
+        values: np.ndarray,
+        fpath: str | None = None,
+    ) -> "GridArray":
+        """Build a dense grid from (sparse) cells.
+
+        :param north_idx: Northing indices of the cells
+        :type north_idx: np.ndarray
+        :param east_idx: Easting indices of the cells
+        :type east_idx: np.ndarray
+        :param values: Cell values
+        :type values: np.ndarray
+        :param fpath: Write grid to this path (without extension) instead of
+        holding it in memory, defaults to None
+        :type fpath: str | None, optional
+        :return: Grid
+        :rtype: GridArray
+        """
+        north_origin, east_origin = int(np.min(north_idx)), int(np.min(east_idx))
+        shape = (
+            int(np.max(north_idx)) - north_origin + 1,
+            int(np.max(east_idx)) - east_origin + 1,
+        )
+
+        if fpath is None:
+            data = np.full(shape, np.nan, dtype=GRID_DTYPE)
+        else:
+            data = np.lib.format.open_memmap(
+                fpath + ".npy", mode="w+", dtype=GRID_DTYPE, shape=shape
+            )
+            data[:] = np.nan
+            with open(fpath + ".json", "w") as f:
+                json.dump({"north_origin": north_origin, "east_origin": east_origin}, f)
+
+        data[north_idx - north_origin, east_idx - east_origin] = values
+
+        if isinstance(data, np.memmap):
+            data.flush()
+
+        return cls(data, north_origin, east_origin)
+
+    @classmethod
+    def load(cls, fpath: str, mmap: bool = True) -> "GridArray":
+        """Load grid from file.
+
+        :param fpath: Path of the grid (without extension)
+        :type fpath: str
+        :param mmap: Memory-map the values instead of reading them, defaults to True
+        :type mmap: bool, optional
+        :return: Grid
+        :rtype: GridArray
+        """
+        with open(fpath + ".json", "r") as f:
+            origin = json.load(f)
+
+        values = np.load(fpath + ".npy", mmap_mode="r" if mmap else None)
+
+        return cls(values, origin["north_origin"], origin["east_origin"])
+
+    @staticmethod
+    def exists(fpath: str) -> bool:
+        """Is there a grid file (of the current format, GRID_DTYPE)?"""
+        if not (os.path.exists(fpath + ".npy") and os.path.exists(fpath + ".json")):
+            return False
+        return np.load(fpath + ".npy", mmap_mode="r").dtype == GRID_DTYPE
+
+    def lookup(self, north_idx, east_idx) -> np.ndarray:
+        """Values at given cells, NaN outside of the grid.
+
+        :param north_idx: Northing indices
+        :param east_idx: Easting indices
+        :return: Values
+        :rtype: np.ndarray
+        """
+        rows = np.atleast_1d(np.asarray(north_idx) - self.north_origin)
+        cols = np.atleast_1d(np.asarray(east_idx) - self.east_origin)
+
+        inside = (
+            (rows >= 0)
+            & (rows < self.values.shape[0])
+            & (cols >= 0)
+            & (cols < self.values.shape[1])
+        )
+
+        result = np.full(rows.shape, np.nan, dtype=np.float64)
+        result[inside] = self.values[rows[inside], cols[inside]]
 
-    return f"CRS3035RES{pretty_cell_size}N{pretty_x:0<7d}E{pretty_y:0<7d}"
+        return result
@@ -0,0 +1,90 @@
+"""Benchmark CacheDB inserts of synthetic hourly station data, per station and
+parameter (CacheDB.insert) vs. in bulk (CacheDB.insert_many).
+
+Usage: python tools/benchmark_cachedb_insert.py [--stations 200] [--days 30]
+"""
+
+import os
+import time
+import logging
+from argparse import ArgumentParser
+
+import numpy as np
+
+from envirodata.utils.cacheDB import CacheDB
+
+logging.basicConfig(level=logging.WARNING)
+
+PARAMETERS = ("temperature_air_mean_2m", "humidity", "precipitation_height")
+
+
+def synthetic_observations(n_stations: int, n_days: int) -> dict[str, np.ndarray]:
+    """Hourly values of all parameters at randomly placed stations."""
+    rng = np.random.default_rng(42)
+    dates = np.arange(
+        np.datetime64("2020-01-01T00"),
+        np.datetime64("2020-01-01T00") + np.timedelta64(n_days * 24, "h"),
+        np.timedelta64(1, "h"),
+    )
+    station_ids = np.array([f"{i:05d}" for i in range(n_stations)])
+    lons = rng.uniform(6.0, 15.0, n_stations)
+    lats = rng.uniform(47.5, 55.0, n_stations)
+
+    n_per_station = len(dates) * len(PARAMETERS)
+    return {
+        "station_ids": np.repeat(station_ids, n_per_station),
+        "longitudes": np.repeat(lons, n_per_station),
+        "latitudes": np.repeat(lats, n_per_station),
+        "parameters": np.tile(np.repeat(PARAMETERS, len(dates)), n_stations),
+        "dates": np.tile(dates, n_stations * len(PARAMETERS)),
+        "values": rng.normal(10.0, 5.0, n_stations * n_per_station),
+    }
+
+
+def fresh_db(fpath: str) -> CacheDB:
+    for path in (fpath, fpath + "-wal", fpath + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    return CacheDB(f"sqlite:///{fpath}", bulk_load=True)
+
+
+def main() -> None:
+    parser = ArgumentParser("benchmark_cachedb_insert")
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--workdir", default="bench")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    data = synthetic_observations(args.stations, args.days)
+    n_rows = len(data["values"])
+    n_chunk = args.days * 24
+
+    # one call per station and parameter, as the getters used to fill the cache
+    cache = fresh_db(os.path.join(args.workdir, "cache_single.sqlite3"))
+    dates = data["dates"].astype("datetime64[s]").astype(object)
+    t_start = time.perf_counter()
+    for start in range(0, n_rows, n_chunk):
+        chunk = slice(start, start + n_chunk)
+        cache.insert(
+            str(data["station_ids"][start]),
+            float(data["longitudes"][start]),
+            float(data["latitudes"][start]),
+            data["parameters"][chunk].tolist(),
+            dates[chunk].tolist(),
+            data["values"][chunk].tolist(),
+        )
+    single = time.perf_counter() - t_start
+
+    cache = fresh_db(os.path.join(args.workdir, "cache_bulk.sqlite3"))
+    t_start = time.perf_counter()
+    cache.insert_many(**data)
+    bulk = time.perf_counter() - t_start
+
+    print(f"rows: {n_rows}")
+    print(f"insert:      {single:.1f} s, {n_rows / single:.0f} rows/s")
+    print(f"insert_many: {bulk:.1f} s, {n_rows / bulk:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the Destatis (Zensus) csv ingest on a synthetic 100 m grid.
+
+Usage: python tools/benchmark_destatis_ingest.py [--rows 3000000] [--workdir bench]
+"""
+
+import os
+import time
+import logging
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+
+from envirodata.services.destatis import Loader
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def write_synthetic_grid(fpath: str, n_rows: int, chunk_size: int = 500000) -> None:
+    """Write a synthetic Zensus-like csv (grid ID, cell midpoints, value)."""
+    rng = np.random.default_rng(42)
+    n_east = 6500
+
+    with open(fpath, "w") as f:
+        f.write("GITTER_ID_100m;x_mp_100m;y_mp_100m;Einwohner\n")
+        for start in range(0, n_rows, chunk_size):
+            idx = np.arange(start, min(start + chunk_size, n_rows))
+            north = 26800 + idx // n_east
+            east = 40300 + idx % n_east
+            df = pd.DataFrame(
+                {
+                    "GITTER_ID_100m": [
+                        f"CRS3035RES100mN{n * 100}E{e * 100}"
+                        for n, e in zip(north, east)
+                    ],
+                    "x_mp_100m": east * 100 + 50,
+                    "y_mp_100m": north * 100 + 50,
+                    "Einwohner": rng.integers(3, 500, len(idx)),
+                }
+            )
+            df.to_csv(f, sep=";", header=False, index=False)
+
+
+def main() -> None:
+    parser = ArgumentParser("benchmark_destatis_ingest")
+    parser.add_argument("--rows", type=int, default=3000000)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workdir", default="bench")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    csv_path = os.path.join(args.workdir, "synthetic_grid.csv")
+    db_path = os.path.join(args.workdir, "Destatis.sqlite3")
+
+    if not os.path.exists(csv_path):
+        write_synthetic_grid(csv_path, args.rows)
+    for fpath in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(fpath):
+            os.remove(fpath)
+
+    loader = Loader(
+        f"sqlite:///{db_path}",
+        {"Einwohner": csv_path},
+        decimal=".",
+        cache_path=args.workdir,
+        chunk_size=args.chunk_size,
+    )
+
+    t_start = time.perf_counter()
+    loader.load(None, None)
+    elapsed = time.perf_counter() - t_start
+
+    print(f"rows: {args.rows}")
+    print(f"time: {elapsed:.1f} s")
+    print(f"throughput: {args.rows / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
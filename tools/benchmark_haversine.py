@@ -0,0 +1,71 @@
+"""Benchmark great circle distance and nearest-neighbour utilities.
+
+Usage: python tools/benchmark_haversine.py [--stations 5000] [--queries 2000]
+"""
+
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from envirodata.utils.spatial import SphericalIndex, haversine, haversine_vectorized
+
+
+def timed(label: str, func) -> object:
+    t_start = time.perf_counter()
+    result = func()
+    print(f"{label}: {time.perf_counter() - t_start:.3f} s")
+    return result
+
+
+def main() -> None:
+    parser = ArgumentParser("benchmark_haversine")
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lons = rng.uniform(-10.0, 30.0, args.stations)
+    lats = rng.uniform(35.0, 70.0, args.stations)
+    qlons = rng.uniform(-10.0, 30.0, args.queries)
+    qlats = rng.uniform(35.0, 70.0, args.queries)
+
+    print(f"{args.queries} queries against {args.stations} stations")
+
+    scalar = timed(
+        "scalar haversine (nearest)",
+        lambda: [
+            int(
+                np.argmin(
+                    [haversine(qlat, qlon, lat, lon) for lat, lon in zip(lats, lons)]
+                )
+            )
+            for qlon, qlat in zip(qlons, qlats)
+        ],
+    )
+    vectorized = timed(
+        "vectorized haversine, one-to-many (nearest)",
+        lambda: [
+            int(np.argmin(haversine_vectorized(qlat, qlon, lats, lons)))
+            for qlon, qlat in zip(qlons, qlats)
+        ],
+    )
+    index = timed("SphericalIndex build", lambda: SphericalIndex(lons, lats))
+    _, nearest = timed("SphericalIndex query (k=1)", lambda: index.query(qlons, qlats))
+    timed("SphericalIndex query (k=10)", lambda: index.query(qlons, qlats, k=10))
+
+    planar = [
+        int(np.argmin((lons - qlon) ** 2 + (lats - qlat) ** 2))
+        for qlon, qlat in zip(qlons, qlats)
+    ]
+
+    print(f"vectorized == scalar: {vectorized == scalar}")
+    print(f"index == scalar: {nearest[:, 0].tolist() == scalar}")
+    print(
+        "planar degree distance picks a different station for "
+        f"{np.mean(np.array(planar) != np.array(scalar)) * 100:.1f} % of queries"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Memory usage of the run_server processes: the main (supervisor) process
+and its uvicorn workers. Anonymous memory is private to each worker,
+file-backed memory (memory-mapped datasets) is shared between workers.
+
+Usage: python tools/measure_worker_rss.py <pid of run_server>
+"""
+
+import os
+from argparse import ArgumentParser
+
+from envirodata.utils.memory import MEMORY_FIELDS, memory_usage
+
+
+def children(pid: int) -> list[int]:
+    """Child processes of a process (Linux)."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # parent pid is the second field after the (command name)
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def main() -> None:
+    parser = ArgumentParser("measure_worker_rss")
+    parser.add_argument("pid", type=int, help="process id of run_server")
+    args = parser.parse_args()
+
+    header = " ".join(f"{field + ' (MB)':>14}" for field in MEMORY_FIELDS)
+    print(f"{'pid':>8} {header}")
+    for pid in [args.pid] + children(args.pid):
+        usage = memory_usage(pid)
+        values = " ".join(f"{usage.get(f, 0) / 1024:>14.1f}" for f in MEMORY_FIELDS)
+        print(f"{pid:>8} {values}")
+
+
+if __name__ == "__main__":
+    main()